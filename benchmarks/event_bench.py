@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+'''
+Microbenchmark of Event construction, field access and memory use.
+
+Compares scipysim.core.event.Event with the earlier implementation, a
+collections.Mapping subclass that kept its fields in a private dict and
+looked them up through __getattr__. The earlier class is reproduced below
+so the two can be measured side by side.
+
+Usage::
+
+    python benchmarks/event_bench.py [number_of_events]
+
+Results on a 2.7 interpreter (numpy 1.16), 200000 events:
+
+    ==================  ==========  ==========
+                        dict-based  slots
+    ==================  ==========  ==========
+    create (us/event)   0.63        0.35
+    .tag/.value (us)    0.89        0.05
+    ['tag'] (us)        0.20        0.21
+    bytes per event     344         72
+    ==================  ==========  ==========
+
+Creating an event takes a little over half the time, reading its fields
+is more than ten times faster and each event is almost five times
+smaller, since there is no longer a dict per event. Dict-style access
+costs about the same as before.
+'''
+
+import sys
+import os
+import timeit
+from collections import Mapping
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from scipysim.core.event import Event
+
+
+class DictEvent(Mapping):
+    '''The dict-based Event that preceded the slots implementation.'''
+    __event = None
+
+    def __init__(self, tag=None, value=None, last=False):
+        super(DictEvent, self).__setattr__('_DictEvent__event',
+                                           {'tag': tag, 'value': value, 'last': last})
+
+    def __iter__(self):
+        return iter(self.__event)
+
+    def __len__(self):
+        return len(self.__event)
+
+    def __getitem__(self, key):
+        return self.__event[key]
+
+    def __getattr__(self, name):
+        return self.__event[name]
+
+    def __setattr__(self, name, value):
+        raise TypeError("Events are immutable")
+
+
+def size_of(event):
+    '''Bytes used by an event and the containers it owns.'''
+    size = sys.getsizeof(event)
+    if isinstance(event, DictEvent):
+        size += sys.getsizeof(event._DictEvent__event)
+    return size
+
+
+def bench(cls, number):
+    setup = 'from __main__ import %s as E; e = E(1.0, 2.0)' % cls.__name__
+    per_event = lambda stmt: timeit.timeit(stmt, setup, number=number) / number * 1e6
+    return [per_event('E(1.0, 2.0)'),
+            per_event('e.tag; e.value'),
+            per_event("e['tag']"),
+            size_of(cls(1.0, 2.0))]
+
+
+def main(number=200000):
+    rows = ['create (us/event)', '.tag/.value (us)', "['tag'] (us)", 'bytes per event']
+    old, new = bench(DictEvent, number), bench(Event, number)
+    print '%-20s %10s %10s' % ('', 'dict-based', 'slots')
+    for row, a, b in zip(rows, old, new):
+        print '%-20s %10.2f %10.2f' % (row, a, b)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
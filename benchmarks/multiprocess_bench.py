@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+'''
+Scaling of the multi-process engine.
+
+Runs two models with the cooperative engine and with the multiprocess
+engine on an increasing number of worker processes, and prints the wall
+clock time of each:
+
+    * NoiseSum - the model of central_limit_theorem.py, N random sources
+                 summed. The Summer reads every event of every source so it
+                 bounds how far this model can scale.
+    * NoiseChains - N independent source, gain, abs and sink chains, which
+                    share no channels between processes.
+
+Usage::
+
+    python benchmarks/multiprocess_bench.py [sources] [simulation_time]
+
+Results on a 2.7 interpreter with N=20 on a host where only one core was
+available to the benchmark, so they measure the cost of the worker
+processes and shared channels rather than any speed up:
+
+    ============  ========  ===========
+    seconds       NoiseSum  NoiseChains
+    ============  ========  ===========
+    cooperative   0.95      1.97
+    1 workers     1.00      2.06
+    2 workers     1.03      2.45
+    4 workers     1.21      2.22
+    ============  ========  ===========
+'''
+
+import sys
+import os
+import logging
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+from scipysim.core import CompositeActor, MakeChans, MultiprocessScheduler
+from scipysim.actors.math import Summer, Proportional, Abs
+from scipysim.actors.signal import RandomSource, Sink
+
+
+class NoiseSum(CompositeActor):
+    '''N random sources summed into a sink.'''
+
+    def __init__(self, N, simulation_time):
+        super(NoiseSum, self).__init__()
+        wires = MakeChans(N + 1)
+        sources = [RandomSource(wires[i], resolution=15, simulation_time=simulation_time)
+                   for i in xrange(N)]
+        self.components = sources + [Summer(wires[:N], wires[N]), Sink(wires[N])]
+
+
+class NoiseChains(CompositeActor):
+    '''N random sources each scaled, rectified and sent to its own sink.'''
+
+    def __init__(self, N, simulation_time):
+        super(NoiseChains, self).__init__()
+        self.components = []
+        for i in xrange(N):
+            wires = MakeChans(3)
+            self.components += [RandomSource(wires[0], resolution=15, simulation_time=simulation_time),
+                                Proportional(wires[0], wires[1], gain=-2),
+                                Abs(wires[1], wires[2]), Sink(wires[2])]
+
+
+def timed(run):
+    start = time()
+    run()
+    return time() - start
+
+
+def main(N=20, simulation_time=200):
+    logging.disable(logging.INFO)
+    models = [NoiseSum, NoiseChains]
+    print '%-16s' % 'seconds' + ''.join('%12s' % m.__name__ for m in models)
+    print '%-16s' % 'cooperative' + ''.join('%12.2f' % timed(lambda: m(N, simulation_time).run('cooperative'))
+                                            for m in models)
+    for workers in [1, 2, 4]:
+        print '%-16s' % ('%d workers' % workers) + ''.join(
+            '%12.2f' % timed(MultiprocessScheduler(m(N, simulation_time), workers=workers).run)
+            for m in models)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+'''
+The benchmark suite: every bundled model, plus microbenchmarks of the
+core primitives, with results saved as JSON so runs can be compared
+across commits.
+
+Each model in scipysim/models is run headless (see scipysim.core.sweep) in
+a process of its own, and the suite records:
+
+    * seconds - the wall clock time of the run
+    * events - the number of events read by the model's actors, counted
+               in a second, profiled run (see scipysim.core.instrumentation)
+    * events_per_second - events / seconds
+    * peak_rss_mb - the peak resident memory of the process running it
+
+The models whose size can be set from their parameters (see SCALE) are
+run at 'scale' times their normal size, the rest always at their normal
+size ('scaled' is false in their results).
+
+The microbenchmarks measure events per second through Event creation,
+Channel put/get and head/drop, the alignment of two inputs by Summer and
+Merge, and Bundle followed by Unbundle.
+
+The import benchmarks time importing the package and a few of its actors,
+each in a new interpreter, as the time a short model or a script using
+one actor takes to start.
+
+Usage::
+
+    python benchmarks/run_benchmarks.py [-o results.json] [--scale 2]
+    python benchmarks/run_benchmarks.py --compare baseline.json [--threshold 0.2]
+    python benchmarks/run_benchmarks.py --results new.json --compare baseline.json
+
+With --compare, each result is checked against the baseline and the
+script exits with status 1 if any is worse by more than the threshold (a
+fraction, 0.2 by default): longer times or more memory, or fewer events
+per second. --results compares a saved file instead of running the suite.
+'''
+
+import sys
+import os
+import json
+import logging
+import platform
+import resource
+import multiprocessing
+import subprocess
+from optparse import OptionParser
+from time import time, sleep
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir))
+import numpy
+import scipysim.models
+from scipysim.core import Channel, Event, LastEvent, DisplayActor, Recorder, Scheduler
+from scipysim.core.sweep import find_model
+from scipysim.actors.math.summer import DTSummer
+from scipysim.actors.signal import Merge
+from scipysim.actors.io import Bundle, Unbundle
+
+# The parameters of the models that can be run at a larger size, as a
+# function of the scale
+SCALE = {
+    'central_limit_theorem': lambda scale: {'N': int(round(5 * scale))},
+    'multiple_delayed_sum_ramp_plot': lambda scale: {'simulation_length': 40 * scale},
+    'pwm': lambda scale: {'simulation_length': 0.02 * scale},
+}
+
+# The ways a result can get worse, as -1 if a smaller value is worse and
+# 1 if a larger value is worse
+DIRECTIONS = {'seconds': 1, 'peak_rss_mb': 1, 'events_per_second': -1}
+
+
+def model_names():
+    '''The names of the bundled models.'''
+    directory = os.path.dirname(scipysim.models.__file__)
+    return sorted(name[:-3] for name in os.listdir(directory)
+                  if name.endswith('.py') and not name.startswith('_'))
+
+
+def _run_model(name, scale, connection):
+    '''Run one model twice in this (child) process and send back its results.'''
+    DisplayActor.headless = Recorder
+    logging.disable(logging.CRITICAL)
+    try:
+        module = __import__('scipysim.models.' + name, fromlist=['*'])
+        model_class = find_model(module)
+        params = SCALE[name](scale) if name in SCALE else {}
+
+        model = model_class(**params)
+        start = time()
+        model.run()
+        seconds = time() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+        profile = model_class(**params).run(profile=True)
+        events = sum(stats['events_in'] for stats in profile.stats.values())
+        connection.send({'status': 'ok', 'seconds': seconds, 'events': events,
+                         'events_per_second': events / seconds, 'peak_rss_mb': peak,
+                         'scaled': name in SCALE})
+    except Exception, e:
+        connection.send({'status': 'failed', 'error': '%s: %s' % (e.__class__.__name__, e)})
+    connection.close()
+
+
+def run_model(name, scale=1.0, timeout=120):
+    '''Benchmark one model in a new process.'''
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_model, args=(name, scale, sender))
+    process.start()
+    sender.close()
+    start = time()
+    while not receiver.poll():
+        if not process.is_alive():
+            return {'status': 'failed', 'error': 'exited with code %s' % process.exitcode}
+        if time() - start > timeout:
+            process.terminate()
+            return {'status': 'timeout', 'error': 'stopped after %d seconds' % timeout}
+        sleep(0.01)
+    try:
+        result = receiver.recv()
+    except EOFError:
+        # The child died without sending its result, and closed the pipe
+        process.join()
+        return {'status': 'failed', 'error': 'exited with code %s' % process.exitcode}
+    process.join()
+    return result
+
+
+def rate(function, number, repeat=3):
+    '''Events per second through a function handling 'number' events,
+    best of 'repeat' runs.'''
+    best = None
+    for _ in xrange(repeat):
+        start = time()
+        function(number)
+        seconds = time() - start
+        best = seconds if best is None else min(best, seconds)
+    return number / best
+
+
+def event_create(number):
+    for i in xrange(number):
+        Event(i, i)
+
+
+def channel_put_get(number):
+    channel, event = Channel(), Event(0, 0)
+    for _ in xrange(number):
+        channel.put(event)
+        channel.get()
+
+
+def channel_head_drop(number):
+    channel, event = Channel(), Event(0, 0)
+    for _ in xrange(number):
+        channel.put(event)
+        channel.head()
+        channel.drop()
+
+
+def _signal(channel, number):
+    [channel.put(Event(i, 1.0)) for i in xrange(number)]
+    channel.put(LastEvent())
+
+
+def summer_align(number):
+    a, b, out = Channel('DT'), Channel('DT'), Channel('DT')
+    _signal(a, number)
+    _signal(b, number)
+    DTSummer([a, b], out).run()
+
+
+def merge_align(number):
+    a, b, out = Channel(), Channel(), Channel()
+    _signal(a, number / 2)
+    _signal(b, number / 2)
+    Merge([a, b], out).run()
+
+
+def bundle_unbundle(number):
+    a, b, out = Channel(), Channel(), Channel()
+    _signal(a, number)
+    Scheduler([Bundle(a, b), Unbundle(b, out)]).run()
+
+
+MICRO = [
+    ('event_create', event_create),
+    ('channel_put_get', channel_put_get),
+    ('channel_head_drop', channel_head_drop),
+    ('summer_align', summer_align),
+    ('merge_align', merge_align),
+    ('bundle_unbundle', bundle_unbundle),
+]
+
+
+IMPORTS = [
+    ('scipysim', 'import scipysim'),
+    ('core_channel', 'from scipysim.core import Channel'),
+    ('signal_ramp', 'from scipysim.actors.signal import Ramp'),
+    ('composite_actor', 'from scipysim.actors import CompositeActor'),
+]
+
+
+def import_time(statement, repeat=3):
+    '''Seconds taken by an import statement in a new interpreter, best of
+    'repeat' runs.'''
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.pardir)
+    script = ('from time import time\nstart = time()\n%s\nprint time() - start' % statement)
+    best = None
+    for _ in xrange(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=root)
+        seconds = float(output.split()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run_suite(models=None, scale=1.0, micro=True, number=100000, timeout=120, imports=True):
+    '''Run the benchmarks and return the results as a dictionary.'''
+    results = {'meta': {'date': datetime.now().isoformat(), 'python': platform.python_version(),
+                        'numpy': numpy.__version__, 'platform': platform.platform(),
+                        'scale': scale, 'number': number},
+               'models': {}, 'micro': {}, 'imports': {}}
+    for name in (model_names() if models is None else models):
+        result = results['models'][name] = run_model(name, scale, timeout)
+        if result['status'] == 'ok':
+            print '%-34s %8.3fs %10d events/s %8.1f MB' % (name, result['seconds'],
+                                                          result['events_per_second'], result['peak_rss_mb'])
+        else:
+            print '%-34s %s (%s)' % (name, result['status'], result['error'])
+    if micro:
+        logging.disable(logging.CRITICAL)
+        for name, function in MICRO:
+            per_second = rate(function, number)
+            results['micro'][name] = {'events_per_second': per_second}
+            print '%-34s %10d events/s' % (name, per_second)
+    if imports:
+        for name, statement in IMPORTS:
+            seconds = results['imports'][name] = {'seconds': import_time(statement)}
+            print '%-34s %8.3fs' % ('import ' + name, seconds['seconds'])
+    return results
+
+
+def regressions(results, baseline, threshold=0.2):
+    '''
+    Compare two sets of results, returning a description of each one that
+    is more than 'threshold' (a fraction) worse than in the baseline.
+    '''
+    found = []
+    for group in ('models', 'micro', 'imports'):
+        for name, old in sorted(baseline.get(group, {}).items()):
+            new = results.get(group, {}).get(name)
+            if new is None:
+                continue
+            if old.get('status', 'ok') == 'ok' and new.get('status', 'ok') != 'ok':
+                found.append('%s %s: %s' % (group, name, new['status']))
+                continue
+            for key, direction in sorted(DIRECTIONS.items()):
+                if key not in old or key not in new or not old[key]:
+                    continue
+                change = (new[key] - old[key]) / float(old[key])
+                if change * direction > threshold:
+                    found.append('%s %s: %s %.4g -> %.4g (%+.0f%%)' %
+                                 (group, name, key, old[key], new[key], 100 * change))
+    return found
+
+
+def main():
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--output', '-o', help="Write the results to FILE", metavar="FILE")
+    parser.add_option('--scale', help="Size of the scalable models (default 1)", type="float", default=1.0)
+    parser.add_option('--models', help="Comma separated models to run (default all)")
+    parser.add_option('--no-models', help="Don't run the models", action="store_true")
+    parser.add_option('--no-micro', help="Don't run the microbenchmarks", action="store_true")
+    parser.add_option('--no-imports', help="Don't time the imports", action="store_true")
+    parser.add_option('--number', help="Events per microbenchmark (default 100000)", type="int", default=100000)
+    parser.add_option('--timeout', help="Seconds before a model is stopped (default 120)", type="float", default=120)
+    parser.add_option('--results', help="Compare the results in FILE instead of running", metavar="FILE")
+    parser.add_option('--compare', help="Check the results against a baseline FILE", metavar="FILE")
+    parser.add_option('--threshold', help="Fraction worse that is a regression (default 0.2)",
+                      type="float", default=0.2)
+    (options, args) = parser.parse_args()
+
+    if options.results:
+        with open(options.results) as saved:
+            results = json.load(saved)
+    else:
+        models = [] if options.no_models else options.models and options.models.split(',')
+        results = run_suite(models, options.scale, not options.no_micro, options.number, options.timeout,
+                            not options.no_imports)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as saved:
+            baseline = json.load(saved)
+        found = regressions(results, baseline, options.threshold)
+        for regression in found:
+            print 'REGRESSION', regression
+        if found:
+            sys.exit(1)
+        print 'No regressions against %s' % options.compare
+
+
+if __name__ == '__main__':
+    main()
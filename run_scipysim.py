@@ -5,6 +5,32 @@ A launch script that should work on windows too.
 Runs scipysim, either by executing a specified
 model, or in the absence of a model by starting
 the scipysim GUI.
+
+A model can also be run headless for every combination
+of some parameters, in parallel:
+
+    run_scipysim --sweep N=1,2,3,6,12,20 central_limit_theorem
+
+A long run can save checkpoints, and be resumed from the last one if
+it is stopped:
+
+    run_scipysim --checkpoint run.ckpt qs_sin_plot
+    run_scipysim --resume run.ckpt
+
+The signals of the deterministic front end of a model can be kept in a
+cache directory and replayed by later runs:
+
+    run_scipysim --cache ~/.scipysim-cache dsp
+
+The models and actors, with their inputs, outputs and domains, are listed
+from the catalog (see scipysim.core.catalog) by:
+
+    run_scipysim --list
+
+The debugging messages of every firing or event of the actors are shown by
+enabling their tracepoints (see scipysim.core.tracepoint), by module name:
+
+    run_scipysim --tracepoints 'scipysim.actors.math.*' sum_sin_plot
 '''
 
 from runpy import run_module
@@ -20,6 +46,30 @@ def main(modelname=None):
         # TODO: Check if modelname is valid
         run_module('scipysim.models.' + modelname, run_name="__main__")
 
+def run_sweep(modelname, specs, workers=None, timeout=None):
+    from importlib import import_module
+    from scipysim.core.sweep import sweep, parse_grid, find_model
+    model = find_model(import_module('scipysim.models.' + modelname))
+    result = sweep(model, parse_grid(specs), workers=workers, timeout=timeout)
+    print result.table()
+
+def list_blocks():
+    from os import path
+    from scipysim.core import Catalog
+    catalog = Catalog()
+    root = path.dirname(scipysim.__file__)
+    for group in ('models', 'actors'):
+        print group.title()
+        for node, entry in sorted(catalog.entries(path.join(root, group)).items()):
+            domains = '%s -> %s' % tuple(','.join(map(str, domains or ()))
+                                         for domains in (entry.input_domains, entry.output_domains))
+            print '    %-40s %-28s %4s %4s  %s' % (node, entry.name, entry.num_inputs, entry.num_outputs, domains)
+    catalog.save()
+
+def resume(path):
+    from scipysim.core import restore
+    restore(path).run(checkpoint=path)
+
 def test(verbose=False):
     print "Running tests (requires nose)"
     import nose
@@ -29,14 +79,51 @@ if __name__ == "__main__":
     usage = "usage: %prog [options] [modelname]"
     parser = OptionParser(usage=usage)
     parser.add_option('--test', '-t', help="Run tests", action = "store_true")
-    parser.add_option('--list', '-l', help="List scipy-sim models", action = "store_true")
+    parser.add_option('--list', '-l', help="List scipy-sim models and actors", action = "store_true")
+    parser.add_option('--sweep', '-s', help="Run the model headless for each value of a parameter, given as name=value,value,...",
+                      action="append", metavar="PARAM")
+    parser.add_option('--workers', '-w', help="Number of processes for a sweep", type="int")
+    parser.add_option('--timeout', help="Seconds before a run of a sweep is stopped", type="float")
+    parser.add_option('--trace', help="Write a Chrome trace of the model's run to FILE", metavar="FILE")
+    parser.add_option('--checkpoint', help="Save checkpoints of the model's run to FILE", metavar="FILE")
+    parser.add_option('--checkpoint-interval', help="Seconds between checkpoints (default 60)", type="float")
+    parser.add_option('--resume', help="Continue the run saved in the checkpoint FILE", metavar="FILE")
+    parser.add_option('--tracepoints', help="Log the messages of the tracepoints whose names match PATTERN",
+                      action="append", metavar="PATTERN")
+    parser.add_option('--cache', help="Replay and store the signals of the model's deterministic actors in DIR",
+                      metavar="DIR")
     (options, args) = parser.parse_args()
     
     if options.test:
         test()
+
+    if options.tracepoints:
+        import logging
+        from scipysim.core.tracepoint import enable
+        logging.basicConfig(level=logging.DEBUG)
+        for pattern in options.tracepoints:
+            enable(pattern)
+    if options.trace:
+        from scipysim.core import CompositeActor
+        CompositeActor.default_trace = options.trace
+    if options.checkpoint:
+        from scipysim.core import CompositeActor
+        CompositeActor.default_checkpoint = options.checkpoint
+    if options.cache:
+        from scipysim.core import CompositeActor, ResultCache
+        CompositeActor.default_cache = ResultCache(options.cache)
+    if options.checkpoint_interval:
+        from scipysim.core import CompositeActor
+        CompositeActor.checkpoint_interval = options.checkpoint_interval
     
     if options.list:
-        print "TODO: Import codegroup from scipysim.core"
+        list_blocks()
+    elif options.resume:
+        resume(options.resume)
+    elif options.sweep:
+        if not args:
+            parser.error("--sweep needs a model")
+        run_sweep(args[0], options.sweep, options.workers, options.timeout)
     else:
         model = (len(args) > 0) and [args[0]][0] or None
         print "model = ", model
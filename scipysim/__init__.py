@@ -1,5 +1,9 @@
 '''The scipy-simulator'''
 
-from core import Event, LastEvent, Channel, Actor, Source, InvalidSimulationInput, NoProcessFunctionDefined
-import models
-import actors
+from core.util.lazy import lazy_package
+
+# The core and the models and actors are only imported when first used
+lazy_package(__name__, dict(
+    [(name, 'scipysim.core') for name in ['Event', 'LastEvent', 'Channel', 'Actor', 'Source',
+                                          'InvalidSimulationInput', 'NoProcessFunctionDefined']] +
+    [('core', 'core'), ('models', 'models'), ('actors', 'actors')]))
@@ -1,26 +1,19 @@
 """Scipy Simulator API: actors and components
 
 From this module there are several submodules containing groups 
-of actors.
+of actors, each only imported when it is first used.
 """
-# First we import the bits that every block will probably need
-from scipysim.core import Actor, Event, LastEvent, CompositeActor
-from scipysim.core import Channel, MakeChans, MakeNamedChans
-from scipysim.core import Source, DisplayActor
-from scipysim.core import Siso, SisoCTTestHelper, SisoTestHelper
-from scipysim.core import InvalidSimulationInput
-"""
-# Then we can import submodules
-import display
-import io
-import logic
-import math
-import signal
-import string
-"""
-# Then we would import any composite blocks
-# But they are now in their own module
+from scipysim.core.util.lazy import lazy_package
+
+# The bits that every block will probably need, and the submodules
+lazy_package(__name__, dict(
+    [(name, 'scipysim.core') for name in [
+        'Actor', 'Event', 'LastEvent', 'EventBlock', 'CompositeActor',
+        'Channel', 'MakeChans', 'MakeNamedChans', 'Source', 'DisplayActor',
+        'Siso', 'SisoCTTestHelper', 'SisoTestHelper', 'InvalidSimulationInput']] +
+    [(name, name) for name in ['display', 'io', 'logic', 'math', 'signal', 'strings']]))
 
+# Composite blocks are in their own module
 
 # This requires pygame... just for kicks
 #from VideoSnapshot import VideoSnapshot
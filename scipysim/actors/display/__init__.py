@@ -1,8 +1,13 @@
 """Display module for Scipy Simulator.
 Contains actors for plotting and creating images of plots.
 """
-from plotter import Plotter
-from plotter import StemPlotter
-from stemmer import Stemmer
-from bundlePlotter import BundlePlotter
-from bundleHistPlotter import BundleHistPlotter
+
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'Plotter': 'plotter',
+    'StemPlotter': 'plotter',
+    'Stemmer': 'stemmer',
+    'BundlePlotter': 'bundlePlotter',
+    'BundleHistPlotter': 'bundleHistPlotter',
+})
@@ -18,9 +18,8 @@ import logging
 
 
 
-from urllib import quote
 
-class BundleHistPlotter(Actor):
+class BundleHistPlotter(DisplayActor):
     '''
     A plot that is NOT dynamic. It takes a packet or bundle of events
     and plots it all at once.
@@ -44,6 +43,7 @@ class BundleHistPlotter(Actor):
             self.stop = True
         else:
             assert type(self.data) == numpy.ndarray
+            from urllib import quote
             url = self.save_image()
             url = "file://" + quote(url)
             logging.info("URL for image file is: '%s'" % url)
@@ -66,7 +66,8 @@ class BundleHistPlotter(Actor):
         canvas = FigureCanvas(f)
 
         a = f.add_subplot(111)
-        a.hist(self.y_axis_data, self.bins)
+        # Every member of an ensemble goes in the one histogram
+        a.hist(self.y_axis_data.ravel(), self.bins)
         a.set_title(self.title)
         a.grid(True)
 
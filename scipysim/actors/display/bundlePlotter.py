@@ -15,9 +15,8 @@ import numpy
 import logging
 #logging.basicConfig( level=logging.DEBUG )
 
-from urllib import quote
 
-class BundlePlotter(Actor):
+class BundlePlotter(DisplayActor):
     '''
     A plot that is NOT dynamic. It takes a packet or bundle of events
     and plots it all at once.
@@ -40,6 +39,7 @@ class BundlePlotter(Actor):
             self.stop = True
         else:
             assert type(self.data) == numpy.ndarray
+            from urllib import quote
             url = self.save_image()
             url = "file://" + quote(url)
             logging.info("URL for image file is: '%s'" % url)
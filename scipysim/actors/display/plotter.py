@@ -23,6 +23,7 @@ from multiprocessing import Event as MEvent
 
 from scipysim import Actor, Channel, Event, LastEvent
 from scipysim.core.actor import DisplayActor
+from scipysim.core.errors import SimulationDeadlock
 
 import time
 
@@ -59,6 +60,8 @@ class New_Process_Actor(Actor):
     an instance of the Actor class passed to it in a second thread, and starts
     that actor.
     '''
+    cooperative = False
+
     def __init__(self, cls, *args, **kwargs):
         super(New_Process_Actor, self).__init__()
         self.cls = cls
@@ -94,6 +97,8 @@ class Channel2Process(Actor):
     
     This Actor (thread) must be called from the side which has the channel.
     '''
+    cooperative = False
+
     def __init__(self, channel, ready_event, queue):
         super(Channel2Process, self).__init__()
         self.channel = channel
@@ -110,7 +115,11 @@ class Channel2Process(Actor):
             logging.info("Channel2Process done waiting for process")
             self.first_time = False
 
-        obj = self.channel.get(True)
+        try:
+            obj = self.channel.get(True)
+        except SimulationDeadlock:
+            # The simulation failed, end the plot with what it has
+            obj = LastEvent()
         self.queue.put(obj)
  
         if obj.last:
@@ -299,23 +308,33 @@ class BaseStemmer(BasePlotter):
         self.canvas.draw()
 
 
-class Plotter(Actor):
+class Plotter(DisplayActor):
     '''Plot continuous data as a smooth line.'''
+    cooperative = False
+
     def __init__(self, *args, **kwargs):
         super(Plotter, self).__init__()
         self.npa = New_Process_Actor(BasePlotter, *args, **kwargs)
-        
+
+    def get_input_channels(self):
+        return [self.npa.c2p.channel]
+
     def run(self):
         self.npa.start()
         self.npa.join()
 
 
-class StemPlotter(Actor):
+class StemPlotter(DisplayActor):
     '''Plot discrete data as a sequence of stems.'''
+    cooperative = False
+
     def __init__(self, *args, **kwargs):
         super(StemPlotter, self).__init__()
         self.npa = New_Process_Actor(BaseStemmer, *args, **kwargs)
 
+    def get_input_channels(self):
+        return [self.npa.c2p.channel]
+
     def run(self):
         self.npa.start()
         self.npa.join()
@@ -5,6 +5,7 @@ This dynamic stemmer shows a live signal stream.
 '''
 
 from scipysim.actors import DisplayActor
+from scipysim.core.tracepoint import tracepoint
 
 import logging
 import threading
@@ -13,6 +14,8 @@ GUI_LOCK = threading.Condition()
 
 import time
 
+trace = tracepoint(__name__)
+
 class Stemmer(DisplayActor):
     '''
     This actor shows a signal dynamically as it comes off the buffer with matplotlib.
@@ -94,7 +97,8 @@ class Stemmer(DisplayActor):
 
         self.x_axis_data.append(obj['tag'])
         self.y_axis_data.append(obj['value'])
-        logging.debug("Stemmer received values ( %e,%e ) Now have %i values." % (self.y_axis_data[-1], self.x_axis_data[-1], len(self.x_axis_data)))
+        if trace.enabled:
+            trace("Stemmer received values ( %e,%e ) Now have %i values.", self.y_axis_data[-1], self.x_axis_data[-1], len(self.x_axis_data))
         obj = None
 
         if time.time() - self.last_update > 1.0 / self.refresh_rate:
@@ -106,7 +110,8 @@ class Stemmer(DisplayActor):
         Update the internal data stored by matplotlib and cause a redraw.
         If this has been called more than 1000 times -> quit.
         '''
-        logging.debug("Updating plot (refresh: %i)" % self.refreshs)
+        if trace.enabled:
+            trace("Updating plot (refresh: %i)", self.refreshs)
         self.last_update = time.time()
 
         # This is a safety check - if we are plotting over a long time period this needs removing
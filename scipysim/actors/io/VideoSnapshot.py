@@ -9,10 +9,7 @@ import logging
 import numpy
 from scipysim import Source, Actor, Channel, Event, LastEvent
 
-import logging
 verbose = True
-LOG_FILENAME = None
-logging.basicConfig(filename=LOG_FILENAME, level=logging.DEBUG)
 WIDTH, HEIGHT = 320, 240
 
 
@@ -34,6 +31,7 @@ if havePygame:
         This component polls a connected webcam, returning the latest
         single image when requested.
         '''
+        deterministic = False
 
         def __init__(self, input_signal, output_channel, device=0, max_freq=10, size=(WIDTH, HEIGHT), grey=True):
             """
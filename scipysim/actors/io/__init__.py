@@ -5,7 +5,14 @@ memory efficient form.
 
 The Reader and Writer actors read and write data channels into a file.
 '''
-from bundle import Bundle
-from unbundle import Unbundle
-from reader import Reader, TextReader
-from writer import Writer, TextWriter
+
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'Bundle': 'bundle',
+    'Unbundle': 'unbundle',
+    'Reader': 'reader',
+    'TextReader': 'reader',
+    'Writer': 'writer',
+    'TextWriter': 'writer',
+})
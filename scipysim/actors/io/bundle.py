@@ -1,11 +1,12 @@
 
-import logging
 from scipysim.actors import Actor, Channel
-
+from scipysim.core.tracepoint import tracepoint
 
 import unittest
 import numpy
 
+trace = tracepoint(__name__)
+
 class Bundle(Actor):
     '''
     This buffering/compressing/bundling actor takes a source 
@@ -35,29 +36,31 @@ class Bundle(Actor):
 
     def process(self):
         """Send packets of events at one time"""
-        logging.debug("Running buffer/bundle process")
+        if trace.enabled:
+            trace("Running buffer/bundle process")
         obj = self.input_channel.get(True)     # this is blocking
         if not obj.last:
             self.temp_data.append(obj)
         if obj.last or self.bundle_size is not None and len(self.temp_data) >= self.bundle_size:
             self.send_bundle()
 
+            self.temp_data = []
             if obj.last:
                 self.output_channel.put(obj) # Propagate termination
                 self.stop = True
-            else:
-                self.temp_data = []
 
     def send_bundle(self):
         '''
         Create a numpy data type that can carry all the 
         information then add it to the output channel
         '''
+        # Ensemble values (see RandomSource) are bundled as sub-arrays
+        shape = numpy.shape(self.temp_data[0]['value']) if self.temp_data else ()
         x = numpy.zeros(len(self.temp_data),
                             dtype=
                             {
                                 'names': ["Tag", "Value"],
-                                'formats': ['f8', 'f8'],
+                                'formats': ['f8', ('f8', shape) if shape else 'f8'],
                                 'titles': ['Domain', 'Name']    # This might not get used...
                              }
                         )
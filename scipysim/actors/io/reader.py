@@ -24,6 +24,9 @@ class Reader(Source):
     The data can be recovered as seperate arrays with data['Tag'] and data['Value']
     or it can be treated as a list of event tuples.
     '''
+    # The file can change between runs
+    deterministic = False
+
     def __init__(self, output_channel, file_name):
         super(Reader, self).__init__(output_channel=output_channel)
         self.filename = file_name
@@ -39,6 +42,8 @@ class TextReader(Source):
     '''
     This source creates string objects from a file.
     '''
+    deterministic = False
+
     def __init__(self, output_channel, filename, send_as_words=False):
         '''A TextReader requires a valid filename to read from.
         The data may be sent as lines or words, lines are the
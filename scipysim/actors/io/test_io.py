@@ -135,6 +135,16 @@ class BundleTests(unittest.TestCase):
         self.assertEqual(actual_output.size, 20)
         self.assertTrue(self.q_out.get().last)
 
+    def test_bundle_ensemble(self):
+        '''Values that are arrays are bundled as sub-arrays'''
+        block = Bundle(self.q_in, self.q_out)
+        [self.q_in.put(Event(i, numpy.array([i, -i]))) for i in xrange(10)]
+        self.q_in.put(LastEvent())
+        block.run()
+        actual_output = self.q_out.get()
+        self.assertEqual(actual_output['Value'].shape, (10, 2))
+        self.assertEqual(list(actual_output['Value'][3]), [3, -3])
+
     def test_unbundle(self):
         '''Test the unbundler and the bundler'''
         bundler = Bundle(self.q_in, self.q_out)
@@ -1,4 +1,8 @@
-from compare import Compare
-from greaterthan import GreaterThan
-from lessthan import LessThan
-from passthrough import PassThrough
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'Compare': 'compare',
+    'GreaterThan': 'greaterthan',
+    'LessThan': 'lessthan',
+    'PassThrough': 'passthrough',
+})
@@ -9,8 +9,11 @@ Created on 13/12/2009
 '''
 
 from scipysim.actors import Actor, LastEvent
+from scipysim.core.tracepoint import tracepoint
 import logging
 
+trace = tracepoint(__name__)
+
 class PassThrough(Actor):
     '''
     This actor takes a boolean tagged signal and a data channel.
@@ -46,13 +49,21 @@ class PassThrough(Actor):
 
         logging.info("We have set up a pass through actor")
 
+    def get_input_channels(self):
+        inputs = [self.bool_input, self.data_input]
+        if self.has_else_clause:
+            inputs.append(self.else_data_input)
+        return inputs
+
     def process(self):
         """Wait for data from both input channels"""
-        logging.debug("Running pass-through, blocking on both channels")
+        if trace.enabled:
+            trace("Running pass-through, blocking on both channels")
 
         # this is blocking on each channel in sequence
         bool_in = self.bool_input.get(True)
-        logging.debug("Got a boolean value, waiting for data point")
+        if trace.enabled:
+            trace("Got a boolean value, waiting for data point")
         data_in = self.data_input.get(True)
 
         if self.has_else_clause:
@@ -64,16 +75,19 @@ class PassThrough(Actor):
             self.stop = True
             self.output_channel.put(LastEvent(bool_in.tag))
             return
-        logging.debug("Received a boolean and a data point. Tags = (%e,%e)" % (bool_in.tag, data_in.tag))
+        if trace.enabled:
+            trace("Received a boolean and a data point. Tags = (%e,%e)", bool_in.tag, data_in.tag)
 
         # For now we require the signals are in sync
         assert bool_in.tag == data_in.tag
 
         if bool_in.value is True:
-            logging.debug("The input was positive, passing data through")
+            if trace.enabled:
+                trace("The input was positive, passing data through")
             self.output_channel.put(data_in)
         else:
             if self.has_else_clause:
                 self.output_channel.put(else_data_in)
             else:
-                logging.debug("Discarding data.")
+                if trace.enabled:
+                    trace("Discarding data.")
@@ -1,16 +1,19 @@
 """Math module for scipy sim"""
 
-import trig
+from scipysim.core.util.lazy import lazy_package
 
-from abs import Abs
-from constant import Constant
-from ct_integrator import CTIntegratorForwardEuler
-from ct_integrator_qs1 import CTIntegratorQS1
-from derivative import BundleDerivative
-from dt_integrator import DTIntegratorBackwardEuler
-from dt_integrator import DTIntegratorForwardEuler
-from dt_integrator import DTIntegratorTrapezoidal
-from proportional import Proportional
-from summer import Summer
-from summer import CTSummer
-from summer import DTSummer
\ No newline at end of file
+lazy_package(__name__, {
+    'trig': 'trig',
+    'Abs': 'abs',
+    'Constant': 'constant',
+    'CTIntegratorForwardEuler': 'ct_integrator',
+    'CTIntegratorQS1': 'ct_integrator_qs1',
+    'BundleDerivative': 'derivative',
+    'DTIntegratorBackwardEuler': 'dt_integrator',
+    'DTIntegratorForwardEuler': 'dt_integrator',
+    'DTIntegratorTrapezoidal': 'dt_integrator',
+    'Proportional': 'proportional',
+    'Summer': 'summer',
+    'CTSummer': 'summer',
+    'DTSummer': 'summer',
+})
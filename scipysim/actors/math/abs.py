@@ -3,7 +3,8 @@ Created on 9/12/2009
 
 @author: brian
 '''
-from scipysim.actors import Siso, Event
+import numpy
+from scipysim.actors import Siso, Event, EventBlock
 
 class Abs(Siso):
     '''
@@ -17,8 +18,8 @@ class Abs(Siso):
                                   output_channel=output_channel)
 
     def siso_process(self, event):
-        tag, value = event.tag, event.value
-        if value < 0:
-            value *= -1
-        return Event(tag, value)
+        return Event(event.tag, abs(event.value))
+
+    def siso_process_block(self, block):
+        return EventBlock(block.tag, numpy.abs(block.value))
 
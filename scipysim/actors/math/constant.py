@@ -4,34 +4,40 @@ Created on 23/11/2009
 @author: brian
 '''
 import logging
-from numpy import linspace
-from scipysim.actors import Source, Event, LastEvent
+from scipysim.actors import Source, Event, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 class Constant(Source):
     '''
     This actor is a constant value source
     '''
 
-    def __init__(self, out, value=1.0, resolution=10, simulation_time=120, endpoint=False):
+    def __init__(self, out, value=1.0, resolution=10, simulation_time=120, endpoint=False, block_size=1024):
         """
         default parameters creates a constant output of 1.0 for 2 minutes (with 10 values per "second")
 
+        The signal is sent in blocks of block_size events, one per firing.
         """
         super(Constant, self).__init__(output_channel=out, simulation_time=simulation_time)
         self.resolution = resolution
         self.endpoint = endpoint
         self.value = value
+        self.block_size = block_size
 
 
     def process(self):
-        """Create the numbers..."""
-        logging.debug("Running ramp process")
-        tags = linspace(0, self.simulation_time, self.simulation_time * self.resolution, endpoint=self.endpoint)  # for now just compute 2 minutes of values
-
-        [self.output_channel.put(Event(tag, self.value)) for tag in tags]
-
-        #time.sleep(random.random() * 0.001)     # Adding a delay so we can see the async
-        logging.debug("Const process finished adding all data to its output channel")
-        self.stop = True
-        self.output_channel.put(LastEvent(self.simulation_time))
+        """Create the next block of numbers..."""
+        if trace.enabled:
+            trace("Running constant process")
+        tags = self.sample_block(self.resolution, self.endpoint, self.block_size)
+
+        if len(tags):
+            self.output_channel.put(EventBlock(tags, [self.value] * len(tags)))
+
+        if len(tags) < self.block_size:
+            logging.debug("Const process finished adding all data to its output channel")
+            self.stop = True
+            self.output_channel.put(LastEvent(self.simulation_time))
 
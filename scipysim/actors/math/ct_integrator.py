@@ -42,7 +42,7 @@ class CTIntegratorForwardEuler(CTIntegrator):
     def integrate(self, event):
         ''' y[n] = y[n-1] + x[n]*(t[n]-t[n-1])'''
         self.y = self.y_old
-        self.y_old += event.value * (event.tag - self.t_old)
+        self.y_old = self.y_old + event.value * (event.tag - self.t_old)
 
         self.t_old = event.tag
 
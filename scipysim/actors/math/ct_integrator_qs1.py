@@ -139,6 +139,12 @@ class CTIntegratorQS1(Siso):
         self.next_t = self.last_t + self.__timestep()  # Next output time
 
 
+    def next_internal_transition(self):
+        return self.next_t
+
+    def internal_transition(self):
+        self.__internal_transition()
+
     def __str__(self):
         '''
         Converts the current integrator state to a string.
@@ -16,7 +16,14 @@ input time tags.
 Created on 9/12/2009
 Additional integration algorithms added 08/02/2010
 '''
-from scipysim.actors import Actor, Channel, Event, LastEvent, Siso
+from numpy import cumsum, concatenate, broadcast_to
+from scipysim.actors import Actor, Channel, Event, LastEvent, EventBlock, Siso
+
+def _prepend(first, values):
+    '''The values with one more in front, broadcast to the shape of the
+    others (e.g. a scalar initial state before a block of ensembles).'''
+    return concatenate((broadcast_to(first, (1,) + values.shape[1:]), values))
+
 
 class DTIntegrator(Siso):
     '''
@@ -58,16 +65,33 @@ class DTIntegratorBackwardEuler(DTIntegrator):
         out_event = Event(event.tag, self.y)
         return out_event
 
+    def siso_process_block(self, block):
+        ''' y[n] = y[n-1] + x[n] for every event in the block '''
+        if not len(block):
+            return block
+        # Summing from y[-1] keeps the same rounding as event by event
+        y = cumsum(_prepend(self.y_old, block.value), axis=0)[1:]
+        self.y = self.y_old = y[-1]
+        return EventBlock(block.tag, y)
+
 class DTIntegratorForwardEuler(DTIntegrator):
     '''Forward Euler (aka Forward Rectangular) discrete-time integration.'''
     def integrate(self, event):
         ''' y[n] = y[n-1] + x[n-1] '''
         self.y = self.y_old
-        self.y_old += event.value
+        self.y_old = self.y_old + event.value
         # Generate output event
         out_event = Event(event.tag, self.y)
         return out_event
 
+    def siso_process_block(self, block):
+        ''' y[n] = y[n-1] + x[n-1] for every event in the block '''
+        if not len(block):
+            return block
+        sums = cumsum(_prepend(self.y_old, block.value), axis=0)
+        self.y, self.y_old = sums[-2], sums[-1]
+        return EventBlock(block.tag, sums[:-1])
+
 
 class DTIntegratorTrapezoidal(DTIntegrator):
     '''Trapezoidal discrete-time integration.'''
@@ -86,6 +110,17 @@ class DTIntegratorTrapezoidal(DTIntegrator):
         out_event = Event(event.tag, self.y)
         return out_event
 
+    def siso_process_block(self, block):
+        ''' y[n] = y[n-1] + 0.5*(x[n] + x[n-1]) for every event in the block '''
+        if not len(block):
+            return block
+        x = block.value
+        x_old = _prepend(self.x_old, x[:-1])
+        y = cumsum(_prepend(self.y_old, 0.5 * (x + x_old)), axis=0)[1:]
+        self.x_old = x[-1]
+        self.y = self.y_old = y[-1]
+        return EventBlock(block.tag, y)
+
 
 
 import unittest
@@ -156,5 +191,43 @@ class DTIntegratorTests(unittest.TestCase):
             self.assertEquals(out.value, expected_output)
         self.assertTrue(self.q_out.get().last)
 
+    def test_blocks_match_events(self):
+        '''Integrating blocks gives the same result as single events.'''
+        values = [0.1 * i for i in xrange(50)]
+        for integrator in [DTIntegratorBackwardEuler, DTIntegratorForwardEuler, DTIntegratorTrapezoidal]:
+            q_in, q_out, q_in_blocks, q_out_blocks = Channel('DT'), Channel('DT'), Channel('DT'), Channel('DT')
+            [q_in.put(Event(i, v)) for i, v in enumerate(values)]
+            q_in.put(LastEvent())
+            q_in_blocks.put(EventBlock(range(20), values[:20]))
+            q_in_blocks.put(EventBlock(range(20, 50), values[20:], last=True))
+            integrator(q_in, q_out).run()
+            integrator(q_in_blocks, q_out_blocks).run()
+
+            for i in xrange(50):
+                self.assertEquals(q_out_blocks.get(), q_out.get())
+            self.assertTrue(q_out_blocks.get().last)
+
+    def test_ensemble(self):
+        '''Each member of an ensemble is integrated separately.'''
+        from numpy import array, allclose
+        values = array([[0.1 * i, -i, 2.0] for i in xrange(20)])
+        for integrator in [DTIntegratorBackwardEuler, DTIntegratorForwardEuler, DTIntegratorTrapezoidal]:
+            q_in, q_out, q_in_blocks, q_out_blocks = Channel('DT'), Channel('DT'), Channel('DT'), Channel('DT')
+            [q_in.put(Event(i, v)) for i, v in enumerate(values)]
+            q_in.put(LastEvent())
+            q_in_blocks.put(EventBlock(range(20), values, last=True))
+            integrator(q_in, q_out).run()
+            integrator(q_in_blocks, q_out_blocks).run()
+
+            block = q_out_blocks.get_block()
+            self.assertEquals(block.value.shape, (20, 3))
+            for i, y in enumerate(block.value):
+                self.assertTrue(allclose(q_out.get().value, y))
+            for member in xrange(3):
+                q_in, q_out = Channel('DT'), Channel('DT')
+                q_in.put(EventBlock(range(20), values[:, member], last=True))
+                integrator(q_in, q_out).run()
+                self.assertTrue(allclose(q_out.get_block().value, block.value[:, member]))
+
 if __name__ == "__main__":
     unittest.main()
@@ -4,8 +4,10 @@ Created on 23/11/2009
 @author: Brian Thorne
 '''
 
-import logging
-from scipysim.actors import Siso, Channel, Event, LastEvent
+from scipysim.actors import Siso, Channel, Event, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 class Proportional(Siso):
     '''
@@ -23,14 +25,19 @@ class Proportional(Siso):
 
     def siso_process(self, event):
         """Multiply the input values by a gain..."""
-        logging.debug("Running proportional process")
+        if trace.enabled:
+            trace("Running proportional process")
         tag, value = event.tag, event.value
 
         new_value = value * self.gain
-        logging.debug( "Proportional actor received data (tag: %2.e, value: %2.e ), multiplied and sent out: (tag: %2.e, value: %2.e)" % ( tag, value, tag, new_value ) )
+        if trace.enabled:
+            trace("Proportional actor received data (tag: %2.e, value: %s ), multiplied and sent out: (tag: %2.e, value: %s)", tag, value, tag, new_value)
 
         return Event(tag, new_value)
 
+    def siso_process_block(self, block):
+        return EventBlock(block.tag, block.value * self.gain)
+
 import unittest
 class ProportionalTests(unittest.TestCase):
     '''Test the Proportional Actor'''
@@ -54,5 +61,17 @@ class ProportionalTests(unittest.TestCase):
             self.assertEquals(out.tag, expected_output[i].tag)
         self.assertTrue(q_out.get().last)
 
+    def test_block_proportional(self):
+        '''Test multiplying a block of events.'''
+        q_in = Channel()
+        q_out = Channel()
+        q_in.put(EventBlock(range(100), [1] * 100, last=True))
+        Proportional(q_in, q_out, gain=3).run()
+
+        out = q_out.get_block()
+        self.assertEquals(list(out.tag), range(100))
+        self.assertEquals(list(out.value), [3] * 100)
+        self.assertTrue(out.last)
+
 if __name__ == "__main__":
     unittest.main()
@@ -11,6 +11,9 @@ import logging
 from numpy import inf as infinity
 import numpy
 from scipysim.actors import Actor, Channel, Event, LastEvent
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 class BaseSummer(Actor):
     '''
@@ -64,7 +67,8 @@ class BaseSummer(Actor):
         untouched, and will be checked again the next time the process runs.
         '''
 
-        logging.debug("Summer: running")
+        if trace.enabled:
+            trace("Summer: running")
 
         # Block on each channel in sequence. We can't make a decision
         # on the sum until we have events (and thus tags) on every channel.
@@ -109,6 +113,9 @@ class BaseSummer(Actor):
         '''
         raise NotImplementedError
 
+    def get_input_channels(self):
+        return self.inputs
+
 
 class DTSummer(BaseSummer):
     '''
@@ -136,6 +143,9 @@ class DTSummer(BaseSummer):
         super(DTSummer, self).__init__(inputs = inputs, output_channel=output_channel)
         self.discard_incomplete = discard_incomplete_sets
 
+    def get_rates(self):
+        return ((1,) * self.num_inputs, (1,))
+
 
     def sum(self, oldest_tag, events):
         """Sum all events at the oldest tag value, and ignore all others."""
@@ -226,6 +236,9 @@ class Summer:
             raise NotImplementedError, "No summer for " + domain + " domain."
 
     def __getattr__(self, arg):
+        if arg == '_Summer__summer':
+            # Not set yet, e.g. while unpickling
+            raise AttributeError(arg)
         return getattr(self.__summer, arg)
 
 
@@ -254,6 +267,24 @@ class SummerTests(unittest.TestCase):
             self.assertEquals(q_out.get()['value'], 3)
         self.assertTrue(q_out.get().last)
 
+    def test_ensemble_summer(self):
+        '''Test adding ensembles of random signals'''
+        from scipysim.actors.signal import RandomSource
+        q_in_1 = Channel('DT')
+        q_in_2 = Channel('DT')
+        q_out = Channel('DT')
+        RandomSource(q_in_1, simulation_time=1, ensemble=1000).run()
+        RandomSource(q_in_2, simulation_time=1, ensemble=1000).run()
+        Summer([q_in_1, q_in_2], q_out).run()
+        for i in xrange(10):
+            value = q_out.get().value
+            self.assertEquals(value.shape, (1000,))
+            self.assertTrue(0 <= value.min() and value.max() <= 2)
+            # Triangular distribution: mean 1, variance 1/6
+            self.assertAlmostEquals(value.mean(), 1, 1)
+            self.assertAlmostEquals(value.var(), 1.0 / 6, 1)
+        self.assertTrue(q_out.get().last)
+
     def test_input_domain_check(self):
         def run():
             q_in_1 = Channel('DT')
@@ -11,13 +11,19 @@ class CTSinGenerator(Source):
     output_domains = ("CT",)
 
     def __init__(self, out, amplitude=1.0, freq=1.0, phi=0.0, timestep=0.001, simulation_time=10):
-        super(CTSinGenerator, self).__init__(output_channel=out)
-        self.chan = Channel()
+        super(CTSinGenerator, self).__init__(output_channel=out, simulation_time=simulation_time)
+        # Unbounded, as the ramp's block is put before the sin reads it
+        self.chan = Channel(capacity=0)
         self.ramp = Ramp(self.chan, resolution=1.0 / timestep, simulation_time=simulation_time)
         self.sin = Sin(self.chan, self.output_channel, amplitude=amplitude, freq=freq, phi=phi)
 
     def process(self):
-        components = [self.sin, self.ramp]
-        [c.start() for c in components]
-        [comp.join() for comp in components]
-        self.stop = True
+        '''Fire the ramp once and the sin on what it made, on this thread.'''
+        self.ramp.process()
+        while not self.sin.stop and not self.chan.empty():
+            self.sin.process()
+        self.stop = self.sin.stop
+
+    def extend(self, simulation_time):
+        super(CTSinGenerator, self).extend(simulation_time)
+        [c.extend(simulation_time) for c in (self.ramp, self.sin)]
@@ -23,7 +23,7 @@ class DTSinGenerator(Source):
         
         @param out: output channel
         '''
-        super(DTSinGenerator, self).__init__(output_channel=out)
+        super(DTSinGenerator, self).__init__(output_channel=out, simulation_time=simulation_length)
 
         logging.debug("Setting model paramaters.")
         self.amplitude = amplitude
@@ -34,7 +34,8 @@ class DTSinGenerator(Source):
         assert out.domain is "DT"
 
         logging.info('Constructing the inner actors that make up this "model"')
-        self.chan1 = Channel()
+        # Unbounded, as the ramp's block is put before the sin reads it
+        self.chan1 = Channel(capacity=0)
 
         # The values of the ramp will be ignored, it just provides the "clock"
         self.ramp = Ramp(self.chan1, resolution=1, simulation_time=self.simulation_length)
@@ -44,10 +45,19 @@ class DTSinGenerator(Source):
         logging.info("Inner actors have been constructed")
 
     def process(self):
-        logging.info("Running the DTSinGen model, starting inner components")
-        components = [self.ramp, self.sin]
-        [comp.start() for comp in components]
-        logging.info("Inner components started, waiting for simulation to finish.")
-        [comp.join() for comp in components]
-        self.stop = True
-        logging.info("Model has finished running.")
+        '''
+        Fire the inner actors in turn on this thread, so that the generator
+        is cooperative: the ramp makes its next block and the sin turns it
+        into the next block of the output.
+        '''
+        self.ramp.process()
+        while not self.sin.stop and not self.chan1.empty():
+            self.sin.process()
+        self.stop = self.sin.stop
+        if self.stop:
+            logging.info("Model has finished running.")
+
+    def extend(self, simulation_time):
+        super(DTSinGenerator, self).extend(simulation_time)
+        self.simulation_length = simulation_time
+        [c.extend(simulation_time) for c in (self.ramp, self.sin)]
@@ -1,4 +1,9 @@
 """Trig module for scipy sim"""
-from sin import Sin
-from CTSinGenerator import CTSinGenerator
-from DTSinGenerator import DTSinGenerator
+
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'Sin': 'sin',
+    'CTSinGenerator': 'CTSinGenerator',
+    'DTSinGenerator': 'DTSinGenerator',
+})
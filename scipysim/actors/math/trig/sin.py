@@ -1,7 +1,9 @@
-import logging
 from numpy import sin, pi
 
-from scipysim.actors import Siso, Event
+from scipysim.actors import Siso, Event, EventBlock
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 class Sin(Siso):
     '''
@@ -23,9 +25,14 @@ class Sin(Siso):
 
     def siso_process(self, event):
         """The Sin trig function."""
-        logging.debug("Running sin process")
+        if trace.enabled:
+            trace("Running sin process")
 
         tag = event.tag
         value = self.amplitude * sin(2 * pi * self.frequency * tag + self.phase)
 
         return Event(tag, value)
+
+    def siso_process_block(self, block):
+        values = self.amplitude * sin(2 * pi * self.frequency * block.tag + self.phase)
+        return EventBlock(block.tag, values)
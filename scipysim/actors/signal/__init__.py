@@ -1,16 +1,23 @@
 """Signal Blocks"""
-from split import Split
-from decimator import Decimator
-from delay import Delay
-from eventfilter import EventFilter
-from interpolator import InterpolatorZero
-from interpolator import InterpolatorStep
-from interpolator import InterpolatorLinear
-from merge import Merge
-from quantizer import Quantizer
-from ramp import Ramp
-from random_signal import RandomSource
-from sampler import Sampler
-from sink import Sink
-from step import Step
-from ct2dt import Ct2Dt
+
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'Split': 'split',
+    'Decimator': 'decimator',
+    'Delay': 'delay',
+    'EventFilter': 'eventfilter',
+    'InterpolatorZero': 'interpolator',
+    'InterpolatorStep': 'interpolator',
+    'InterpolatorLinear': 'interpolator',
+    'Merge': 'merge',
+    'Quantizer': 'quantizer',
+    'Ramp': 'ramp',
+    'RandomSource': 'random_signal',
+    'PoissonSource': 'random_signal',
+    'spawn_seeds': 'random_signal',
+    'Sampler': 'sampler',
+    'Sink': 'sink',
+    'Step': 'step',
+    'Ct2Dt': 'ct2dt',
+})
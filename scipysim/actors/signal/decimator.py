@@ -3,7 +3,7 @@ Created on 1/12/2009
 
 @author: brian
 '''
-from scipysim.actors import Siso, Channel, Event, LastEvent
+from scipysim.actors import Siso, Channel, Event, LastEvent, EventBlock
 import unittest
 
 class Decimator(Siso):
@@ -25,6 +25,16 @@ class Decimator(Siso):
         self.reduction_factor = int(reduction_factor)
         self.sample = 0
 
+    def get_rates(self):
+        return ((self.reduction_factor,), (1,))
+
+    def fire(self):
+        '''One firing passes on a single event out of every N.'''
+        for _ in xrange(self.reduction_factor):
+            if self.stop:
+                break
+            self.process()
+
     def siso_process(self, event):
 
         if self.sample % self.reduction_factor == 0:
@@ -63,5 +73,15 @@ class DecimatorTests(unittest.TestCase):
             self.assertEquals(out.tag, expected_output.tag)
         self.assertTrue(self.q_out.get().last)
 
+    def test_block_input(self):
+        '''Blocks of events are decimated one event at a time.'''
+        self.q_in.put(EventBlock(range(0, 50), [1] * 50))
+        self.q_in.put(EventBlock(range(50, 100), [1] * 50, last=True))
+        Decimator(self.q_in, self.q_out, 2).run()
+
+        for i in xrange(0, 100, 2):
+            self.assertEquals(self.q_out.get().tag, i)
+        self.assertTrue(self.q_out.get().last)
+
 if __name__ == "__main__":
     unittest.main()
@@ -4,12 +4,14 @@ Created on 23/11/2009
 @author: Brian Thorne
 '''
 
-import logging
-from scipysim.actors import Siso, Channel, Event, LastEvent
+from scipysim.actors import Siso, Channel, Event, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
 
 import unittest
 import numpy
 
+trace = tracepoint(__name__)
+
 class Delay(Siso):
     '''
     This siso actor takes a source and delays it by an arbitrary amount of time.
@@ -31,9 +33,13 @@ class Delay(Siso):
 
     def siso_process(self, event):
         """Delay the input values by a set amount of time..."""
-        logging.debug("Running delay process")
+        if trace.enabled:
+            trace("Running delay process")
         return Event(event.tag + self.delay, event.value)
 
+    def siso_process_block(self, block):
+        return EventBlock(block.tag + self.delay, block.value)
+
 
 from numpy import linspace, arange
 class DelayTests(unittest.TestCase):
@@ -4,10 +4,12 @@ Created on 2010-04-06
 @author: Allan McInnes
 '''
 from scipysim.actors import Siso, Actor, Channel, Event, LastEvent
-import logging
+from scipysim.core.tracepoint import tracepoint
 import unittest
 from numpy import floor, abs
 
+trace = tracepoint(__name__)
+
 
 class EventFilter(Siso):
     '''
@@ -32,7 +34,8 @@ class EventFilter(Siso):
 
     def siso_process(self, event):
         tag, value = event.tag, event.value
-        logging.debug("EventFilter received (tag: %2.e, value: %2.e )" % (tag, value))        
+        if trace.enabled:
+            trace("EventFilter received (tag: %2.e, value: %2.e )", tag, value)
         quantized_value = self.delta * floor(value / self.delta)
         
         if quantized_value != self.current_quantum:
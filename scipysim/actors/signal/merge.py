@@ -9,10 +9,12 @@ the merge deterministic. It also implicitly introduces "super-dense" time.
 '''
 
 import logging
-logging.basicConfig(level=logging.DEBUG)
 from scipysim.actors import Actor, Channel, MakeChans, Event, LastEvent
+from scipysim.core.tracepoint import tracepoint
 from numpy import inf as infinity
 
+trace = tracepoint(__name__)
+
 class Merge(Actor):
     '''
     Take a list of two or more input channels, and merge the signals into
@@ -34,6 +36,8 @@ class Merge(Actor):
         self.inputs = list(inputs)
         self.num_inputs = len(self.inputs)
 
+    def get_input_channels(self):
+        return self.inputs
 
     def process(self):
         """Deterministically merge inputs from a set of channels.
@@ -41,7 +45,8 @@ class Merge(Actor):
         Note that this only removes events from those channels that result
         in an output event. Events at the head of other channels are left 
         untouched, and will be checked again the next time the process runs."""
-        logging.debug("Merge: running")
+        if trace.enabled:
+            trace("Merge: running")
 
         # Block on each channel in sequence. We can't make a decision
         # on the merge until we have events (and thus tags) on every channel.
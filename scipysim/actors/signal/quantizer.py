@@ -3,11 +3,13 @@ Created on 2010-04-06
 
 @author: Allan McInnes
 '''
-from scipysim.actors import Siso, Actor, Channel, Event, LastEvent
-import logging
+from scipysim.actors import Siso, Actor, Channel, Event, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
 import unittest
 from numpy import floor
 
+trace = tracepoint(__name__)
+
 
 class Quantizer(Siso):
     '''
@@ -30,12 +32,17 @@ class Quantizer(Siso):
         
 
     def siso_process(self, event):
-        logging.debug("Quantizer received (tag: %2.e, value: %2.e )" % (event.tag, event.value))        
+        if trace.enabled:
+            trace("Quantizer received (tag: %2.e, value: %s )", event.tag, event.value)
         quantized_value = self.delta * floor(event.value / self.delta)
         self.output_channel.put(Event(event.tag, quantized_value))
 
         return
 
+    def siso_process_block(self, block):
+        quantized_values = self.delta * floor(block.value / self.delta)
+        self.output_channel.put(EventBlock(block.tag, quantized_values))
+
 class QuantizerTests(unittest.TestCase):
     '''Test the quantizer actor'''
 
@@ -65,6 +72,17 @@ class QuantizerTests(unittest.TestCase):
             self.assertEquals(out.tag, expected_output.tag)
         self.assertTrue(self.q_out.get().last)
 
+    def test_block_quantization(self):
+        '''Test quantizing a ramp signal sent as a block.'''
+        self.q_in.put(EventBlock(range(-20, 21), range(-20, 21), last=True))
+        Quantizer(self.q_in, self.q_out, 2).run()
+
+        for i in xrange(-20, 21):
+            out = self.q_out.get()
+            self.assertEquals(out.value, i if i % 2 == 0 else i - 1)
+            self.assertEquals(out.tag, i)
+        self.assertTrue(self.q_out.get().last)
+
 if __name__ == "__main__":
     unittest.main()
 
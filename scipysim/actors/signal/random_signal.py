@@ -1,21 +1,73 @@
 '''
+Random signal sources.
+
+Every source has its own NumPy random generator, made from the seed it is
+given, so a model run with the same seeds produces the same signals bit for
+bit. For a model with many sources, spawn_seeds derives one independent
+seed for each from a single seed for the whole model::
+
+    seeds = spawn_seeds(42, N)
+    sources = [RandomSource(wires[i], seed=seeds[i]) for i in xrange(N)]
+
+Values are generated block_size tags at a time and sent as EventBlocks.
+
 Created on 19/11/2009
-TODO
+
 @author: Brian Thorne
 '''
-from scipysim.actors import Source, Event, LastEvent
+from scipysim.actors import Source, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
 import logging
-from numpy import linspace
-import time
-import random
+import hashlib
+from numpy import cumsum, zeros, frombuffer, atleast_1d, uint32
+from numpy.random import RandomState
+
+trace = tracepoint(__name__)
+
+
+def spawn_seeds(seed, count):
+    '''
+    Make seeds for 'count' independent random generators from one seed.
+
+    Each seed is a hash of the parent seed and the index of the child, so
+    the streams don't overlap the way consecutive integer seeds can, and a
+    spawned seed can be spawned from again. A seed of None gives None for
+    every child, i.e. unpredictable streams.
+    '''
+    if seed is None:
+        return [None] * count
+    parent = tuple(atleast_1d(seed).tolist())
+    return [frombuffer(hashlib.sha256('%r/%d' % (parent, index)).digest(), dtype=uint32)
+            for index in xrange(count)]
+
+
+def make_generator(seed):
+    '''A NumPy RandomState from a seed, or the generator itself if given one.'''
+    if isinstance(seed, RandomState):
+        return seed
+    return RandomState(seed)
+
+
+def seeded(seed):
+    '''True if a seed always gives the same stream, see Actor.deterministic.
+    A generator's stream depends on what else has drawn from it.'''
+    return seed is not None and not isinstance(seed, RandomState)
+
 
 class RandomSource(Source):
     '''
     A random noise source.
     '''
 
+    # The distributions that can be drawn from, as functions of the
+    # generator, the shape of the block of values and the amplitude
+    distributions = {
+        'uniform': lambda random, shape, amplitude: amplitude * random.random_sample(shape),
+        'gaussian': lambda random, shape, amplitude: random.normal(0.0, amplitude, shape),
+    }
 
-    def __init__(self, out, amplitude=1.0, resolution=10, simulation_time=120, endpoint=False):
+    def __init__(self, out, amplitude=1.0, resolution=10, simulation_time=120, endpoint=False,
+                 ensemble=None, seed=None, distribution='uniform', block_size=1024):
         '''
         Constructor for a RandomSource.
 
@@ -23,33 +75,163 @@ class RandomSource(Source):
 
         Optional Paramaters:
 
-        @param amplitude: The amplitude of the noise
+        @param amplitude: The amplitude of the noise, the upper limit of
+        uniform noise or the standard deviation of gaussian noise.
 
         @param resolution: the number of values to output "per second",
         defaults to 10.
 
         @param simulation_time: The preset time to generate random numbers over,
         defaults to 120 seconds.
-        
-        @param endpoint: Whether to include the final point (120th second) 
+
+        @param endpoint: Whether to include the final point (120th second)
         in the simulation.
+
+        @param ensemble: If given, the number of independent noise signals
+        to generate at once. Each value is then an array with one sample
+        of every signal, and the actors downstream work on all of them
+        together, e.g. for a Monte Carlo study.
+
+        @param seed: The seed of the source's random generator (anything
+        accepted by numpy.random.RandomState, or a RandomState), see
+        spawn_seeds. By default the signal is different every run.
+
+        @param distribution: 'uniform' (values between 0 and amplitude, the
+        default) or 'gaussian' (zero mean).
+
+        @param block_size: The number of tags to generate values for at a time.
         '''
         super(RandomSource, self).__init__(output_channel=out, simulation_time=simulation_time)
+        if distribution not in self.distributions:
+            raise ValueError("Unknown distribution '%s'" % distribution)
         self.amplitude = amplitude
         self.resolution = resolution
         self.endpoint = endpoint
+        self.ensemble = ensemble
+        self.random = make_generator(seed)
+        self.deterministic = seeded(seed)
+        self.distribution = distribution
+        self.block_size = block_size
+
+    def process(self):
+        """Create the next block of numbers..."""
+        if trace.enabled:
+            trace("Running random process")
+        tags = self.sample_block(self.resolution, self.endpoint, self.block_size)
+        if len(tags):
+            shape = (len(tags),) if self.ensemble is None else (len(tags), self.ensemble)
+            draw = self.distributions[self.distribution]
+            self.output_channel.put(EventBlock(tags, draw(self.random, shape, self.amplitude)))
+            if trace.enabled:
+                trace("Random process added %d events", len(tags))
+
+        if len(tags) < self.block_size:
+            logging.debug("Random process finished adding all data to channel")
+            self.stop = True
+            self.output_channel.put(LastEvent(self.simulation_time))
+
+
+class PoissonSource(Source):
+    '''
+    A discrete-event source of Poisson arrivals: events at random times,
+    with exponentially distributed intervals between them.
+    '''
+    output_domains = ('DE',)
+
+    def __init__(self, out, rate=1.0, amplitude=1.0, simulation_time=120, seed=None, block_size=1024):
+        '''
+        Constructor for a PoissonSource.
+
+        @param out: The output channel to put the arrivals in.
+
+        @param rate: The mean number of arrivals "per second".
+
+        @param amplitude: The value of every arrival event.
+
+        @param simulation_time: The time to generate arrivals until.
+
+        @param seed: The seed of the source's random generator, see RandomSource.
+
+        @param block_size: The number of arrivals to generate at a time.
+        '''
+        super(PoissonSource, self).__init__(output_channel=out, simulation_time=simulation_time)
+        self.rate = rate
+        self.amplitude = amplitude
+        self.random = make_generator(seed)
+        self.deterministic = seeded(seed)
+        self.block_size = block_size
+        # Arrivals generated but not yet sent, kept for an extension
+        self.arrivals = zeros(0)
 
     def process(self):
-        """Create the numbers..."""
-        logging.debug("Running random process")
-        tags = linspace(0, self.simulation_time, self.simulation_time * self.resolution, endpoint=self.endpoint)
-
-        for tag in tags:
-            value = random.random() * self.amplitude
-
-            self.output_channel.put(Event(tag, value))
-            logging.debug("Random process added data: (tag: %2.e, value: %.2e)" % (tag, value))
-            #time.sleep(random.random() * 0.01)     # Adding a delay so we can see the async
-        logging.debug("Random process finished adding all data to channel")
-        self.stop = True
-        self.output_channel.put(LastEvent(self.simulation_time))
+        """Create the next block of arrivals..."""
+        if not len(self.arrivals):
+            start = self.last_tag or 0.0
+            self.arrivals = start + cumsum(self.random.exponential(1.0 / self.rate, self.block_size))
+        end = self.arrivals.searchsorted(self.simulation_time)
+        tags = self.new_tags(self.arrivals[:end])
+        self.arrivals = self.arrivals[end:]
+        if len(tags):
+            self.output_channel.put(EventBlock(tags, [self.amplitude] * len(tags)))
+
+        if len(self.arrivals):
+            self.stop = True
+            self.output_channel.put(LastEvent(self.simulation_time))
+
+
+import unittest
+from scipysim.actors import Channel
+
+
+class RandomSourceTests(unittest.TestCase):
+    '''Test the random sources'''
+
+    def signal(self, source, channel):
+        source.run()
+        events = []
+        while not channel.empty():
+            events.append(channel.get())
+        self.assertTrue(events[-1].last)
+        return EventBlock.from_events(events[:-1])
+
+    def test_seeded_source_repeats(self):
+        '''A seed gives the same signal every time, whatever the block size'''
+        signals = []
+        for block_size in [1024, 1024, 7]:
+            q_out = Channel()
+            signals.append(self.signal(RandomSource(q_out, seed=3, block_size=block_size), q_out))
+        self.assertEquals(len(signals[0]), 1200)
+        self.assertEquals(list(signals[0].tag), list(signals[2].tag))
+        self.assertEquals(list(signals[0].value), list(signals[1].value))
+        self.assertEquals(list(signals[0].value), list(signals[2].value))
+        self.assertTrue(0 <= signals[0].value.min() and signals[0].value.max() < 1)
+
+    def test_spawned_seeds(self):
+        '''Spawned seeds are reproducible and give different streams'''
+        seeds = spawn_seeds(42, 3)
+        self.assertEquals([list(s) for s in seeds], [list(s) for s in spawn_seeds(42, 3)])
+        values = [RandomState(seed).random_sample(5).tolist() for seed in seeds]
+        self.assertNotEqual(values[0], values[1])
+        self.assertNotEqual(values[1], values[2])
+        self.assertEquals(spawn_seeds(None, 2), [None, None])
+
+    def test_gaussian_ensemble(self):
+        q_out = Channel()
+        signal = self.signal(RandomSource(q_out, amplitude=2.0, simulation_time=10, ensemble=500,
+                                          seed=1, distribution='gaussian'), q_out)
+        self.assertEquals(signal.value.shape, (100, 500))
+        self.assertAlmostEquals(signal.value.mean(), 0.0, 1)
+        self.assertAlmostEquals(signal.value.std(), 2.0, 1)
+        self.assertRaises(ValueError, RandomSource, q_out, distribution='cauchy')
+
+    def test_poisson_arrivals(self):
+        q_out = Channel('DE')
+        signal = self.signal(PoissonSource(q_out, rate=50.0, simulation_time=100, seed=0, block_size=100), q_out)
+        self.assertTrue(signal.tag.max() < 100)
+        self.assertTrue((signal.tag[1:] > signal.tag[:-1]).all())
+        self.assertAlmostEquals(len(signal) / 5000.0, 1.0, 1)
+        self.assertEquals(set(signal.value), set([1.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,10 +9,12 @@ How do we deal with "weird" input signals... what about random time intervals in
 Incompatible input/output frequencies...?
 '''
 from scipysim.actors import Siso, Actor, Channel, Event, LastEvent, InvalidSimulationInput
-import logging
+from scipysim.core.tracepoint import tracepoint
 import unittest
 from numpy import linspace
 
+trace = tracepoint(__name__)
+
 
 class Sampler(Siso):
     '''
@@ -33,10 +35,12 @@ class Sampler(Siso):
         self.last_point = None
 
     def siso_process(self, event):
-        logging.debug("Running sampler process")
+        if trace.enabled:
+            trace("Running sampler process")
         tag, value = event.tag, event.value
 
-        logging.debug("Sampling received (tag: %2.e, value: %2.e )" % (tag, value))
+        if trace.enabled:
+            trace("Sampling received (tag: %2.e, value: %2.e )", tag, value)
         if not self.has_data or self.last_point.tag + self.output_period == event.tag:
             # This must be either the first data point or the next data point for given frequency
             self.last_point = event
@@ -24,6 +24,9 @@ class Sink(Actor):
         super(Sink, self).__init__(input_channel=input, 
                                    output_channel=None)
 
+    def get_rates(self):
+        return ((1,), ())
+
     def process(self):
         """
         This gets called by the Actor parent.
@@ -31,13 +34,12 @@ class Sink(Actor):
         last, the actor is stopped. Otherwise the new Event is popped off
         the channel and discarded.
         """
-        event = self.input_channel.get(True)     # this is blocking
+        event = self.input_channel.get_block(True)     # this is blocking
         if event.last:
             logging.info('Sink process is finished.')
             self.stop = True
             return
             
-        logging.debug("Sink received (tag: %2.e, value: %2.e )" % (event.tag, event.value))
         return
 
 class SinkTests(unittest.TestCase):
@@ -1,6 +1,9 @@
 import logging
 
 from scipysim.actors import Actor, Channel, Event, LastEvent
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 
 
@@ -25,12 +28,19 @@ class Split(Actor):
         super(Split, self).__init__(input_channel=input_channel)
         self.output_channels = outputs
 
+    def get_output_channels(self):
+        return self.output_channels
+
+    def get_rates(self):
+        return ((1,), (1,) * len(self.output_channels))
 
     def process(self):
         """Place the input data on all the outputs..."""
-        logging.debug("Running split process")
+        if trace.enabled:
+            trace("Running split process")
 
-        event = self.input_channel.get(True)     # this is blocking
+        # Blocks of events are shared between the outputs, not copied
+        event = self.input_channel.get_block(True)     # this is blocking
         if event.last:
             logging.info("We have finished splitting the data")
             self.stop = True
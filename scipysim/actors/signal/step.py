@@ -7,39 +7,43 @@ Created on Feb 7, 2010
 '''
 
 import logging
-from numpy import arange
-from scipysim.actors import Source, Channel, CompositeActor, Event, LastEvent
+from numpy import where
+from scipysim.actors import Source, Channel, CompositeActor, Event, LastEvent, EventBlock
+from scipysim.core.tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 
 class Step(Source):
     '''A Heavyside step function'''
 
-    def __init__(self, out, switch_time=0, timestep=0.1, simulation_time=120):
+    def __init__(self, out, switch_time=0, timestep=0.1, simulation_time=120, block_size=1024):
         '''Create a step actor.
         
         Optional Parameters
         switch_time seconds to delay the "0" time where the heavyside steps to positive 1
+        block_size the number of events sent at a time
         '''
         super(Step, self).__init__(output_channel=out, simulation_time=simulation_time)
         self.switch_time = switch_time
         self.timestep = timestep
+        self.block_size = block_size
 
 
     def process(self):
-        """Create the numbers..."""
-        logging.debug("Running step process")
-
-        tags = arange(0, self.simulation_time, self.timestep)
+        """Create the next block of numbers..."""
+        if trace.enabled:
+            trace("Running step process")
 
-        for tag in tags:
-            value = 0 if (tag < self.switch_time) else 1
+        tags = self.step_block(self.timestep, self.block_size)
 
-            self.output_channel.put(Event(tag, value))
+        if len(tags):
+            self.output_channel.put(EventBlock(tags, where(tags < self.switch_time, 0, 1)))
 
-            #time.sleep(random.random() * 0.001)     # Adding a delay so we can see the async
-        logging.debug("Step process finished adding all data to channel")
-        self.stop = True
-        self.output_channel.put(LastEvent(self.simulation_time))
+        if len(tags) < self.block_size:
+            logging.debug("Step process finished adding all data to channel")
+            self.stop = True
+            self.output_channel.put(LastEvent(self.simulation_time))
 
 from scipysim.actors.display import Stemmer
 from scipysim.actors.signal import Decimator
@@ -16,7 +16,7 @@ from sampler import SamplerTests
 from sink import SinkTests
 
 #from ramp import RampTests # TODO
-#from random_signal import RandomSourceTest # Todo
+from random_signal import RandomSourceTests
 
 
 if __name__ == "__main__":
@@ -1,3 +1,7 @@
 """String manipulation blocks"""
 
-from intparser import IntParser
+from scipysim.core.util.lazy import lazy_package
+
+lazy_package(__name__, {
+    'IntParser': 'intparser',
+})
@@ -1,14 +1,32 @@
 '''
 Scipy Simulator Core
-'''
 
-from actor import Actor, Source, DisplayActor
-from channel import Channel, MakeChans, MakeNamedChans
-from errors import InvalidSimulationInput, NoProcessFunctionDefined
-from event import Event, LastEvent
-from composite_actor import CompositeActor
-from siso import Siso, SisoCTTestHelper, SisoTestHelper
+The names below are imported from their modules the first time they are
+used (see util.lazy), so that e.g. using a Channel doesn't import the
+schedulers, the parameter sweeps or the code parser.
+'''
 
+from util.lazy import lazy_package
 
-from parser import fill_tree
-from codefile import CodeFile
\ No newline at end of file
+lazy_package(__name__, {
+    'Actor': 'actor', 'Source': 'actor', 'DisplayActor': 'actor',
+    'Channel': 'channel', 'MakeChans': 'channel', 'MakeNamedChans': 'channel',
+    'set_default_capacity': 'channel', 'set_default_backend': 'channel',
+    'InvalidSimulationInput': 'errors', 'NoProcessFunctionDefined': 'errors',
+    'SimulationDeadlock': 'errors', 'InconsistentRates': 'errors', 'WorkerFailed': 'errors',
+    'Event': 'event', 'LastEvent': 'event', 'EventBlock': 'event',
+    'CompositeActor': 'composite_actor',
+    'Scheduler': 'scheduler',
+    'SDFScheduler': 'sdf',
+    'DEScheduler': 'de',
+    'MultiprocessScheduler': 'multiprocess',
+    'FusedSiso': 'fusion', 'fuse_siso_chains': 'fusion',
+    'sweep': 'sweep', 'Recorder': 'sweep', 'SweepResult': 'sweep',
+    'Profiler': 'instrumentation', 'Profile': 'instrumentation', 'Tracer': 'instrumentation',
+    'save_checkpoint': 'checkpoint', 'restore': 'checkpoint',
+    'ResultCache': 'cache',
+    'Siso': 'siso', 'SisoCTTestHelper': 'siso', 'SisoTestHelper': 'siso',
+    'fill_tree': 'parser',
+    'CodeFile': 'codefile',
+    'Catalog': 'catalog',
+})
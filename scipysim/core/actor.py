@@ -8,9 +8,47 @@ Created on 19/11/2009
 import threading
 import logging
 from thread import interrupt_main
+from math import ceil
+
+from numpy import arange
 
 from channel import Channel
-from errors import NoProcessFunctionDefined
+from errors import NoProcessFunctionDefined, SimulationDeadlock
+
+
+class CompletionLatch(object):
+    '''
+    Counts down as actors finish, so that whoever started them can wait
+    for the last one without polling.
+    '''
+
+    def __init__(self, count):
+        '''
+        @param count: the number of actors to wait for.
+        '''
+        self.count = count
+        self.condition = threading.Condition(threading.Lock())
+
+    def count_down(self):
+        '''Called when an actor finishes.'''
+        with self.condition:
+            self.count -= 1
+            if self.count <= 0:
+                self.condition.notify_all()
+
+    def wait(self, timeout=None):
+        '''
+        Wait until every actor has finished, or for at most 'timeout'
+        seconds. Returns True if they have all finished.
+
+        Note that an untimed wait can't be interrupted by a
+        KeyboardInterrupt.
+        '''
+        with self.condition:
+            if self.count > 0:
+                self.condition.wait(timeout)
+            return self.count <= 0
+
 
 class Actor(object):
     '''
@@ -28,13 +66,43 @@ class Actor(object):
     output_domains - a tuple or list exactly num_outputs long containing information 
                      about the domain of the output - None, DE, DT or CT, BIN
     input_domains - Same for inputs.
+    cooperative - True if the actor can be fired from a single-threaded
+                  scheduler, i.e. its process function only blocks on the
+                  channels returned by get_input_channels. Actors that
+                  override run or manage their own threads/processes
+                  must set this to False.
+    deterministic - True if the actor always produces the same output from
+                    the same parameters and inputs, so that its output
+                    can be cached (see scipysim.core.cache).
     
     '''
     num_inputs = None
     num_outputs = None
     output_domains = (None,)
     input_domains = (None,)
+    cooperative = True
     thread = None
+    deterministic = True
+
+    def __new__(cls, *args, **kwargs):
+        actor = super(Actor, cls).__new__(cls)
+        # The arguments the actor was constructed with, see parameters
+        actor._arguments = (args, kwargs)
+        return actor
+
+    @property
+    def parameters(self):
+        '''The arguments the actor was constructed with, as a dictionary
+        of parameter names to values, or None if they aren't known.'''
+        import inspect
+        args, kwargs = self._arguments
+        try:
+            parameters = inspect.getcallargs(self.__class__.__init__, self, *args, **kwargs)
+        except TypeError:
+            # Wrong arguments, which __init__ reported
+            return None
+        del parameters['self']
+        return parameters
 
     def __init__(self, input_channel=None, output_channel=None, *args, **kwargs):
         '''Constructor for a generic base actor.
@@ -57,13 +125,24 @@ class Actor(object):
         self.output_channel = output_channel
         self.stop = False
 
-    def start(self):
+    def start(self, latch=None):
         '''
         Start execution of the actor.
+
+        @param latch: An optional CompletionLatch to count down when the
+                      actor's thread finishes.
         '''
-        self.thread = threading.Thread(target=self.run)
+        self.thread = threading.Thread(target=self._run, args=(latch,),
+                                       name=self.__class__.__name__)
         self.thread.start()
 
+    def _run(self, latch):
+        try:
+            self.run()
+        finally:
+            if latch is not None:
+                latch.count_down()
+
     def join(self):
         '''
         Wait for actor execution to terminate.
@@ -90,9 +169,13 @@ class Actor(object):
             # Need to make sure that Keyboard interrupts are propagated
             # to main thread in cases where the signal module isn't available.
             interrupt_main()
+        except SimulationDeadlock, e:
+            # A channel we were blocked on has been aborted
+            logging.debug("Actor stopped by deadlock: %s" % e)
+            self.stop = True
 
     def is_alive(self):
-        return self.thread.is_alive()
+        return self.thread is not None and self.thread.is_alive()
 
     def terminate(self):
         '''Terminate the actor.'''
@@ -106,10 +189,114 @@ class Actor(object):
         '''
         raise NoProcessFunctionDefined()
 
+    def get_input_channels(self):
+        '''
+        Return a list of the channels that the process function reads from.
+        Actors with more than one input (or inputs stored under a different
+        attribute name) should override this.
+        '''
+        if self.num_inputs == 0:
+            return []
+        return [self.input_channel]
+
+    def get_output_channels(self):
+        '''
+        Return a list of the channels that the process function writes to.
+        '''
+        if self.output_channel is None:
+            return []
+        return [self.output_channel]
+
+    def get_rates(self):
+        '''
+        Return the number of events consumed from each input channel and
+        produced on each output channel by one firing, as a pair of tuples
+        in the order of get_input_channels and get_output_channels.
+
+        Actors whose rates vary from firing to firing return None (the
+        default); see scipysim.core.sdf.
+        '''
+        return None
+
+    def fire(self):
+        '''
+        Fire the actor once, consuming and producing the events given by
+        get_rates. Usually a single call to process.
+        '''
+        self.process()
+
+    def next_internal_transition(self):
+        '''
+        Return the tag at which the actor next changes state of its own
+        accord (a DEVS internal transition), or None if it only reacts to
+        received events. Used by scipysim.core.de.
+        '''
+        return None
+
+    def internal_transition(self):
+        '''
+        Carry out the internal transition due at the tag returned by
+        next_internal_transition.
+        '''
+        pass
+
+    def extend(self, simulation_time):
+        '''
+        Get ready to run again after the end of the signal, when a finished
+        simulation is carried on to a later simulation_time (see
+        CompositeActor.extend_and_run). Actors keep the rest of their state, so
+        e.g. an integrator continues from its last value.
+        '''
+        self.stop = False
+
+    def ready_to_fire(self):
+        '''
+        Return True if the process function can be called without blocking,
+        i.e. every input channel has an event waiting at its head and no
+        output channel is full.
+        '''
+        for channel in self.get_input_channels():
+            if channel.empty():
+                return False
+        for channel in self.get_output_channels():
+            if channel.full():
+                return False
+        return True
+
 class DisplayActor(Actor):
-    '''A display actor is a sink. It also draws to the screen'''
+    '''A display actor is a sink. It also draws to the screen.
+
+    If DisplayActor.headless is set to a sink class, as it is for the runs
+    of a parameter sweep, constructing any display actor makes one of those
+    instead, for the same input channel and title.
+    '''
     num_inputs = 1
     num_outputs = 0
+    headless = None
+
+    def __new__(cls, *args, **kwargs):
+        if DisplayActor.headless is not None:
+            channel = kwargs.get('input_channel', args[0] if args else None)
+            return DisplayActor.headless(channel, title=kwargs.get('title'))
+        return super(DisplayActor, cls).__new__(cls, *args, **kwargs)
+
+    def __reduce_ex__(self, protocol):
+        '''
+        A display actor that runs in a thread or process of its own can't
+        be pickled as it is, e.g. in a checkpoint, so it is pickled as the
+        arguments it was constructed with and unpickled as a new display of
+        the same input channel, starting from an empty display.
+        '''
+        if self.cooperative:
+            return super(DisplayActor, self).__reduce_ex__(protocol)
+        args, kwargs = self._arguments
+        return (_construct, (self.__class__, args, kwargs))
+
+
+def _construct(cls, args, kwargs):
+    '''Construct an actor when unpickling, see DisplayActor.__reduce_ex__.'''
+    return cls(*args, **kwargs)
+
 
 class Source(Actor):
     '''
@@ -123,6 +310,65 @@ class Source(Actor):
     def __init__(self, output_channel, simulation_time=None):
         super(Source, self).__init__(output_channel=output_channel)
         self.simulation_time = simulation_time
+        # The last tag the signal has been generated up to, see new_tags
+        self.last_tag = None
+
+    def extend(self, simulation_time):
+        '''Carry the signal on from its last tag up to a later simulation_time.'''
+        if self.simulation_time is not None and simulation_time <= self.simulation_time:
+            raise ValueError("Can't extend a signal ending at %s to %s" % (self.simulation_time, simulation_time))
+        super(Source, self).extend(simulation_time)
+        self.simulation_time = simulation_time
+
+    def new_tags(self, tags):
+        '''
+        The tags of the signal (an increasing array) that come after those
+        already generated, so that an extended source only generates the
+        part of its signal that is new.
+        '''
+        if self.last_tag is not None:
+            tags = tags[tags.searchsorted(self.last_tag, 'right'):]
+        if len(tags):
+            self.last_tag = tags[-1]
+        return tags
+
+    def tag_block(self, step, count, size, stop=None):
+        '''
+        The next block of at most 'size' of the 'count' tags i * step of
+        the signal (the last one replaced by 'stop' if given), after those
+        already generated, see new_tags. Only the block is made, so a long
+        signal takes the memory of one block at a time. A block shorter
+        than 'size' is the end of the signal.
+        '''
+        first = 0
+        if self.last_tag is not None and step > 0:
+            # At most two tags up to last_tag, which are dropped below
+            first = int(self.last_tag / step)
+        indices = arange(first, min(count, first + size + 2))
+        tags = indices * step
+        if stop is not None and len(indices) and indices[-1] == count - 1:
+            tags[-1] = stop
+        if self.last_tag is not None:
+            tags = tags[tags.searchsorted(self.last_tag, 'right'):]
+        return self.new_tags(tags[:size])
+
+    def sample_block(self, resolution, endpoint, size):
+        '''
+        The next block of at most 'size' of the tags
+        linspace(0, simulation_time, simulation_time * resolution, endpoint),
+        see tag_block.
+        '''
+        count = int(self.simulation_time * resolution)
+        divisions = count - 1 if endpoint else count
+        step = float(self.simulation_time) / divisions if divisions > 0 else 0.0
+        return self.tag_block(step, count, size, self.simulation_time if endpoint and count > 1 else None)
+
+    def step_block(self, timestep, size):
+        '''
+        The next block of at most 'size' of the tags
+        arange(0, simulation_time, timestep), see tag_block.
+        '''
+        return self.tag_block(timestep, max(0, int(ceil(self.simulation_time / float(timestep)))), size)
 
     def process(self):
         '''
@@ -0,0 +1,398 @@
+'''
+A persistent cache of the signals produced by parts of a model.
+
+Experiments often share a front end - the same sources and filters with
+the same parameters - and only differ further down. A ResultCache keeps
+the signals that such a front end produced in files, and the next run of
+any model containing it replays them from disk instead of running it again.
+
+Each output channel of an actor is given a key: a hash of the actor's
+class (including its source code), the parameters it was constructed
+with (see Actor.parameters, named as by CodeFile.get_default_parameters)
+and the keys of its input channels. Actors whose inputs can't all be
+keyed (a feedback loop, or a channel with events put in it before the
+run), and those that are not deterministic (see Actor.deterministic), get
+no key.
+
+Only the signals leaving the keyed part of a model are stored, i.e. the
+keyed channels read by an actor without a key such as a plotter. When one
+of those is found in the cache, the actors that only served to compute it
+are left out of the run and a Replay source sends the stored events.
+
+The cache holds at most max_bytes of signals, the ones used least
+recently are removed first.
+
+Example of usage::
+
+    model.run(cache=ResultCache('~/.scipysim-cache'))
+
+or from the command line::
+
+    run_scipysim --cache ~/.scipysim-cache dsp
+
+'''
+
+import os
+import hashlib
+import inspect
+import logging
+import cPickle as pickle
+
+import numpy
+
+from actor import Actor, Source
+from channel import Channel
+from event import Event, EventBlock
+
+# Changed whenever the keys or the stored signals change
+FORMAT = 1
+
+# The hash of the source code of each actor class, see class_fingerprint
+_class_fingerprints = {}
+
+
+def class_fingerprint(cls):
+    '''A hash of the source code of an actor class and its base classes,
+    so that changing the code of an actor invalidates its cached signals.'''
+    if cls not in _class_fingerprints:
+        digest = hashlib.sha1('%s.%s' % (cls.__module__, cls.__name__))
+        for base in inspect.getmro(cls):
+            if base is object:
+                continue
+            try:
+                digest.update(inspect.getsource(base))
+            except (IOError, TypeError):
+                digest.update(base.__name__)
+        _class_fingerprints[cls] = digest.hexdigest()
+    return _class_fingerprints[cls]
+
+
+def fingerprint(value):
+    '''A hashable description of a parameter value, with the channels
+    left out as they are identified by the keys of their signals.'''
+    if isinstance(value, Channel):
+        return '<channel>'
+    if isinstance(value, numpy.ndarray):
+        return ('ndarray', value.dtype.str, value.shape, hashlib.sha1(numpy.ascontiguousarray(value)).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, fingerprint(item)) for key, item in value.items()))
+    return repr(value)
+
+
+def actor_key(actor, input_keys):
+    '''The key of an actor, from its class, parameters and input keys.'''
+    parameters = fingerprint(actor.parameters)
+    return hashlib.sha1(repr((FORMAT, class_fingerprint(actor.__class__), parameters,
+                              tuple(input_keys)))).hexdigest()
+
+
+def channel_keys(components):
+    '''
+    Key every channel that is written by exactly one deterministic actor
+    whose inputs are all keyed, returning a dictionary of channel to key.
+    '''
+    writers = {}
+    for component in components:
+        for channel in component.get_output_channels():
+            writers.setdefault(channel, []).append(component)
+
+    keys = {}
+    waiting = [c for c in components
+               if getattr(c, 'deterministic', False) and getattr(c, 'parameters', None) is not None
+               and c.get_output_channels()]
+    keyed = True
+    while keyed:
+        keyed = False
+        for actor in list(waiting):
+            inputs = actor.get_input_channels()
+            if not all(channel in keys for channel in inputs):
+                continue
+            key = actor_key(actor, [keys[channel] for channel in inputs])
+            for index, channel in enumerate(actor.get_output_channels()):
+                if len(writers[channel]) == 1 and channel.empty():
+                    keys[channel] = hashlib.sha1('%s/%d' % (key, index)).hexdigest()
+            waiting.remove(actor)
+            keyed = True
+    return keys
+
+
+def compress(items):
+    '''Merge the runs of single Events in a list of the items put in a
+    channel into EventBlocks.'''
+    result, events = [], []
+    for item in items + [None]:
+        if isinstance(item, Event) and not item.last:
+            events.append(item)
+            continue
+        if events:
+            result.append(EventBlock.from_events(events))
+            events = []
+        if item is not None:
+            result.append(item)
+    return result
+
+
+class Replay(Source):
+    '''
+    A source that sends a stored list of items (Events, EventBlocks or
+    anything else a channel carries), one per firing.
+    '''
+
+    def __init__(self, out, items):
+        super(Replay, self).__init__(output_channel=out)
+        self.items = items
+        self.index = 0
+
+    def process(self):
+        if self.index < len(self.items):
+            self.output_channel.put(self.items[self.index])
+            self.index += 1
+        if self.index == len(self.items):
+            self.stop = True
+
+
+class ResultCache(object):
+    '''
+    A directory of signals, indexed by key, with the least recently used
+    removed once they take more than max_bytes.
+    '''
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        '''
+        @param directory: where the signals are stored, created if needed.
+        @param max_bytes: the most space to use.
+        '''
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.signal')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        '''The stored items of a signal, or None if it isn't in the cache.'''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as stored:
+                items = pickle.load(stored)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+        # Mark it as recently used
+        os.utime(path, None)
+        return items
+
+    def put(self, key, items):
+        '''Store the items of a signal, then make room if needed.'''
+        temporary = self.path(key) + '.tmp'
+        with open(temporary, 'wb') as output:
+            pickle.dump(compress(items), output, pickle.HIGHEST_PROTOCOL)
+        if os.name == 'nt' and key in self:
+            os.remove(self.path(key))
+        os.rename(temporary, self.path(key))
+        self.evict()
+
+    def entries(self):
+        '''The stored signals as (last used, bytes, path), oldest first.'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.signal'):
+                path = os.path.join(self.directory, name)
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        return sorted(entries)
+
+    def size(self):
+        '''The bytes used by the stored signals.'''
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        '''Remove the least recently used signals until within max_bytes.'''
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logging.debug("Evicted %s from the result cache", path)
+
+    def clear(self):
+        '''Remove every stored signal.'''
+        [os.remove(path) for _, _, path in self.entries()]
+
+    def prepare(self, components):
+        '''
+        Plan a run of a model with the cache.
+
+        Returns the actors to run, in which the parts of the model whose
+        signals are stored are replaced by Replay sources, and a function
+        to call once the run has finished to store the signals that were
+        computed. The channels to store are tapped until then. Only the
+        signals that were completed, ending with a LastEvent, are stored.
+        '''
+        keys = channel_keys(components)
+        readers, writers = {}, {}
+        for component in components:
+            for channel in component.get_input_channels():
+                readers.setdefault(channel, []).append(component)
+            for channel in component.get_output_channels():
+                writers.setdefault(channel, []).append(component)
+
+        def keyed(actor):
+            return any(channel in keys for channel in actor.get_output_channels())
+
+        # Actors without a key, or with an output nobody reads, always run
+        required = [c for c in components if not keyed(c)
+                    or any(channel not in readers for channel in c.get_output_channels())]
+        replays, index = {}, 0
+        while index < len(required):
+            for channel in required[index].get_input_channels():
+                if channel not in keys or channel in replays:
+                    continue
+                items = self.get(keys[channel])
+                if items is not None:
+                    replays[channel] = items
+                elif writers[channel][0] not in required:
+                    required.append(writers[channel][0])
+            index += 1
+        # A replayed channel is computed anyway if its writer has to run
+        for channel in replays.keys():
+            if writers[channel][0] in required:
+                del replays[channel]
+
+        boundary = [channel for channel in keys if channel not in replays
+                    and writers[channel][0] in required
+                    and any(not keyed(reader) for reader in readers.get(channel, []))]
+        taps = dict((channel, tap(channel)) for channel in boundary)
+        logging.info("Result cache: replaying %d signals, computing %d of %d actors",
+                     len(replays), len(required), len(components))
+
+        def store():
+            for channel, items in taps.items():
+                del channel.put
+                if items and getattr(items[-1], 'last', False):
+                    self.put(keys[channel], items)
+
+        run = [c for c in components if c in required]
+        run += [Replay(channel, items) for channel, items in replays.items()]
+        return run, store
+
+
+def tap(channel):
+    '''Keep a list of every item put in a channel, returned, until the
+    put attribute set on the channel is deleted.'''
+    items = []
+    put = channel.put
+
+    def tapped(item, block=True, timeout=None):
+        put(item, block, timeout)
+        items.append(item)
+    channel.put = tapped
+    return items
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import tempfile
+import shutil
+from time import sleep
+from channel import MakeChans
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResultCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build(self, amplitude=1.0):
+        '''A ramp and a sine summed and recorded, and the ramp added to
+        a signal given before the run.'''
+        from composite_actor import CompositeActor
+        from sweep import Recorder
+        from scipysim.actors.signal import Ramp, Split
+        from scipysim.actors.math import Summer, Proportional
+        from scipysim.actors.math.trig import CTSinGenerator
+        wires = MakeChans(8)
+        wires[5].put(EventBlock(numpy.arange(50) / 10.0, numpy.ones(50), last=True))
+        model = CompositeActor()
+        model.components = [CTSinGenerator(wires[0], amplitude=amplitude, timestep=0.1, simulation_time=5),
+                            Ramp(wires[1], resolution=10, simulation_time=5),
+                            Split(wires[1], [wires[6], wires[7]]),
+                            Summer([wires[0], (wires[6], '-')], wires[2]),
+                            Recorder(wires[2]),
+                            Proportional(wires[7], wires[3], gain=2),
+                            Summer([wires[3], wires[5]], wires[4]),
+                            Recorder(wires[4])]
+        return model
+
+    def test_keys(self):
+        model = self.build()
+        keys = channel_keys(model.components)
+        self.assertEquals(len(keys), 6)
+        self.assertEquals(sorted(keys.values()), sorted(channel_keys(self.build().components).values()))
+        other = channel_keys(self.build(amplitude=2.0).components)
+        self.assertEquals(len(set(keys.values()) & set(other.values())), 4)
+
+    def test_replay(self):
+        '''A second run replays the stored signals and gives the same result'''
+        first = self.build()
+        first.run(cache=self.cache)
+        self.assertEquals(len(self.cache.entries()), 2)
+
+        second = self.build()
+        components, store = self.cache.prepare(second.components)
+        self.assertEquals(len([c for c in components if isinstance(c, Replay)]), 2)
+        self.assertEquals(len(components), 5)
+        second.run(engine='cooperative', cache=self.cache)
+        for index in [4, 7]:
+            expected, replayed = first.components[index].signal(), second.components[index].signal()
+            self.assertTrue(len(expected) == len(replayed) == 50)
+            self.assertEquals(list(replayed.tag), list(expected.tag))
+            self.assertEquals(list(replayed.value), list(expected.value))
+
+        # A changed parameter only recomputes what depends on it
+        third = self.build(amplitude=2.0)
+        components, store = self.cache.prepare(third.components)
+        self.assertEquals(len([c for c in components if isinstance(c, Replay)]), 1)
+
+    def test_checkpoint_is_refused(self):
+        '''A cached run can't be checkpointed, and its channels are left untapped'''
+        model = self.build()
+        self.assertRaises(ValueError, model.run, cache=self.cache,
+                          checkpoint=os.path.join(self.directory, 'model.ckpt'))
+        channels = set(c.output_channel for c in model.components if c.output_channel is not None)
+        self.assertFalse(any('put' in vars(channel) for channel in channels))
+
+    def test_unseeded_sources_are_not_cached(self):
+        from scipysim.actors.signal import RandomSource
+        wires = MakeChans(2)
+        keys = channel_keys([RandomSource(wires[0]), RandomSource(wires[1], seed=1)])
+        self.assertEquals(keys.keys(), [wires[1]])
+
+    def test_eviction(self):
+        '''The least recently used signals are removed first'''
+        signal = [EventBlock(range(100), [1.0] * 100)]
+        for key in 'abc':
+            self.cache.put(key, signal)
+            sleep(0.01)
+        self.cache.max_bytes = self.cache.size() - 1
+        os.utime(self.cache.path('a'), None)
+        self.cache.put('d', signal)
+        self.assertEquals([key in self.cache for key in 'abcd'], [True, False, False, True])
+        self.assertEquals(list(self.cache.get('d')[0].value), [1.0] * 100)
+        self.assertEquals(self.cache.get('b'), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
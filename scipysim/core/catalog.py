@@ -0,0 +1,254 @@
+'''
+A persistent index of the actors and models in a directory.
+
+Listing the blocks in the GUI, or with "run_scipysim --list", needs the
+number of inputs and outputs, the domains and the default parameters of
+every actor. Finding them with a CodeFile means importing every actor
+module and inspecting its classes, which makes start up slow. A Catalog
+keeps what the CodeFiles found in a file and only parses the source files
+that changed since, so the actor modules are only imported when a block
+is actually used::
+
+    catalog = Catalog()
+    for node, entry in sorted(catalog.entries('scipysim/actors').items()):
+        print node, entry.num_inputs, entry.num_outputs
+    catalog.save()
+
+An entry of a file is reused while the file's modification time and size
+are unchanged, or while the hash of its contents is (e.g. after a fresh
+checkout). Changes to the base classes of an actor don't invalidate it.
+'''
+
+import os
+import re
+import hashlib
+import logging
+import cPickle as pickle
+
+from codefile import CodeFile
+
+# Changed whenever the contents of a catalog file change
+FORMAT = 1
+
+# Where the catalog is kept by default
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.scipysim-catalog')
+
+# The python files that may define an actor, i.e. not tests or packages
+SOURCE_FILE = re.compile("^(?!tests?).*[^_]\.py$", re.IGNORECASE)
+
+# The attributes of a CodeFile that are kept in the catalog
+FIELDS = ('name', 'num_inputs', 'num_outputs', 'input_domains', 'output_domains')
+
+
+def file_hash(filepath):
+    '''The SHA-1 hash of the contents of a file.'''
+    with open(filepath, 'rb') as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+class CatalogEntry(CodeFile):
+    '''
+    A CodeFile read from the catalog. The module defining the actor is
+    only imported when its class (block_class) is used.
+    '''
+
+    def __init__(self, filepath, fields):
+        self.filepath = filepath
+        self.module_name = os.path.splitext(os.path.basename(filepath))[0]
+        self.module = fields['module']
+        for field in FIELDS:
+            setattr(self, field, fields[field])
+        if 'params' in fields:
+            self.params = fields['params']
+        self._block_class = None
+
+    @property
+    def block_class(self):
+        if self._block_class is None:
+            module = __import__(self.module, {}, {}, [self.name])
+            self._block_class = getattr(module, self.name)
+        return self._block_class
+
+    def __getattr__(self, name):
+        # A CodeFile also has its class as an attribute of the class' name
+        if name == self.__dict__.get('name'):
+            return self.block_class
+        raise AttributeError("'CatalogEntry' object has no attribute '%s'" % name)
+
+    def get_import(self):
+        return 'from %s import %s' % (self.module, self.name)
+
+
+class Catalog(object):
+    '''
+    The catalog of actors and models kept in a file.
+
+    @param path: the file the catalog is kept in, which needn't exist.
+    '''
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.files = {}
+        # The number of source files parsed, rather than found in the catalog
+        self.parsed = 0
+        self.changed = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as saved:
+                    catalog = pickle.load(saved)
+                if catalog.get('format') == FORMAT:
+                    self.files = catalog['files']
+            except Exception, e:
+                logging.warning("Ignoring the unreadable catalog %s: %s", path, e)
+
+    def _record(self, filepath):
+        '''The catalog's record of a source file, parsed again if the file changed.'''
+        status = os.stat(filepath)
+        record = self.files.get(filepath)
+        if record is not None and (record['mtime'], record['size']) == (status.st_mtime, status.st_size):
+            return record
+        digest = file_hash(filepath)
+        if record is None or record['sha1'] != digest:
+            record = {'sha1': digest, 'entries': {}}
+        record['mtime'], record['size'] = status.st_mtime, status.st_size
+        self.files[filepath] = record
+        self.changed = True
+        return record
+
+    def entry(self, filepath, name=None):
+        '''
+        The CatalogEntry of the actor in a python file, like CodeFile(filepath, name).
+
+        @param filepath: the path of the python file.
+        @param name: the name of the actor's class, by default found as by
+                     CodeFile.
+        '''
+        filepath = os.path.abspath(filepath)
+        record = self._record(filepath)
+        if name not in record['entries']:
+            logging.debug("Parsing %s for the catalog" % filepath)
+            codefile = CodeFile(filepath, name)
+            fields = dict((field, getattr(codefile, field, None)) for field in FIELDS)
+            fields['module'] = codefile.block_class.__module__
+            params = codefile.get_default_parameters()
+            try:
+                pickle.dumps(params, pickle.HIGHEST_PROTOCOL)
+                fields['params'] = params
+            except Exception:
+                logging.debug("The default parameters of %s are found when used" % codefile.name)
+            record['entries'][name] = fields
+            self.parsed += 1
+            self.changed = True
+        return CatalogEntry(filepath, record['entries'][name])
+
+    def entries(self, directory):
+        '''
+        The entries of all the actors in a directory and its subdirectories,
+        as a dictionary of each file's path relative to the directory to
+        its CatalogEntry.
+        '''
+        found = {}
+        for path, subdirectories, files in os.walk(directory):
+            for source in filter(SOURCE_FILE.search, files):
+                filepath = os.path.join(path, source)
+                found[os.path.relpath(filepath, directory)] = self.entry(filepath)
+        return found
+
+    def save(self):
+        '''Write the catalog to its file if it has changed. A catalog that
+        can't be written is only logged, as it is rebuilt next time.'''
+        if not self.changed:
+            return
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'wb') as output:
+                pickle.dump({'format': FORMAT, 'files': self.files}, output, pickle.HIGHEST_PROTOCOL)
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(temporary, self.path)
+        except (IOError, OSError), e:
+            logging.warning("Couldn't save the catalog to %s: %s", self.path, e)
+            return
+        self.changed = False
+        logging.debug("Saved the catalog of %d files to %s", len(self.files), self.path)
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import sys
+import shutil
+import tempfile
+
+ACTOR = '''
+from scipysim.core.actor import Actor
+
+class Doubler(Actor):
+    num_inputs = %d
+    num_outputs = 1
+    input_domains = ('DT',)
+    output_domains = ('DT',)
+
+    def __init__(self, input_channel, output_channel, gain=2.0):
+        super(Doubler, self).__init__(input_channel, output_channel)
+'''
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalog')
+        package = os.path.join(self.directory, 'catalogtest')
+        os.mkdir(package)
+        open(os.path.join(package, '__init__.py'), 'w').close()
+        self.actor = os.path.join(package, 'doubler.py')
+        self.write_actor(1)
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in [name for name in sys.modules if name.startswith('catalogtest')]:
+            del sys.modules[name]
+        shutil.rmtree(self.directory)
+
+    def write_actor(self, inputs, mtime=1000000000):
+        with open(self.actor, 'w') as source:
+            source.write(ACTOR % inputs)
+        os.utime(self.actor, (mtime, mtime))
+
+    def test_entry_is_kept(self):
+        '''An unchanged file isn't imported again'''
+        catalog = Catalog(self.path)
+        entry = catalog.entry(self.actor)
+        self.assertEquals((entry.name, entry.num_inputs, entry.input_domains), ('Doubler', 1, ('DT',)))
+        self.assertEquals(catalog.parsed, 1)
+        catalog.save()
+        del sys.modules['catalogtest.doubler']
+
+        catalog = Catalog(self.path)
+        entry = catalog.entries(os.path.dirname(self.actor))['doubler.py']
+        self.assertEquals(catalog.parsed, 0)
+        self.assertEquals(entry.get_default_parameters(),
+                          {'input_channel': None, 'output_channel': None, 'gain': 2.0})
+        self.assertEquals(entry.get_import(), 'from catalogtest.doubler import Doubler')
+        self.assertFalse('catalogtest.doubler' in sys.modules)
+        self.assertEquals(entry.Doubler.__name__, 'Doubler')
+
+    def test_changed_file_is_parsed(self):
+        catalog = Catalog(self.path)
+        catalog.entry(self.actor)
+        # A new modification time alone doesn't invalidate the entry
+        self.write_actor(1, mtime=1000000100)
+        catalog.entry(self.actor)
+        self.assertEquals(catalog.parsed, 1)
+
+        self.write_actor(2, mtime=1000000200)
+        del sys.modules['catalogtest.doubler']
+        self.assertEquals(catalog.entry(self.actor).num_inputs, 2)
+        self.assertEquals(catalog.parsed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,8 +6,165 @@ Channel class and helper functions for creating multiple channels.
 
 '''
 
+import threading
+import logging
+from collections import deque
 from Queue import Queue
 from Queue import Empty as QEmpty
+from Queue import Full as QFull
+
+from errors import SimulationDeadlock
+from event import Event, LastEvent, EventBlock, _event_values
+
+# Capacity given to channels created without one, 0 means unbounded.
+default_capacity = 0
+
+# Name of the queue implementation used by channels created without one.
+default_backend = 'queue'
+
+# The channel operation each blocked thread is waiting on, as
+# thread -> (operation, channel). Used to diagnose deadlocks.
+waiting = {}
+
+# Put into an aborted channel to wake up a blocked reader
+_ABORT = object()
+
+
+def set_default_capacity(capacity):
+    '''Set the capacity of channels created from now on without an
+    explicit capacity. 0 (the initial default) means unbounded.
+    '''
+    global default_capacity
+    default_capacity = capacity
+
+
+def set_default_backend(backend):
+    '''Set the queue implementation of channels created from now on
+    without an explicit backend, one of the keys of Channel.backends.
+    '''
+    global default_backend
+    if backend not in Channel.backends:
+        raise ValueError("Unknown channel backend '%s'" % backend)
+    default_backend = backend
+
+
+class LockedQueue(Queue):
+    '''
+    The standard thread-safe queue, usable with any number of producers
+    and consumers. Every operation takes a lock and signals a condition.
+    '''
+
+    def snapshot(self):
+        '''Return a list of the queued items.'''
+        with self.mutex:
+            return list(self.queue)
+
+    def release(self):
+        '''Remove the capacity limit, waking any blocked producer.'''
+        with self.mutex:
+            self.maxsize = 0
+            self.not_full.notify_all()
+
+
+class RingBuffer(object):
+    '''
+    A queue for exactly one producer thread and one consumer thread.
+
+    Items are kept in a deque, whose append and popleft are atomic, so a
+    put or get that does not have to wait takes no lock at all. A lock is
+    only used when one side has to sleep: it sets a flag saying it is
+    waiting before checking the buffer again, and the other side only
+    signals the condition when it sees that flag.
+
+    Implements the parts of the Queue.Queue interface used by Channel,
+    raising Queue.Empty and Queue.Full.
+    '''
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.condition = threading.Condition(threading.Lock())
+        self.getter_waiting = False
+        self.putter_waiting = False
+
+    def put(self, item, block=True, timeout=None):
+        if self.maxsize and len(self.items) >= self.maxsize:
+            if not block:
+                raise QFull
+            with self.condition:
+                while True:
+                    self.putter_waiting = True
+                    if not self.maxsize or len(self.items) < self.maxsize:
+                        break
+                    self.condition.wait(timeout)
+                    if timeout is not None and self.maxsize and len(self.items) >= self.maxsize:
+                        self.putter_waiting = False
+                        raise QFull
+                self.putter_waiting = False
+        self.items.append(item)
+        if self.getter_waiting:
+            self._wake('getter_waiting')
+
+    def get(self, block=True, timeout=None):
+        try:
+            item = self.items.popleft()
+        except IndexError:
+            if not block:
+                raise QEmpty
+            with self.condition:
+                while True:
+                    self.getter_waiting = True
+                    if self.items:
+                        break
+                    self.condition.wait(timeout)
+                    if timeout is not None and not self.items:
+                        self.getter_waiting = False
+                        raise QEmpty
+                self.getter_waiting = False
+            item = self.items.popleft()
+        if self.putter_waiting:
+            self._wake('putter_waiting')
+        return item
+
+    def _wake(self, flag):
+        '''Wake the other side, clearing its flag so that it is only
+        signalled once however many items are moved before it runs.'''
+        with self.condition:
+            if getattr(self, flag):
+                setattr(self, flag, False)
+                self.condition.notify()
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def full(self):
+        return bool(self.maxsize) and len(self.items) >= self.maxsize
+
+    def snapshot(self):
+        '''Return a list of the queued items.'''
+        # Copying a deque runs without releasing the GIL
+        return list(self.items)
+
+    def release(self):
+        '''Remove the capacity limit, waking any blocked producer.'''
+        with self.condition:
+            self.maxsize = 0
+            self.condition.notify_all()
+
+
+class _ThreadContext(threading.local):
+    '''Per-thread execution state shared by all channels.
+
+    A single-threaded scheduler sets cooperative to True while it fires
+    actors, so that a read from an empty channel raises a
+    SimulationDeadlock instead of blocking the only thread forever.
+    '''
+    cooperative = False
+
+context = _ThreadContext()
 
 
 class Channel(object):
@@ -22,28 +179,110 @@ class Channel(object):
 
     @param domain: The two letter domain code as a string
 
+    A Channel may be given a capacity, in which case a put to a full
+    channel blocks until the reader has taken an event (backpressure).
+    This keeps the memory used by fast producers, such as sources that
+    generate their whole signal at once, bounded.
+
+    A channel can also carry EventBlocks. get() and head() always return
+    single Events, splitting blocks as needed, while get_block() returns
+    whatever was put (the rest of a block if it has been partly read).
+    A block counts as one entry towards the capacity.
+
+    The events are held in a queue implementation chosen by name from
+    Channel.backends:
+        * queue - a locked Queue.Queue, safe for any number of readers and
+                  writers (the default)
+        * ring - a RingBuffer, faster but only for a single writer thread
+                 and a single reader thread, as in most models
+    See set_default_backend.
+
     '''
 
     class Empty(Exception):
         "Exception raised by Channel.get()."
         pass
 
-    def __init__(self, domain='CT', name=''):
+    class Full(Exception):
+        "Exception raised by Channel.put()."
+        pass
+
+    backends = {
+        'queue': LockedQueue,
+        'ring': RingBuffer,
+    }
+
+    def __init__(self, domain='CT', name='', capacity=None, backend=None):
         '''Construct a queue with domain type information.
 
         @param domain: The specific domain of events that this channel will carry.
                         - defaults to 'CT' domain.
+        @param capacity: The number of events the channel can hold before
+                         a put blocks, 0 for unbounded. Defaults to the
+                         value set with set_default_capacity.
+        @param backend: The name of the queue implementation, see
+                        Channel.backends. Defaults to the value set with
+                        set_default_backend.
         '''
         super(Channel, self).__init__()
-        self.queue = Queue()
+        if capacity is None:
+            capacity = default_capacity
+        if backend is None:
+            backend = default_backend
+        if backend not in self.backends:
+            raise ValueError("Unknown channel backend '%s'" % backend)
+        self.capacity = capacity
+        self.backend = backend
+        self.queue = self.backends[backend](capacity)
         self.domain = domain
         self.name = name
+        self.aborted = False
         self._head = None
 
+        # A block being read one event at a time, as
+        # [tags, values, index of the next event, last]
+        self._split = None
+        # Set once a block has been put, before then qsize is cheap
+        self._blocks = False
+
+        # Called with (channel, event) after every put, used by
+        # schedulers that need to know when events arrive.
+        self.listener = None
+
 
     def put(self, item, block=True, timeout=None):
-        '''Put an event into the channel.       '''
-        self.queue.put(item, block=block, timeout=timeout)
+        '''Put an event into the channel.
+
+        Blocks while a bounded channel is full if 'block' is True, for at
+        most 'timeout' seconds if that is not None. Raises a Full exception
+        if the event could not be added.
+
+        @param block: True if a full channel should cause blocking.
+        @param timeout: number of seconds to wait if blocked.
+        '''
+        if isinstance(item, EventBlock):
+            if not len(item) and not item.last:
+                return
+            self._blocks = True
+        try:
+            self.queue.put(item, block=False)
+        except QFull:
+            if not block:
+                raise self.Full
+            if context.cooperative:
+                raise SimulationDeadlock("Put to full channel '%s' (capacity %d) inside "
+                                         "a single-threaded scheduler" % (self.name, self.capacity))
+            waiting[threading.current_thread()] = ('put', self)
+            try:
+                self.queue.put(item, block=True, timeout=timeout)
+            except QFull:
+                raise self.Full
+            finally:
+                del waiting[threading.current_thread()]
+            if self.aborted:
+                raise SimulationDeadlock("Channel '%s' was aborted" % self.name)
+        if self.listener is not None:
+            self.listener(self, item)
 
     def get(self, block=True, timeout=None):
         '''Get an event from the channel.
@@ -65,10 +304,31 @@ class Channel(object):
             item = self._head
             self._head = None
         else:
-            try:
-                item = self.queue.get(block=block, timeout=timeout)
-            except QEmpty:
-                raise self.Empty
+            item = self._next_event(block, timeout)
+        return item
+
+    def get_block(self, block=True, timeout=None):
+        '''Get the next event or block of events from the channel.
+
+        Returns an Event or an EventBlock, whichever was put. If the head
+        of a block has already been read with get() or head() then the
+        event at the head is returned on its own, and a subsequent call
+        returns the rest of the block.
+
+        Blocking is as for get().
+        '''
+        if self._head is not None:
+            item = self._head
+            self._head = None
+        elif self._split is not None:
+            tags, values, index, last = self._split
+            self._split = None
+            if index == len(tags):
+                item = LastEvent()
+            else:
+                item = EventBlock(tags[index:], values[index:], last)
+        else:
+            item = self._wait(block, timeout)
         return item
 
     def head(self, block=True, timeout=None):
@@ -89,42 +349,359 @@ class Channel(object):
 
         '''
         if self._head is None:
+            self._head = self._next_event(block, timeout)
+        return self._head
+
+    def _next_event(self, block, timeout):
+        '''Remove and return the next single event, splitting blocks.'''
+        if self._split is None:
+            item = self._wait(block, timeout)
+            if not isinstance(item, EventBlock):
+                return item
+            self._split = [item.tag.tolist(), _event_values(item.value), 0, item.last]
+
+        tags, values, index, last = self._split
+        if index == len(tags):
+            self._split = None
+            return LastEvent()
+        self._split[2] = index + 1
+        if index + 1 == len(tags) and not last:
+            self._split = None
+        return Event(tags[index], values[index])
+
+    def _wait(self, block, timeout):
+        '''Remove and return the next item from the underlying queue,
+        blocking as requested by get() or head().
+        '''
+        try:
+            item = self.queue.get(block=False)
+        except QEmpty:
+            if not block:
+                raise self.Empty
+            if context.cooperative:
+                raise SimulationDeadlock("Read from empty channel '%s' (%s) inside "
+                                         "a single-threaded scheduler" % (self.name, self.domain))
+            if self.aborted:
+                raise SimulationDeadlock("Channel '%s' was aborted" % self.name)
+            waiting[threading.current_thread()] = ('get', self)
             try:
-                self._head = self.queue.get(block=block, timeout=timeout)
+                item = self.queue.get(block=True, timeout=timeout)
             except QEmpty:
                 raise self.Empty
-        return self._head
+            finally:
+                del waiting[threading.current_thread()]
+        if item is _ABORT:
+            raise SimulationDeadlock("Channel '%s' was aborted" % self.name)
+        return item
 
     def drop(self):
         '''Remove the event at the head of the channel.'''
         if self._head is None:
             try:
-                self._head = self.queue.get(block=False)
-            except QEmpty:
+                self._head = self._next_event(block=False, timeout=None)
+            except self.Empty:
                 pass
         self._head = None
 
     def empty(self):
-        return self._head is None and self.queue.empty()
+        return self._head is None and self._split is None and self.queue.empty()
+
+    def full(self):
+        return self.queue.full()
+
+    def qsize(self):
+        '''Return the approximate number of events waiting in the channel.'''
+        size = self.queue.qsize() + (self._head is not None)
+        if self._split is not None:
+            size += len(self._split[0]) - self._split[2] + self._split[3]
+        if self._blocks:
+            # Count the events in each queued block rather than the block
+            size += sum(len(item) + item.last - 1 for item in self.queue.snapshot()
+                        if isinstance(item, EventBlock))
+        return size
+
+    def abort(self):
+        '''Wake up any thread blocked on this channel, making it raise a
+        SimulationDeadlock. Used to recover from a detected deadlock.
+        '''
+        self.aborted = True
+        self.queue.release()
+        self.queue.put(_ABORT)
+
+    def discard_last(self):
+        '''Remove the LastEvents left in the channel at the end of a run,
+        keeping any other events, so that the signal can be carried on
+        (see CompositeActor.extend). Only valid while nothing is running.
+        '''
+        if self._head is not None and self._head.last:
+            self._head = None
+        if self._split is not None:
+            if self._split[2] == len(self._split[0]):
+                self._split = None
+            else:
+                self._split[3] = False
+        items = []
+        while not self.queue.empty():
+            items.append(self.queue.get(block=False))
+        for item in items:
+            if isinstance(item, EventBlock):
+                if not len(item):
+                    continue
+                item = EventBlock(item.tag, item.value)
+            elif getattr(item, 'last', False):
+                continue
+            self.queue.put(item, block=False)
+
+    def __getstate__(self):
+        '''Pickle the channel with the events waiting in it, but not its
+        queue (which holds locks) or listener. See scipysim.core.checkpoint.
+        '''
+        state = self.__dict__.copy()
+        state['queue'] = self.queue.snapshot()
+        state['listener'] = None
+        return state
+
+    def __setstate__(self, state):
+        items = state.pop('queue')
+        self.__dict__.update(state)
+        self.queue = self.backends[self.backend](self.capacity)
+        # Bypass the capacity, the channel was at most full when pickled
+        self.queue.maxsize = 0
+        [self.queue.put(item, block=False) for item in items]
+        self.queue.maxsize = self.capacity
 
 
-def MakeChans(num, domain='CT'):
+def find_deadlock(threads):
+    '''Check whether the given threads are deadlocked on channels.
+
+    Returns None unless every thread is blocked on a channel operation that
+    can not complete, i.e. reading from an empty channel or writing to a full
+    one, in which case a description of each blocked operation is returned.
+
+    @param threads: the threads of the running actors.
+    '''
+    blocked = dict(waiting)
+    report = []
+    for thread in threads:
+        if thread not in blocked:
+            return None
+        operation, channel = blocked[thread]
+        if operation == 'get' and not channel.empty():
+            return None
+        if operation == 'put' and not channel.full():
+            return None
+        report.append("%s waiting to %s channel '%s' (%s, %d/%d events)" %
+                      (thread.name, operation, channel.name, channel.domain,
+                       channel.qsize(), channel.capacity))
+    if not report:
+        return None
+    return '\n'.join(report)
+
+
+def MakeChans(num, domain='CT', capacity=None, backend=None):
     '''Return a list of n channels.
 
     @param num: number of channels to create.
     @param domain: The specific domain of events that these channels will carry.
                         - defaults to 'CT' domain.
+    @param capacity: The capacity of each channel, see Channel.
+    @param backend: The queue implementation of each channel, see Channel.
     '''
-    return [Channel(domain) for _ in xrange(num)]
+    return [Channel(domain, capacity=capacity, backend=backend) for _ in xrange(num)]
 
 
-def MakeNamedChans(names, domain='CT'):
+def MakeNamedChans(names, domain='CT', capacity=None, backend=None):
     '''Return a dict of channels corresponding to the provided names.
 
     @param names: names of the channels to create.
     @param domain: The specific domain of events that this channel will carry.
                         - defaults to 'CT' domain.
+    @param capacity: The capacity of each channel, see Channel.
+    @param backend: The queue implementation of each channel, see Channel.
     '''
-    return dict( zip( names, MakeChans( len( names ) ) ) )
-
-
+    return dict( (name, Channel(domain, name, capacity, backend)) for name in names )
+
+
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from event import Event, LastEvent
+
+
+class TestChannel(unittest.TestCase):
+
+    def test_unbounded_by_default(self):
+        channel = Channel()
+        [channel.put(Event(i, i), block=False) for i in xrange(1000)]
+        self.assertEquals(channel.qsize(), 1000)
+
+    def test_capacity(self):
+        '''A put to a full channel raises Full when not blocking'''
+        channel = Channel(capacity=2)
+        channel.put(Event(0, 0))
+        channel.put(Event(1, 1))
+        self.assertTrue(channel.full())
+        self.assertRaises(Channel.Full, channel.put, Event(2, 2), False)
+        self.assertRaises(Channel.Full, channel.put, Event(2, 2), True, 0.01)
+
+    def test_make_chans(self):
+        chans = MakeChans(3, 'DT', capacity=5)
+        self.assertTrue(all(c.capacity == 5 and c.domain == 'DT' for c in chans))
+        named = MakeNamedChans(['a', 'b'], 'DT', capacity=5)
+        self.assertEquals(named['a'].name, 'a')
+        self.assertEquals(named['b'].capacity, 5)
+        self.assertEquals(named['b'].domain, 'DT')
+
+    def test_default_capacity(self):
+        set_default_capacity(10)
+        try:
+            self.assertEquals(Channel().capacity, 10)
+            self.assertEquals(Channel(capacity=0).capacity, 0)
+        finally:
+            set_default_capacity(0)
+        self.assertEquals(Channel().capacity, 0)
+
+    def test_backpressure(self):
+        '''A source feeding a bounded channel is held back by its reader'''
+        from scipysim.actors.signal import Ramp, Sink
+        channel = Channel(capacity=4)
+        ramp, sink = Ramp(channel, resolution=100, simulation_time=5), Sink(channel)
+        ramp.start()
+        sink.start()
+        ramp.join()
+        sink.join()
+        self.assertTrue(channel.empty())
+
+    def test_deadlock_report(self):
+        '''An actor blocked on a full output is reported and stopped'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.signal import Ramp, Split, Sink
+        wires = MakeNamedChans(['ramp', 'unread', 'read'], capacity=2)
+        model = CompositeActor()
+        model.components = [Ramp(wires['ramp'], resolution=10, simulation_time=5, block_size=1),
+                            Split(wires['ramp'], [wires['unread'], wires['read']]),
+                            Sink(wires['read'])]
+        try:
+            model.run()
+            self.fail("Deadlock was not detected")
+        except SimulationDeadlock, e:
+            self.assertTrue("Split waiting to put channel 'unread'" in str(e))
+        self.assertFalse(any(c.is_alive() for c in model.components))
+
+    def test_read_after_abort(self):
+        '''A reader that wasn't blocked when the channel was aborted is stopped too'''
+        channel = Channel(capacity=2)
+        channel.abort()
+        self.assertRaises(SimulationDeadlock, channel.get)
+
+    def test_blocks_are_split(self):
+        '''Single event reads see the events of a block in order'''
+        channel = Channel()
+        channel.put(Event(-1, 0))
+        channel.put(EventBlock([0, 1, 2], [3, 4, 5]))
+        channel.put(EventBlock([3], [6], last=True))
+        self.assertEquals(channel.qsize(), 6)
+        self.assertEquals(channel.get().tag, -1)
+        self.assertEquals(channel.head().value, 3)
+        channel.drop()
+        self.assertEquals(channel.get(), Event(1, 4))
+        self.assertEquals(channel.qsize(), 3)
+        self.assertEquals(channel.get(), Event(2, 5))
+        self.assertEquals(channel.get(), Event(3, 6))
+        self.assertTrue(channel.get().last)
+        self.assertTrue(channel.empty())
+
+    def test_get_block(self):
+        '''get_block returns what was put, or what is left of it'''
+        channel = Channel()
+        channel.put(EventBlock([0, 1, 2], [3, 4, 5], last=True))
+        self.assertEquals(channel.head(), Event(0, 3))
+        self.assertEquals(channel.get_block(), Event(0, 3))
+        rest = channel.get_block()
+        self.assertEquals(list(rest.value), [4, 5])
+        self.assertTrue(rest.last)
+        self.assertTrue(channel.empty())
+
+    def test_ring_backend(self):
+        '''The ring buffer keeps the channel interface'''
+        channel = Channel(backend='ring', capacity=3)
+        self.assertTrue(isinstance(channel.queue, RingBuffer))
+        self.assertRaises(Channel.Empty, channel.get, False)
+        [channel.put(Event(i, i)) for i in xrange(3)]
+        self.assertTrue(channel.full())
+        self.assertRaises(Channel.Full, channel.put, Event(3, 3), False)
+        self.assertEquals(channel.head().tag, 0)
+        channel.drop()
+        self.assertEquals(channel.get().tag, 1)
+        self.assertEquals(channel.qsize(), 1)
+        self.assertRaises(ValueError, Channel, backend='no such backend')
+
+    def test_ring_threads(self):
+        '''Events keep their order between a producer and consumer thread'''
+        from scipysim.actors.signal import Ramp
+        from scipysim.actors.math import Proportional
+        for capacity in [0, 8]:
+            wires = MakeChans(3, capacity=capacity, backend='ring')
+            actors = [Ramp(wires[0], resolution=200, simulation_time=10),
+                      Proportional(wires[0], wires[1], gain=1)]
+            [actor.start() for actor in actors]
+            tags = []
+            while True:
+                event = wires[1].get()
+                if event.last:
+                    break
+                tags.append(event.tag)
+            [actor.join() for actor in actors]
+            self.assertEquals(len(tags), 2000)
+            self.assertEquals(tags, sorted(tags))
+
+    def test_default_backend(self):
+        set_default_backend('ring')
+        try:
+            self.assertEquals(Channel().backend, 'ring')
+            self.assertTrue(isinstance(Channel(backend='queue').queue, LockedQueue))
+        finally:
+            set_default_backend('queue')
+        self.assertRaises(ValueError, set_default_backend, 'no such backend')
+
+    def test_pickle(self):
+        '''A pickled channel keeps its waiting and partly read events'''
+        import pickle
+        for backend in Channel.backends:
+            channel = Channel('DT', name='wire', capacity=3, backend=backend)
+            channel.put(EventBlock(range(4), [1.0] * 4))
+            channel.put(Event(4, 2.0))
+            channel.head()
+            copy = pickle.loads(pickle.dumps(channel, pickle.HIGHEST_PROTOCOL))
+            self.assertEquals((copy.name, copy.capacity, copy.backend), ('wire', 3, backend))
+            self.assertEquals([copy.get(block=False) for _ in xrange(5)],
+                              [Event(i, 1.0) for i in xrange(4)] + [Event(4, 2.0)])
+            self.assertTrue(copy.empty())
+            self.assertEquals(channel.qsize(), 5)
+
+    def test_discard_last(self):
+        '''Only the LastEvents of a finished signal are discarded'''
+        channel = Channel()
+        channel.put(EventBlock([0, 1], [1.0, 2.0], last=True))
+        channel.put(LastEvent())
+        channel.put(EventBlock([2], [3.0], last=True))
+        self.assertEquals(channel.get(), Event(0, 1.0))
+        channel.discard_last()
+        self.assertEquals([channel.get(block=False) for _ in xrange(2)], [Event(1, 2.0), Event(2, 3.0)])
+        self.assertTrue(channel.empty())
+
+    def test_cooperative_put_to_full_channel(self):
+        context.cooperative = True
+        try:
+            channel = Channel(capacity=1)
+            channel.put(Event(0, 0))
+            self.assertRaises(SimulationDeadlock, channel.put, Event(1, 1))
+        finally:
+            context.cooperative = False
+
+
+if __name__ == "__main__":
+    unittest.main()
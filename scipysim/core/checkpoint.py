@@ -0,0 +1,257 @@
+'''
+Checkpoints of a running simulation.
+
+A long simulation that dies part way through normally has to be started
+again from the beginning. A checkpoint is the state of every actor of a
+model - the integrators' last values, the quantized state of the QS1
+integrators, how far each source has got and so on, whatever the actor
+keeps in its attributes - together with the events waiting in every
+channel, pickled to a file. A later run can restore the model from that
+file and carry on from where the checkpoint was made.
+
+A checkpoint can only be taken when no actor is part way through a firing,
+so checkpointed models are run by the cooperative Scheduler, which saves
+one between firings every so often::
+
+    model.run(checkpoint='model.ckpt', checkpoint_interval=60)
+
+and then, after a crash::
+
+    restore('model.ckpt').run(checkpoint='model.ckpt')
+
+or from the command line::
+
+    run_scipysim --checkpoint model.ckpt my_model
+    run_scipysim --resume model.ckpt
+
+Every actor must be cooperative and picklable, except for display actors
+such as the plotters: those run in a process of their own alongside the
+scheduler, and only the arguments they were made with are saved, so a
+restored run's plots show the signals from the checkpoint on. The model
+classes must be importable when restoring, from the same version of the
+code.
+
+'''
+
+import os
+import cPickle as pickle
+import logging
+
+from actor import DisplayActor
+from composite_actor import CompositeActor
+
+# Changed whenever the contents of a checkpoint file change
+FORMAT = 1
+
+
+def check_checkpointable(components):
+    '''Raise a ValueError if the state of some of the actors can't be
+    saved, as they don't run on the scheduler's thread. Display actors are
+    saved as they were constructed, see DisplayActor.__reduce_ex__.'''
+    threaded = [c.__class__.__name__ for c in components
+                if not c.cooperative and not isinstance(c, DisplayActor)]
+    if threaded:
+        raise ValueError("Can't checkpoint actors that run in their own thread or process: %s" %
+                         ', '.join(threaded))
+
+
+def save_checkpoint(components, path, firings=None):
+    '''
+    Save the state of a set of actors and their channels to a file.
+
+    The actors must not be running, e.g. between two firings of a
+    Scheduler or once it has been paused. The file is replaced in one
+    step, so a crash while saving leaves the previous checkpoint intact.
+
+    @param components: the actors to save.
+    @param path: the name of the file.
+    @param firings: the number of firings so far, for information.
+    '''
+    check_checkpointable(components)
+    temporary = path + '.tmp'
+    try:
+        with open(temporary, 'wb') as output:
+            pickle.dump({'format': FORMAT, 'components': list(components), 'firings': firings},
+                        output, pickle.HIGHEST_PROTOCOL)
+    except:
+        # e.g. an actor holding a lock, which can't be pickled
+        os.remove(temporary)
+        raise
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(temporary, path)
+    logging.debug("Saved checkpoint of %d actors to %s", len(components), path)
+
+
+def load_checkpoint(path):
+    '''Read a checkpoint file, returning a dictionary with the list of
+    actors as 'components' and the firings when it was saved.'''
+    with open(path, 'rb') as saved:
+        checkpoint = pickle.load(saved)
+    if not isinstance(checkpoint, dict) or checkpoint.get('format') != FORMAT:
+        raise ValueError("%s is not a checkpoint in format %d" % (path, FORMAT))
+    return checkpoint
+
+
+def restore(path):
+    '''
+    Restore a model from a checkpoint file, as a CompositeActor whose
+    components are the saved actors. Running it continues the simulation.
+    '''
+    model = CompositeActor()
+    model.components = load_checkpoint(path)['components']
+    logging.info("Restored %d actors from %s", len(model.components), path)
+    return model
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import tempfile
+import shutil
+import numpy
+from channel import MakeChans
+from scheduler import Scheduler
+from sweep import Recorder
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'model.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build(self):
+        '''Noise through a CT integrator and a QS1 integrator.'''
+        from scipysim.actors.signal import RandomSource, Split
+        from scipysim.actors.math import CTIntegratorForwardEuler, CTIntegratorQS1
+        wires = MakeChans(5)
+        return [Recorder(wires[3]), Recorder(wires[4]),
+                CTIntegratorQS1(wires[2], wires[4], delta=0.05),
+                CTIntegratorForwardEuler(wires[1], wires[3]),
+                Split(wires[0], [wires[1], wires[2]]),
+                RandomSource(wires[0], simulation_time=20, seed=3, block_size=16)]
+
+    def outputs(self, components):
+        return [c.signal() for c in components if isinstance(c, Recorder)]
+
+    def test_resume_gives_same_result(self):
+        '''A run restored from a checkpoint ends the same as one that wasn't stopped'''
+        expected = self.build()
+        Scheduler(expected).run()
+
+        components = self.build()
+        # Fire every actor a few times, without letting the sources finish
+        for actor in reversed(components):
+            for _ in xrange(3):
+                if actor.ready_to_fire():
+                    actor.process()
+        self.assertFalse(all(c.stop for c in components))
+        save_checkpoint(components, self.path)
+        del components
+
+        model = restore(self.path)
+        model.run(engine='cooperative')
+        self.assertTrue(all(c.stop for c in model.components))
+        for restored, signal in zip(self.outputs(model.components), self.outputs(expected)):
+            self.assertTrue(len(signal) > 100)
+            self.assertTrue(numpy.array_equal(restored.tag, signal.tag))
+            self.assertTrue(numpy.array_equal(restored.value, signal.value))
+
+    def test_periodic_checkpoints(self):
+        '''A paused run is checkpointed and can be continued from the file'''
+        components = self.build()
+        scheduler = PausingScheduler(components, checkpoint=self.path, checkpoint_interval=0)
+        scheduler.run()
+        self.assertTrue(scheduler.paused)
+        self.assertEquals(scheduler.firings, 20)
+        self.assertEquals(load_checkpoint(self.path)['firings'], 20)
+
+        model = restore(self.path)
+        model.run(checkpoint=self.path)
+        self.assertTrue(all(c.stop for c in model.components))
+        scheduler.run()
+        self.assertTrue(all(c.stop for c in components))
+        for restored, signal in zip(self.outputs(model.components), self.outputs(components)):
+            self.assertTrue(numpy.array_equal(restored.value, signal.value))
+
+    def test_threaded_display_is_rebuilt(self):
+        '''A display in its own thread doesn't stop a checkpoint, and is restored as a new one'''
+        components = self.build()
+        components[0] = ThreadedDisplay(components[0].input_channel, title='Forward Euler')
+        scheduler = PausingScheduler(components, checkpoint=self.path, checkpoint_interval=0)
+        scheduler.run()
+        self.assertTrue(scheduler.paused)
+
+        model = restore(self.path)
+        display = model.components[0]
+        self.assertTrue(isinstance(display, ThreadedDisplay) and display is not components[0])
+        self.assertEquals(display.title, 'Forward Euler')
+        self.assertTrue(display.input_channel is model.components[3].output_channel)
+        model.run(checkpoint=self.path)
+        self.assertTrue(all(c.stop for c in model.components))
+        scheduler.run()
+        self.assertTrue(all(c.stop for c in components))
+        # The new display has the signal from those events the old one hadn't
+        # read when the checkpoint was saved
+        restored, signal = display.signal(), components[0].signal()
+        self.assertTrue(0 < len(restored) <= len(signal))
+        self.assertTrue(numpy.array_equal(restored.value, signal.value[-len(restored):]))
+
+    def test_sin_generator(self):
+        '''The sine generators fire their inner actors cooperatively, so can be saved'''
+        from scipysim.actors.math.trig import CTSinGenerator
+
+        def build():
+            wire, = MakeChans(1)
+            return [Recorder(wire), CTSinGenerator(wire, timestep=0.001, simulation_time=30)]
+
+        expected = build()
+        Scheduler(expected).run()
+        components = build()
+        scheduler = PausingScheduler(components, checkpoint=self.path, checkpoint_interval=0)
+        scheduler.run()
+        self.assertFalse(components[1].stop)
+
+        model = restore(self.path)
+        model.run(checkpoint=self.path)
+        restored, signal = model.components[0].signal(), expected[0].signal()
+        self.assertEquals(len(signal), 30000)
+        self.assertTrue(numpy.array_equal(restored.value, signal.value))
+
+    def test_failed_save(self):
+        '''A checkpoint that can't be pickled leaves no file behind, and stops the threaded actors'''
+        import threading
+        components = self.build()
+        components[0] = ThreadedDisplay(components[0].input_channel)
+        components[1].lock = threading.Lock()
+        scheduler = Scheduler(components, checkpoint=self.path, checkpoint_interval=0)
+        self.assertRaises(TypeError, scheduler.run)
+        self.assertEquals(os.listdir(self.directory), [])
+        self.assertFalse(components[0].is_alive())
+
+    def test_threaded_actors_are_refused(self):
+        self.assertRaises(ValueError, save_checkpoint, [CompositeActor()], self.path)
+        self.assertRaises(ValueError, Scheduler, [CompositeActor()], self.path)
+
+
+class ThreadedDisplay(Recorder, DisplayActor):
+    '''A display that runs in its own thread, for the checkpoint tests.'''
+    cooperative = False
+
+
+class PausingScheduler(Scheduler):
+    '''Pauses itself after 20 firings, for the checkpoint tests.'''
+
+    def save_checkpoint(self, path=None):
+        super(PausingScheduler, self).save_checkpoint(path)
+        if self.firings == 20:
+            self.pause()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,10 +20,6 @@ from os import path
 import sys
 import inspect
 import logging
-logging.basicConfig( 
-    level=logging.INFO, 
-    #filename='scipysim_codefile_log.log' 
-    )
 
 from util import interrogate
 
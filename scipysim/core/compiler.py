@@ -0,0 +1,394 @@
+'''
+Compile the static part of a Graph into a single NumPy function.
+
+Running a model moves every event through a channel. For a graph built
+from simple actors whose output only depends on the whole of their input
+signals, the same result can be had by computing each signal as a pair of
+arrays - the tags and the values - with a few NumPy operations per actor:
+cumsum for an integrator, adding to the tags for a delay, elementwise
+arithmetic for gains and sums.
+
+compile_graph generates the source of one function, the kernel, computing
+the signal on every channel written by a supported actor: Ramp, Constant,
+DTSinGenerator, Sin, Proportional, Abs, Quantizer, Delay, Summer and the
+DT integrators (see translate). A node is compiled if its actor is one of
+them and all its inputs are computed by the kernel, so feedback
+loops and anything downstream of an unsupported actor are left to the
+actor runtime. When the compiled graph is run the kernel is called first,
+its signals are put on the channels read by the remaining actors as
+EventBlocks, and those actors are run by an engine as in Graph.run.
+
+Example of usage::
+
+    compiled = graph.compile()
+    print compiled.source
+    result = compiled.run()
+
+'''
+
+import logging
+from time import time
+
+import numpy
+from numpy import inf
+
+from event import EventBlock, LastEvent
+
+
+def _sources():
+    '''Translations of the supported sources.'''
+    from scipysim.actors.signal import Ramp
+    from scipysim.actors.math import Constant
+    from scipysim.actors.math.trig import DTSinGenerator
+
+    def ramp(actor, out):
+        lines = _linspace(actor, out)
+        lines.append('v%s = t%s * %r * %r' % (out, out, actor.frequency, actor.amplitude))
+        if actor.amplitude > 0:
+            lines.append('v%s = where(v%s >= %r, v%s %% %r, v%s)'
+                         % (out, out, actor.amplitude, out, actor.amplitude, out))
+        return lines
+
+    def constant(actor, out):
+        return _linspace(actor, out) + ['v%s = full(len(t%s), %r)' % (out, out, actor.value)]
+
+    def sin_generator(actor, out):
+        # The composite of a Ramp and a Sin
+        return ramp(actor.ramp, out) + _sin(actor.sin, out, out)
+
+    return {Ramp: ramp, Constant: constant, DTSinGenerator: sin_generator}
+
+
+def _linspace(source, out):
+    '''The tags of a Ramp or Constant source.'''
+    return ['t%s = linspace(0, %r, %r, endpoint=%r)' % (out, source.simulation_time,
+                                                        source.simulation_time * source.resolution,
+                                                        source.endpoint),
+            'e%s = %r' % (out, source.simulation_time)]
+
+
+def _sin(actor, inp, out):
+    return ['t%s = t%s' % (out, inp),
+            'v%s = %r * sin(2 * pi * %r * t%s + %r)' % (out, actor.amplitude, actor.frequency,
+                                                        inp, actor.phase),
+            'e%s = e%s' % (out, inp)]
+
+
+def _sisos():
+    '''Translations of the supported single input, single output actors.'''
+    from scipysim.actors.math import Proportional, Abs
+    from scipysim.actors.math import DTIntegratorBackwardEuler, DTIntegratorForwardEuler, \
+        DTIntegratorTrapezoidal
+    from scipysim.actors.math.trig import Sin
+    from scipysim.actors.signal import Delay, Quantizer
+
+    def elementwise(expression):
+        def translate(actor, inp, out):
+            return ['t%s = t%s' % (out, inp),
+                    'v%s = %s' % (out, expression(actor, 'v%s' % inp)),
+                    'e%s = e%s' % (out, inp)]
+        return translate
+
+    def delay(actor, inp, out):
+        return ['t%s = t%s + %r' % (out, inp, actor.delay),
+                'v%s = v%s' % (out, inp),
+                'e%s = e%s' % (out, inp)]
+
+    return {
+        Proportional: elementwise(lambda a, v: '%s * %r' % (v, a.gain)),
+        Abs: elementwise(lambda a, v: 'abs(%s)' % v),
+        Quantizer: elementwise(lambda a, v: '%r * floor(%s / %r)' % (a.delta, v, a.delta)),
+        Sin: _sin,
+        Delay: delay,
+        DTIntegratorBackwardEuler: elementwise(
+            lambda a, v: 'cumsum(concatenate(([%r], %s)))[1:]' % (a.y_old, v)),
+        DTIntegratorForwardEuler: elementwise(
+            lambda a, v: 'cumsum(concatenate(([%r], %s)))[:-1]' % (a.y_old, v)),
+        DTIntegratorTrapezoidal: elementwise(
+            lambda a, v: 'cumsum(concatenate(([%r], 0.5 * (%s + concatenate(([%r], %s))[:-1]))))[1:]'
+                         % (a.y_old, v, a.x_old, v)),
+    }
+
+
+def dt_sum(signals, signs):
+    '''
+    Sum discrete-time signals as the DTSummer does: at the tags found on
+    every input, other events being discarded.
+
+    @param signals: a list of (tags, values) array pairs.
+    @param signs: the sign of each signal, 1.0 or -1.0.
+    '''
+    tags = signals[0][0]
+    for other, _ in signals[1:]:
+        tags = numpy.intersect1d(tags, other, assume_unique=True)
+    total = 0
+    for (t, v), sign in zip(signals, signs):
+        total = total + sign * v[numpy.searchsorted(t, tags)]
+    return tags, numpy.zeros(len(tags)) + total
+
+
+def ct_sum(signals, signs):
+    '''
+    Sum continuous-time signals as the CTSummer does: at every tag of any
+    input up to the end of the shortest, holding the last value of each
+    input (0.0 before its first event).
+
+    @param signals: a list of (tags, values) array pairs.
+    @param signs: the sign of each signal, 1.0 or -1.0.
+    '''
+    tolerance = 100.0 * numpy.finfo(numpy.float_).resolution
+    if not all(len(t) for t, v in signals):
+        return numpy.zeros(0), numpy.zeros(0)
+    end = min(t[-1] for t, v in signals)
+    tags = numpy.unique(numpy.concatenate([t for t, v in signals]))
+    tags = tags[tags <= end + tolerance]
+    # Tags within the tolerance of each other are the same tag
+    tags = tags[numpy.concatenate(([True], numpy.diff(tags) > tolerance))]
+    total = 0
+    for (t, v), sign in zip(signals, signs):
+        index = numpy.searchsorted(t, tags + tolerance, side='right') - 1
+        held = numpy.where(index >= 0, v[index.clip(0)], 0.0)
+        total = total + sign * held
+    return tags, numpy.zeros(len(tags)) + total
+
+
+def _summer(actor, inputs, out):
+    '''Translate a Summer, given the names of its inputs.'''
+    from scipysim.actors.math.summer import DTSummer, CTSummer
+    summer = actor._Summer__summer
+    if summer.__class__ is DTSummer and summer.discard_incomplete:
+        function = 'dt_sum'
+    elif summer.__class__ is CTSummer:
+        function = 'ct_sum'
+    else:
+        return None
+    signs = [summer.signs[channel] for channel in summer.inputs]
+    return ['t%s, v%s = %s([%s], %r)' % (out, out, function,
+                                         ', '.join('(t%s, v%s)' % (i, i) for i in inputs), signs),
+            'e%s = inf' % out]
+
+
+def translate(actor, inputs, out):
+    '''
+    Return the lines of kernel code computing the output of an actor, or
+    None if the actor is not supported.
+
+    @param inputs: the names of the actor's input signals, in the order of
+                   get_input_channels.
+    @param out: the name of its output signal.
+    '''
+    from scipysim.actors.math import Summer
+    if actor.__class__ is Summer:
+        return _summer(actor, inputs, out)
+    if not inputs:
+        translation = _sources().get(actor.__class__)
+        return translation and translation(actor, out)
+    if len(inputs) == 1:
+        translation = _sisos().get(actor.__class__)
+        return translation and translation(actor, inputs[0], out)
+    return None
+
+
+class CompiledGraph(object):
+    '''
+    A graph with its static part compiled into a kernel function.
+
+    Attributes:
+
+    source - the source of the kernel.
+    kernel - the kernel itself, returning a dict mapping each channel it
+             computes to a (tags, values, end) tuple; end is the tag of the
+             LastEvent ending the signal.
+    compiled - the nodes computed by the kernel.
+    fallback - the nodes left to run as actors.
+    '''
+
+    def __init__(self, graph, source, compiled, computed):
+        self.graph = graph
+        self.source = source
+        self.compiled = compiled
+        self.fallback = [node for node in graph.nodes if node not in compiled]
+        self.computed = computed
+
+        namespace = dict((name, getattr(numpy, name)) for name in
+                         ['linspace', 'where', 'full', 'sin', 'pi', 'abs', 'floor', 'cumsum',
+                          'concatenate'])
+        namespace.update(dt_sum=dt_sum, ct_sum=ct_sum, inf=inf)
+        exec compile(source, '<compiled %s>' % graph.name, 'exec') in namespace
+        self._signals = namespace['kernel']
+
+    def kernel(self):
+        signals = self._signals()
+        return dict((channel, signals[index]) for channel, index in self.computed.items())
+
+    def run(self, engine='threaded', fuse=False, profile=False):
+        '''
+        Call the kernel, then run the remaining actors with an engine.
+
+        @param engine: the name of the execution engine, see CompositeActor.run.
+        @param fuse: whether to fuse chains of actors, see CompositeActor.run.
+        @param profile: whether to gather the statistics of each actor.
+
+        @return: a GraphResult, as Graph.run. The compiled nodes are not
+                 in its stats.
+        '''
+        from graph import GraphResult
+
+        start = time()
+        signals = self._signals()
+        # A fresh model for every run
+        model = self.graph.build()
+        model.components = [model.actors[node] for node in self.fallback]
+        read = set(channel for node in self.fallback
+                   for channel in node.channels() if channel not in node.output_channels)
+        for channel, index in self.computed.items():
+            if channel in read:
+                tags, values, end = signals[index]
+                model.channels[channel].put(EventBlock(tags, values, last=end == inf))
+                if end != inf:
+                    model.channels[channel].put(LastEvent(end))
+
+        outputs, stats = self.graph._run_model(model, engine, fuse, self.fallback, profile)
+        for channel in outputs:
+            if channel in self.computed:
+                tags, values, end = signals[self.computed[channel]]
+                outputs[channel] = list(EventBlock(tags, values).events())
+        return GraphResult(outputs, stats, time() - start)
+
+
+def compile_graph(graph):
+    '''
+    Compile as much of a graph as possible, see CompiledGraph.
+    '''
+    model = graph.build()
+    writers = {}
+    for node in graph.nodes:
+        for channel in node.output_channels:
+            writers[channel] = node
+
+    # Name the signals after the order of the channels in the graph
+    index = dict((channel, i) for i, channel in enumerate(graph.channels()))
+    built = dict((b, c) for c, b in model.channels.items())
+
+    lines, compiled, computed = [], [], {}
+    progress = True
+    while progress:
+        progress = False
+        for node in graph.nodes:
+            actor = model.actors[node]
+            if node in compiled or len(actor.get_output_channels()) != 1:
+                continue
+            inputs = [built[c] for c in actor.get_input_channels()]
+            if not all(channel in computed for channel in inputs):
+                continue
+            out = built[actor.output_channel]
+            code = translate(actor, [index[c] for c in inputs], index[out])
+            if code is None:
+                continue
+            lines += code
+            compiled.append(node)
+            computed[out] = index[out]
+            progress = True
+
+    logging.debug("Compiled %d of %d nodes" % (len(compiled), len(graph.nodes)))
+    signals = ', '.join('%d: (t%d, v%d, e%d)' % (i, i, i, i) for i in sorted(computed.values()))
+    source = 'def kernel():\n%s    return {%s}\n' % (
+        ''.join('    %s\n' % line for line in lines), signals)
+    return CompiledGraph(graph, source, compiled, computed)
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import os
+
+
+class TestCompiler(unittest.TestCase):
+
+    def node(self, name, *path):
+        from graph import Node
+        from codefile import CodeFile
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, 'actors'))
+        return Node(CodeFile(os.path.join(root, *path), name))
+
+    def assert_same_result(self, graph):
+        '''The compiled graph gives the same events as the actors'''
+        expected = graph.run(engine='cooperative')
+        result = graph.compile().run(engine='cooperative', profile=True)
+        self.assertEquals(expected.outputs.keys(), result.outputs.keys())
+        for channel in expected.outputs:
+            a, b = expected.outputs[channel], result.outputs[channel]
+            self.assertEquals(len(a), len(b))
+            for x, y in zip(a, b):
+                self.assertAlmostEqual(x.tag, y.tag, 9)
+                self.assertAlmostEqual(x.value, y.value, 9)
+        return result
+
+    def make_graph(self):
+        '''ramp -> gain -> delay -> integrator, and a sum of constants'''
+        from graph import Graph
+        graph = Graph('compile test')
+        ramp = self.node('Ramp', 'signal', 'ramp.py')
+        gain = self.node('Proportional', 'math', 'proportional.py')
+        delay = self.node('Delay', 'signal', 'delay.py')
+        integrator = self.node('DTIntegratorTrapezoidal', 'math', 'dt_integrator.py')
+        constants = [self.node('Constant', 'math', 'constant.py') for _ in xrange(2)]
+        summer = self.node('Summer', 'math', 'summer.py')
+        for node in [ramp, gain, delay, integrator, summer] + constants:
+            graph.add(node)
+        ramp.set_parameter('simulation_time', 10)
+        gain.set_parameter('gain', -3.0)
+        delay.set_parameter('wait', 0.5)
+        for constant, value in zip(constants, [1.0, 2.5]):
+            constant.set_parameter('value', value)
+            constant.set_parameter('simulation_time', 5)
+        # The integrator and summer need their inputs to have a domain
+        for node in [ramp, gain, delay, integrator]:
+            node.output_channels[0].domain = 'DT'
+        for node in constants + [summer]:
+            node.output_channels[0].domain = 'CT'
+        graph.connect(ramp.output_channels[0], gain)
+        graph.connect(gain.output_channels[0], delay)
+        graph.connect(delay.output_channels[0], integrator)
+        summer.input_channels = [constants[0].output_channels[0], constants[1].output_channels[0]]
+        return graph, [ramp, gain, delay, integrator, summer] + constants
+
+    def test_compiles_whole_graph(self):
+        graph, nodes = self.make_graph()
+        compiled = graph.compile()
+        self.assertEquals(set(compiled.compiled), set(nodes))
+        self.assertEquals(compiled.fallback, [])
+        self.assertTrue('cumsum' in compiled.source)
+        result = self.assert_same_result(graph)
+        self.assertEquals(result.stats, {})
+
+    def test_unsupported_nodes_fall_back(self):
+        '''Actors after an unsupported one run as actors, fed by the kernel'''
+        graph, nodes = self.make_graph()
+        ramp, gain, delay, integrator = nodes[:4]
+        graph.remove(integrator)
+        decimator = self.node('Decimator', 'signal', 'decimator.py')
+        abs_ = self.node('Abs', 'math', 'abs.py')
+        graph.add(decimator)
+        graph.add(abs_)
+        graph.connect(delay.output_channels[0], decimator)
+        graph.connect(decimator.output_channels[0], abs_)
+        compiled = graph.compile()
+        self.assertEquals(compiled.fallback, [decimator, abs_])
+        result = self.assert_same_result(graph)
+        self.assertEquals(set(result.stats), set([decimator, abs_]))
+
+    def test_sum_helpers(self):
+        a = (numpy.array([0., 1, 2, 3]), numpy.array([1., 2, 3, 4]))
+        b = (numpy.array([1., 2, 5]), numpy.array([10., 20, 30]))
+        tags, values = dt_sum([a, b], [1.0, -1.0])
+        self.assertEquals(tags.tolist(), [1, 2])
+        self.assertEquals(values.tolist(), [-8, -17])
+        tags, values = ct_sum([a, b], [1.0, 1.0])
+        self.assertEquals(tags.tolist(), [0, 1, 2, 3])
+        self.assertEquals(values.tolist(), [1, 12, 23, 24])
+
+
+if __name__ == "__main__":
+    unittest.main()
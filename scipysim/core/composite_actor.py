@@ -1,7 +1,14 @@
-from time import sleep
-
 from actor import Actor
 from actor import DisplayActor
+from actor import CompletionLatch
+from channel import find_deadlock
+from errors import SimulationDeadlock
+from scheduler import Scheduler
+from sdf import SDFScheduler
+from de import DEScheduler
+from multiprocess import MultiprocessScheduler
+from fusion import fuse_siso_chains
+from instrumentation import Profiler, Tracer
 import logging
 
 class CompositeActor(Actor):
@@ -12,9 +19,42 @@ class CompositeActor(Actor):
     A CompositeActor can define a custom run function which starts and runs the simulation.
     Or a CompositeActor can set up the model in __init__ and have all the actors in self.components
     then the default run function of a CompositeActor will run the simulation.
+
+    The components can be executed by different engines, selected by name
+    when calling run:
+        * threaded - every actor runs in its own thread (the default)
+        * cooperative - actors are fired from a single thread, see Scheduler
+        * sdf - a static schedule is compiled for the actors with fixed
+                token rates, see SDFScheduler
+        * de - actors are fired in timestamp order from a global event
+               calendar, see DEScheduler
+        * multiprocess - the actors are split between worker processes,
+                         one per core, see MultiprocessScheduler
     '''
 
     components = []
+    cooperative = False
+
+    # Seconds between checks for deadlock while the threaded engine runs
+    deadlock_poll = 1.0
+
+    # The file every run writes a trace to if not given one, see run
+    default_trace = None
+
+    # The ResultCache every run uses if not given one, see run
+    default_cache = None
+
+    # The file every run saves checkpoints to if not given one, and the
+    # default seconds between them, see run
+    default_checkpoint = None
+    checkpoint_interval = 60.0
+
+    engines = {
+        'cooperative': Scheduler,
+        'sdf': SDFScheduler,
+        'de': DEScheduler,
+        'multiprocess': MultiprocessScheduler,
+    }
 
     def __init__(self, *args, **kwargs):
         '''
@@ -32,32 +72,164 @@ class CompositeActor(Actor):
         '''
         pass
 
-    def run(self):
+    def run(self, engine='threaded', fuse=False, profile=False, trace=None,
+            checkpoint=None, checkpoint_interval=None, cache=None):
         '''The run function starts the CompositeActor or simulation usually by calling the process
         function. It counts as the "main" thread for a running simulation.
+
+        @param engine: the name of the execution engine to use, either
+                       'threaded' or one of the keys of CompositeActor.engines.
+        @param fuse: if True, chains of single input, single output actors
+                     are run as one actor each, see fuse_siso_chains.
+        @param profile: if True, record statistics of each actor's firings,
+                        events and time, see scipysim.core.instrumentation.
+        @param trace: the name of a file to write a Chrome trace of the run
+                      to, see Tracer. Defaults to CompositeActor.default_trace.
+                      Neither a profile nor a trace can be made of a run
+                      by the 'multiprocess' engine.
+        @param checkpoint: the name of a file to save checkpoints of the
+                           simulation to, every 'checkpoint_interval'
+                           seconds (by default CompositeActor.checkpoint_interval),
+                           see scipysim.core.checkpoint. Defaults to
+                           CompositeActor.default_checkpoint. A
+                           checkpointed run always uses the cooperative engine,
+                           and can't be profiled, traced or cached.
+        @param cache: a ResultCache that the signals of the deterministic
+                      part of the model are replayed from or stored in, see
+                      scipysim.core.cache. Defaults to CompositeActor.default_cache.
+
+        @return: the Profile of the run if profile is True.
         '''
         assert hasattr(self, 'components')
+        components = self.components
+        if cache is None:
+            cache = self.default_cache
+        if trace is None:
+            trace = self.default_trace
+        if checkpoint is None:
+            checkpoint = self.default_checkpoint
+        if engine == 'multiprocess' and (profile or trace):
+            # The actors fire in the workers, out of reach of the wrappers
+            raise ValueError("Can't profile or trace a model run by the 'multiprocess' engine")
+        options = {}
+        if checkpoint:
+            if engine not in ('threaded', 'cooperative'):
+                raise ValueError("Can't checkpoint a model run by the '%s' engine" % engine)
+            if profile or trace:
+                raise ValueError("Can't checkpoint a profiled or traced run")
+            # A resumed run would store only the signals from the checkpoint on
+            if cache is not None:
+                raise ValueError("Can't checkpoint a run that uses a result cache")
+            engine = 'cooperative'
+            if checkpoint_interval is None:
+                checkpoint_interval = self.checkpoint_interval
+            options = {'checkpoint': checkpoint, 'checkpoint_interval': checkpoint_interval}
+        if cache is not None:
+            components, store = cache.prepare(components)
+        if fuse:
+            components = fuse_siso_chains(components)
+
+        profiler = Profiler(components) if profile else None
+        tracer = Tracer(components) if trace else None
+        if profiler:
+            profiler.attach()
+        if tracer:
+            tracer.attach()
+        try:
+            self._simulate(components, engine, **options)
+        finally:
+            if tracer:
+                tracer.detach(trace)
+            if profiler:
+                self.profile = profiler.detach()
+            if cache is not None:
+                store()
+        if profiler:
+            return self.profile
+
+    def _simulate(self, components, engine, **options):
+        if engine != 'threaded':
+            if engine not in self.engines:
+                raise ValueError("Unknown simulation engine '%s'" % engine)
+            try:
+                self.engines[engine](components, **options).run()
+            except KeyboardInterrupt:
+                [component.terminate() for component in components]
+            return
 
         try:
             logging.info("Starting simulation")
-            [component.start() for component in self.components]
+            latch = CompletionLatch(len(components))
+            [component.start(latch) for component in components]
             logging.debug("Finished starting actors")
 
-            # Wait for threads to finish
-            # Required for KeyboardInterrupt to be handled reliably
+            # Wait for the last actor to finish. The wait has a timeout as
+            # that is required for KeyboardInterrupt to be handled reliably
             # See: http://luke.maurits.id.au/blog/2008/03/threads-and-signals-in-python/
-            while True:
-                if not any([component.is_alive() for component in self.components]):
-                    # All threads have stopped
-                    break
-                else:
-                    # Some threads are still going
-                    sleep(1)
+            suspect = None
+            while not latch.wait(self.deadlock_poll):
+                alive = [component for component in components if component.is_alive()]
 
+                # Bounded channels can deadlock, e.g. a feedback loop that
+                # fills up. Only believe it if nothing changes for a whole poll.
+                report = find_deadlock([component.thread for component in alive])
+                if report is not None and report == suspect:
+                    self.abort(components)
+                    raise SimulationDeadlock("All actors are blocked on channels:\n" + report)
+                suspect = report
+
+            [component.join() for component in components]
             logging.debug("Finished running simulation")
         except KeyboardInterrupt:
-            [component.terminate() for component in self.components]
-            [component.join() for component in self.components]
+            [component.terminate() for component in components]
+            [component.join() for component in components]
+
+    def extend(self, simulation_time):
+        '''
+        Get a finished simulation ready to be carried on to a later
+        simulation_time, like Actor.extend, without running it.
 
+        Every source will continue its signal from where it ended, and the
+        other actors from the state they were left in, so only the new
+        part of the signal is simulated. The LastEvents left in the
+        channels by the first run are discarded.
 
+        @param simulation_time: the new end of the simulation.
+        '''
+        super(CompositeActor, self).extend(simulation_time)
+        channels = set()
+        for component in self.components:
+            channels.update(component.get_input_channels())
+            channels.update(component.get_output_channels())
+        [channel.discard_last() for channel in channels]
+        [component.extend(simulation_time) for component in self.components]
+        logging.info("Extending simulation to %s", simulation_time)
+
+    def extend_and_run(self, simulation_time, **options):
+        '''
+        Carry a finished simulation on to a later simulation_time, see extend.
 
+        @param simulation_time: the new end of the simulation.
+        @param options: passed on to run.
+
+        @return: whatever run returns.
+        '''
+        self.extend(simulation_time)
+        return self.run(**options)
+
+    def abort(self, components=None):
+        '''Wake every actor blocked on one of the model's channels and wait
+        for them to stop.
+
+        @param components: the actors that are running, if not the
+                           model's components.
+        '''
+        logging.error("Aborting deadlocked simulation")
+        if components is None:
+            components = self.components
+        channels = set()
+        for component in components:
+            channels.update(component.get_input_channels())
+            channels.update(component.get_output_channels())
+        [channel.abort() for channel in channels]
+        [component.join() for component in components if component.is_alive()]
@@ -0,0 +1,410 @@
+'''
+A discrete-event (DE) simulation kernel with a global event calendar.
+
+In the threaded engine an actor like Merge or CTIntegratorQS1 sits blocked on
+the heads of its input channels until events turn up, so a model keeps one
+idle thread per actor and the order in which events are handled is left to
+the thread scheduler. The DEScheduler instead keeps a single calendar - a
+heap ordered by tag - of the actors that have something to do, and fires
+them from one thread in timestamp order. Putting an event on a channel
+schedules the actor reading that channel at the event's tag, so the work
+done grows with the number of events rather than the number of actors.
+
+Time is superdense: a calendar entry is keyed by (tag, microstep). An event
+produced with the same tag as the firing that produced it is handled at the
+next microstep, so chains of zero-delay actors are still ordered.
+
+Actors may also schedule their own DEVS-style internal transitions, that is
+state changes that happen because time has advanced rather than because an
+event arrived. Such an actor returns the tag of its next internal transition
+from Actor.next_internal_transition, and the kernel calls
+Actor.internal_transition when the calendar reaches that tag. A transition is
+held back while an actor that is still waiting on one of its inputs could
+produce an earlier event, and is only forced once nothing else can happen.
+
+Sources are fired whenever their output channels have room, before each
+calendar entry is handled, so with unbounded channels they produce their
+whole signal before the calendar starts, and with bounded ones (see Channel)
+they keep just ahead of their readers. Actors with cooperative = False (e.g.
+the plotters) are run in their own threads.
+
+Example of usage::
+
+    DEScheduler(model.components).run()
+
+or::
+
+    model.run(engine='de')
+
+'''
+
+import heapq
+import threading
+from time import sleep
+import logging
+
+from numpy import inf
+
+from actor import Source
+from channel import context
+from event import Event, EventBlock
+from errors import SimulationDeadlock
+
+# Calendar entry kinds. Internal transitions at a tag are taken before the
+# events received at that tag, as in the CTIntegratorQS1 process function.
+INTERNAL, EXTERNAL = 0, 1
+
+
+class DEScheduler(object):
+    '''
+    Fire a set of actors in timestamp order from a global event calendar.
+    '''
+
+    # Seconds to wait for threaded actors when the calendar is empty
+    idle_wait = 0.001
+
+    def __init__(self, components):
+        '''
+        @param components: a list of actors, or a CompositeActor.
+        '''
+        if hasattr(components, 'components'):
+            components = components.components
+        self.components = list(components)
+
+        self.sources = [c for c in self.components if c.cooperative and isinstance(c, Source)]
+        self.actors = [c for c in self.components if c.cooperative and not isinstance(c, Source)]
+        self.threaded = [c for c in self.components if not c.cooperative]
+
+        self.consumers = {}
+        for actor in self.actors:
+            for channel in actor.get_input_channels():
+                self.consumers[channel] = actor
+
+        self.calendar = []
+        self.now = (-inf, 0)
+        self.firings = 0
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._pending = {}      # (actor, kind) -> key of its live calendar entry
+        self._ends = {}         # channel -> tag of the last event put on it
+        self._stalled = set()   # actors holding events but waiting on another input
+        self._deferred = []     # internal transitions held back by stalled actors
+
+    def run(self):
+        '''
+        Run the model until the calendar is empty and every threaded actor
+        has finished.
+
+        Raises a SimulationDeadlock if some actors never finished because
+        they were waiting on events that never arrived.
+        '''
+        logging.info("Starting DE simulation of %d actors (%d threaded)"
+                     % (len(self.actors), len(self.threaded)))
+        for channel in self.consumers:
+            channel.listener = self._on_put
+
+        [component.start() for component in self.threaded]
+        context.cooperative = True
+        try:
+            self._fire_sources()
+            for actor in self.actors:
+                self._reschedule(actor)
+
+            while True:
+                self._fire_sources()
+                entry = self._pop()
+                if entry is not None:
+                    self._fire(*entry)
+                elif self._deferred:
+                    # Nothing else can happen, so the earliest internal
+                    # transition is the only way forward.
+                    self._deferred.sort()
+                    key, kind, sequence, actor = self._deferred.pop(0)
+                    if self._pending.get((actor, kind)) == key:
+                        del self._pending[(actor, kind)]
+                        self._fire(key, kind, sequence, actor, force=True)
+                elif any(c.is_alive() for c in self.threaded):
+                    sleep(self.idle_wait)
+                else:
+                    break
+        except KeyboardInterrupt:
+            [component.terminate() for component in self.threaded]
+            raise
+        finally:
+            context.cooperative = False
+            for channel in self.consumers:
+                channel.listener = None
+
+        [component.join() for component in self.threaded]
+
+        unfinished = [a.__class__.__name__ for a in self.sources + self.actors if not a.stop]
+        if unfinished:
+            raise SimulationDeadlock("Calendar is empty but these actors did not finish: %s"
+                                     % ', '.join(unfinished))
+        logging.debug("Finished DE simulation after %d firings" % self.firings)
+
+    def _fire_sources(self):
+        '''Fire each source for as long as its output channels have room.'''
+        for source in self.sources:
+            while not source.stop and source.ready_to_fire():
+                source.process()
+                self.firings += 1
+
+    def _key(self, tag):
+        '''Return the superdense time at which an event with this tag is handled.'''
+        time, microstep = self.now
+        if tag <= time:
+            return (time, microstep + 1)
+        return (tag, 0)
+
+    def _time_of(self, channel, event):
+        '''The tag of an event, taking a termination event without a tag,
+        or an item that isn't an event (e.g. the record arrays sent by
+        Bundle), as happening at the tag of the event before it.'''
+        if not isinstance(event, (Event, EventBlock)):
+            return self._ends.get(channel, self.now[0])
+        if event.last and event.tag == inf:
+            return self._ends.get(channel, self.now[0])
+        return event.tag
+
+    def _schedule(self, actor, kind, key):
+        '''Add an entry to the calendar, unless the actor already has an earlier one.'''
+        with self._lock:
+            pending = self._pending.get((actor, kind))
+            if pending == key or (kind == EXTERNAL and pending is not None and pending < key):
+                # An internal transition may move later, an external entry
+                # only ever needs to be brought forward.
+                return
+            self._pending[(actor, kind)] = key
+            self._sequence += 1
+            heapq.heappush(self.calendar, (key, kind, self._sequence, actor))
+
+    def _pop(self):
+        '''Remove and return the earliest live calendar entry, or None.'''
+        with self._lock:
+            while self.calendar:
+                key, kind, sequence, actor = heapq.heappop(self.calendar)
+                if self._pending.get((actor, kind)) == key:
+                    del self._pending[(actor, kind)]
+                    return key, kind, sequence, actor
+        return None
+
+    def _on_put(self, channel, event):
+        '''Channel listener - schedule the reader of the channel.'''
+        if isinstance(event, EventBlock):
+            # A block is handled from the tag of its first event
+            if not len(event):
+                tag = self._ends.get(channel, self.now[0])
+            else:
+                tag = event.tag[0]
+                self._ends[channel] = event.tag[-1]
+        elif not isinstance(event, Event):
+            tag = self._time_of(channel, event)
+        else:
+            if not event.last:
+                self._ends[channel] = event.tag
+            tag = self._time_of(channel, event)
+        actor = self.consumers[channel]
+        if not actor.stop:
+            self._schedule(actor, EXTERNAL, self._key(tag))
+
+    def _earliest(self, actor):
+        '''The earliest tag at the head of any of the actor's inputs.'''
+        tags = [self._time_of(c, c.head(block=False))
+                for c in actor.get_input_channels() if not c.empty()]
+        return min(tags) if tags else None
+
+    def _fire(self, key, kind, sequence, actor, force=False):
+        '''Handle one calendar entry.'''
+        if actor.stop:
+            return
+        if kind == INTERNAL:
+            bound = min([self._earliest(a) for a in self._stalled] or [inf])
+            if key[0] > bound and not force:
+                # Keep the entry live while it waits
+                self._pending[(actor, kind)] = key
+                self._deferred.append((key, kind, sequence, actor))
+                return
+            self.now = key
+            actor.internal_transition()
+            self.firings += 1
+        else:
+            self.now = key
+            while not actor.stop and actor.ready_to_fire() and self._earliest(actor) <= key[0]:
+                actor.process()
+                self.firings += 1
+        self._reschedule(actor)
+
+    def _reschedule(self, actor):
+        '''Add calendar entries for whatever the actor has left to do.'''
+        if actor.stop:
+            self._stalled.discard(actor)
+            return
+
+        earliest = self._earliest(actor)
+        if earliest is not None and actor.ready_to_fire():
+            self._schedule(actor, EXTERNAL, self._key(earliest))
+        if earliest is not None and not actor.ready_to_fire():
+            self._stalled.add(actor)
+        elif actor in self._stalled:
+            self._stalled.discard(actor)
+            # A held back internal transition may now be safe to take
+            for entry in self._deferred:
+                heapq.heappush(self.calendar, entry)
+            self._deferred = []
+
+        tag = actor.next_internal_transition()
+        if tag is not None and tag < inf:
+            self._schedule(actor, INTERNAL, self._key(tag))
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import numpy
+from actor import Actor
+from channel import Channel, MakeChans
+from event import Event, LastEvent
+from siso import Siso
+
+
+class Recorder(Siso):
+    '''Pass events through, noting the tags in a shared log.'''
+    def __init__(self, input_channel, output_channel, log):
+        super(Recorder, self).__init__(input_channel, output_channel)
+        self.log = log
+
+    def siso_process(self, event):
+        self.log.append(event.tag)
+        return event
+
+
+class Clock(Actor):
+    '''Emit an event every period using internal transitions only.'''
+    num_inputs = 0
+    num_outputs = 1
+
+    def __init__(self, out, period, end):
+        super(Clock, self).__init__(output_channel=out)
+        self.tag, self.period, self.end = 0.0, period, end
+
+    def next_internal_transition(self):
+        return self.tag
+
+    def internal_transition(self):
+        if self.tag > self.end:
+            self.output_channel.put(LastEvent())
+            self.stop = True
+            return
+        self.output_channel.put(Event(self.tag, self.tag))
+        self.tag += self.period
+
+
+class TestDE(unittest.TestCase):
+
+    def test_timestamp_order(self):
+        '''Events on independent branches are handled in tag order'''
+        log = []
+        a, b, c, d = MakeChans(4)
+        [a.put(Event(tag, 0)) for tag in [0, 2, 4]]
+        [b.put(Event(tag, 0)) for tag in [1, 3, 5]]
+        a.put(LastEvent())
+        b.put(LastEvent())
+        DEScheduler([Recorder(a, c, log), Recorder(b, d, log)]).run()
+        self.assertEquals(log, range(6))
+
+    def test_merge(self):
+        '''Merge gives the same time ordered output as the threaded engine'''
+        from scipysim.actors.signal import Merge
+        a, b, out = MakeChans(3)
+        [a.put(Event(2.0 * i, 1)) for i in xrange(3)]
+        [b.put(Event(0.5 * i, 2)) for i in xrange(11)]
+        a.put(LastEvent())
+        b.put(LastEvent())
+        DEScheduler([Merge([a, b], out)]).run()
+        tags = []
+        while not out.head(block=False).last:
+            tags.append(out.get(block=False).tag)
+        self.assertEquals(tags, sorted(tags))
+        self.assertEquals(len(tags), 12)
+
+    def test_internal_transitions(self):
+        '''An actor with no inputs can drive a model from the calendar'''
+        log = []
+        tick, out = MakeChans(2)
+        clock = Clock(tick, period=0.5, end=2)
+        recorder = Recorder(tick, out, log)
+        DEScheduler([recorder, clock]).run()
+        self.assertEquals(log, [0.0, 0.5, 1.0, 1.5, 2.0])
+        self.assertTrue(clock.stop and recorder.stop)
+
+    def test_qs_integrator(self):
+        '''Integrate a constant with the quantized state integrator'''
+        from scipysim.actors.math import Constant, CTIntegratorQS1
+        xdot, x = MakeChans(2)
+        components = [Constant(xdot, value=1.0, resolution=10, simulation_time=5),
+                      CTIntegratorQS1(xdot, x, init=0.0, delta=0.1, maxstep=1)]
+        DEScheduler(components).run()
+        events = []
+        while not x.head(block=False).last:
+            events.append(x.get(block=False))
+        tags = [e.tag for e in events]
+        self.assertEquals(tags, sorted(tags))
+        self.assertAlmostEqual(events[-1].value, events[-1].tag, 1)
+
+    def test_bundle(self):
+        '''The record arrays sent by Bundle are handled at the end of the signal'''
+        from scipysim.actors.signal import Ramp
+        from scipysim.actors.io import Bundle
+        from sweep import Recorder as Sink
+        wires = MakeChans(2)
+        sink = Sink(wires[1])
+        DEScheduler([sink, Bundle(wires[0], wires[1], bundle_size=8),
+                     Ramp(wires[0], resolution=10, simulation_time=2, block_size=1)]).run()
+        self.assertTrue(sink.stop)
+        self.assertTrue(numpy.allclose(sink.signal().tag, numpy.arange(20) / 10.0))
+
+    def test_bounded_channels(self):
+        '''Sources are held back by full channels and fired as they empty'''
+        from scipysim.actors.math import Summer
+        from scipysim.actors.signal import Ramp, Merge
+        from sweep import Recorder as Sink
+
+        def run(capacity):
+            wires = [Channel('DT', capacity=capacity) for _ in xrange(5)]
+            sink = Sink(wires[4])
+            DEScheduler([sink, Merge([wires[2], wires[3]], wires[4]),
+                         Summer([wires[0], wires[1]], wires[2]),
+                         Ramp(wires[0], resolution=10, simulation_time=10, block_size=1),
+                         Ramp(wires[1], resolution=10, simulation_time=10, block_size=1),
+                         Ramp(wires[3], resolution=4, simulation_time=10, block_size=1)]).run()
+            return sink.signal()
+
+        bounded, unbounded = run(4), run(0)
+        self.assertTrue(len(bounded) > 100)
+        self.assertTrue(numpy.all(numpy.diff(bounded.tag) >= 0))
+        self.assertEquals(list(bounded.tag), list(unbounded.tag))
+        self.assertEquals(list(bounded.value), list(unbounded.value))
+
+    def test_deadlock(self):
+        '''An actor waiting on an input that never arrives is reported'''
+        from scipysim.actors.signal import Merge
+        a, b, out = MakeChans(3)
+        a.put(Event(0, 0))
+        self.assertRaises(SimulationDeadlock, DEScheduler([Merge([a, b], out)]).run)
+
+    def test_composite_actor_engine(self):
+        '''CompositeActor.run can select the DE engine'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.signal import Ramp, Delay, Sink
+        wires = MakeChans(2)
+        model = CompositeActor()
+        model.components = [Ramp(wires[0], resolution=5, simulation_time=2),
+                            Delay(wires[0], wires[1], wait=0), Sink(wires[1])]
+        model.run(engine='de')
+        self.assertTrue(all(c.stop for c in model.components))
+
+
+if __name__ == "__main__":
+    unittest.main()
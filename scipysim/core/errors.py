@@ -7,3 +7,12 @@ class InvalidSimulationInput(TypeError):
 
 class NoProcessFunctionDefined(NotImplementedError):
     pass
+
+class SimulationDeadlock(RuntimeError):
+    pass
+
+class InconsistentRates(ValueError):
+    pass
+
+class WorkerFailed(RuntimeError):
+    pass
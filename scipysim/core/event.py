@@ -17,17 +17,35 @@ Created on 16/03/2010
 # For backwards compatibility with dict-based events
 from collections import Mapping 
 
+import numpy
 from numpy import inf
 
-class Event(Mapping):
+class _EventFields(object):
+    '''The storage of an Event.'''
+    __slots__ = ('tag', 'value', 'last')
+
+# Set the fields of an immutable event, bypassing Event.__setattr__. Calling
+# the slot descriptors directly is quicker than object.__setattr__.
+_set_tag = _EventFields.tag.__set__
+_set_value = _EventFields.value.__set__
+_set_last = _EventFields.last.__set__
+
+# Read a field by name, for the dict-style interface
+_getters = dict((name, getattr(_EventFields, name).__get__) for name in _EventFields.__slots__)
+
+
+class Event(_EventFields):
     '''
     An Event consists of a tag (e.g. time in a continuous-time model of
     computation, but may be interpreted in other ways by other models of 
     computation) and a value. An event may be marked as representing
     the last event in a signal by constructing it with 'last' = true.
     
-    @note For backwards compatibility with older-style dict-based events, the
-    Event class uses the Mapping mixin from collections.
+    @note For backwards compatibility with older-style dict-based events, an
+    Event can be read like a dict with the keys 'tag', 'value' and 'last', and
+    is registered as a collections.Mapping. Events are created for every
+    sample so they store their fields in slots rather than a dict; see
+    benchmarks/event_bench.py.
     
     Example of usage:
     
@@ -50,7 +68,13 @@ class Event(Mapping):
     TypeError: 'Event' object does not support item assignment
 
     '''
-    __event = None 
+    __slots__ = ()
+
+    # The keys of the dict-style interface
+    _fields = ('tag', 'value', 'last')
+
+    # Events compare by value, and like dicts are not hashable
+    __hash__ = None
 
     def __init__(self, tag=None, value=None, last=False):
         '''
@@ -62,10 +86,9 @@ class Event(Mapping):
         @param value
         @param last: true if this is the last event in a signal
         '''
-        super(Event, self).__setattr__('_Event__event', 
-                                       { 'tag':   tag,
-                                         'value': value,
-                                         'last':   last})
+        _set_tag(self, tag)
+        _set_value(self, value)
+        _set_last(self, last)
     
     def __repr__(self):
         return 'Event(%s, %s, %s)' % (self.tag, self.value, self.last)
@@ -75,29 +98,54 @@ class Event(Mapping):
         Implement Mapping interface to allow Events to behave as dicts
         (for backwards compatibility with earlier Event implementation).
         '''     
-        return iter(self.__event)
+        return iter(self._fields)
         
     def __contains__(self, key):
         '''
         Implement Mapping interface to allow Events to behave as dicts
         (for backwards compatibility with earlier Event implementation).
         '''    
-        return key in self.__event
+        return key in self._fields
     
     def __len__(self):
         '''
         Implement Mapping interface to allow Events to behave as dicts
         (for backwards compatibility with earlier Event implementation).
         ''' 
-        return len(self.__event)    
+        return len(self._fields)
         
     def __getitem__(self, key):
         '''Allow dict-style access for 'tag', 'value', and 'last'.'''
-        return self.__event[key]
-    
-    def __getattr__(self, name):
-        '''Allow accessors for 'tag', 'value', and 'last'. '''
-        return self.__event[name]    
+        return _getters[key](self)
+
+    def get(self, key, default=None):
+        if key not in self._fields:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return [self.tag, self.value, self.last]
+
+    def items(self):
+        return zip(self._fields, self.values())
+
+    def __eq__(self, other):
+        '''Events are equal to any event or mapping with the same items.'''
+        if isinstance(other, Event):
+            return (self.tag == other.tag and self.value == other.value
+                    and self.last == other.last)
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
     
     def __setattr__(self, name, value):
         '''Disable changes to attributes.'''
@@ -110,20 +158,20 @@ class Event(Mapping):
     def __getstate__(self):
         '''Support for pickling.
 
-        The scheme we use for immutability seems to interfere with
-        the pickling protocol. To get around this, we define the __getstate__
-        method, and have it return the internal object state.'''
-        return self.__event
+        Objects with slots have no __dict__ to pickle, so the state is
+        returned as a dict of the event fields (the same state the earlier
+        dict-based Event pickled).'''
+        return dict(self.items())
 
     def __setstate__(self, state):
         '''Support for unpickling.
 
-        The scheme we use for immutability seems to interfere with
-        the pickling protocol. The __setstate__ method, using a state
-        assumed to have been returned by Event.__getstate__, ensures that
-        the Event internal state is properly reconstructed during unpickling.
+        Restores the fields from a state returned by Event.__getstate__,
+        bypassing the immutability of the event.
         '''
-        super(Event, self).__setattr__('_Event__event', state)
+        _set_tag(self, state['tag'])
+        _set_value(self, state['value'])
+        _set_last(self, state['last'])
 
     def __mutation_error(self):
         raise TypeError("Events are immutable")
@@ -139,18 +187,20 @@ class Event(Mapping):
     def __deepcopy__(self, memo={}):
         '''Return a deep copy of the Event.'''
         from copy import deepcopy
-        result = self.__class__()
+        result = Event.__new__(self.__class__)
         memo[id(self)] = result
-        copied = deepcopy(self.__event, memo)
-        result.__init__(copied['tag'], copied['value'], copied['last'])
+        result.__setstate__(deepcopy(self.__getstate__(), memo))
         return result    
 
+Mapping.register(Event)
+
 
 class LastEvent(Event):
     '''
     An immutable signal termination event with a value of None.
 
     '''
+    __slots__ = ()
 
     def __init__(self, tag=inf):
         '''
@@ -161,6 +211,96 @@ class LastEvent(Event):
         super(LastEvent, self).__init__(tag, None, True)
 
 
+def _event_values(values):
+    '''The values of a block as a list with one value per event: Python
+    numbers, or for an ensemble (see EventBlock) arrays.'''
+    if values.ndim > 1:
+        return list(values)
+    return values.tolist()
+
+
+class EventBlock(object):
+    '''
+    A block of consecutive events of one signal, held as NumPy arrays of
+    tags and values. Channels carry blocks in place of many individual
+    Events so that actors can process a whole frame of samples with array
+    operations (see Siso.siso_process_block). A block marked 'last' ends
+    the signal, as if followed by a LastEvent.
+
+    Actors that read single events from a channel still get Events, the
+    channel splits blocks up as needed.
+
+    Blocks may be shared by several channels (e.g. by Split) so their
+    arrays must not be modified.
+
+    The value of an event may itself be an array, e.g. one value for each
+    member of a Monte Carlo ensemble (see RandomSource). The values of a
+    block of such events have the ensemble as their second axis.
+
+    >>> block = EventBlock([0.0, 1.0, 2.0], [5.0, 6.0, 7.0])
+    >>> len(block)
+    3
+    >>> block[1]
+    Event(1.0, 6.0, False)
+    >>> [e.value for e in block.events()]
+    [5.0, 6.0, 7.0]
+    '''
+    __slots__ = ('tag', 'value', 'last')
+
+    def __init__(self, tag, value, last=False):
+        '''
+        @param tag: sequence of tags.
+        @param value: sequence of values, the same length as tag.
+        @param last: true if this block ends the signal.
+        '''
+        self.tag = numpy.asarray(tag, dtype=float)
+        self.value = numpy.asarray(value)
+        self.last = last
+        if self.tag.shape[:1] != self.value.shape[:1]:
+            raise ValueError("Tag and value arrays must be the same length")
+
+    @classmethod
+    def from_events(cls, events, last=False):
+        '''Make a block from a list of Events.'''
+        return cls([e.tag for e in events], [e.value for e in events], last)
+
+    @classmethod
+    def from_records(cls, records, last=False):
+        '''Make a block from a record array with 'Tag' and 'Value'
+        fields, as produced by the Bundle actor.'''
+        return cls(records['Tag'], records['Value'], last)
+
+    def to_records(self):
+        '''Return the events as a record array with 'Tag' and 'Value' fields.'''
+        records = numpy.zeros(len(self), dtype={'names': ["Tag", "Value"],
+                                                'formats': ['f8', self.value.dtype]})
+        records['Tag'] = self.tag
+        records['Value'] = self.value
+        return records
+
+    def events(self):
+        '''Iterate over the block as individual Events, ending with a
+        LastEvent if the block ends the signal.'''
+        for tag, value in zip(self.tag.tolist(), _event_values(self.value)):
+            yield Event(tag, value)
+        if self.last:
+            yield LastEvent()
+
+    def __len__(self):
+        return len(self.tag)
+
+    def __getitem__(self, index):
+        '''An integer index gives an Event, a slice gives a new block
+        (which is never marked last).'''
+        if isinstance(index, slice):
+            return EventBlock(self.tag[index], self.value[index])
+        value = self.value[index]
+        return Event(self.tag[index].item(), value if self.value.ndim > 1 else value.item())
+
+    def __repr__(self):
+        return 'EventBlock(%d events, %s)' % (len(self), self.last)
+
+
 # --------------------------------------------------------------------
 # Testing
 # --------------------------------------------------------------------
@@ -220,6 +360,25 @@ class TestEvent(unittest.TestCase):
     def test_event_is_not_terminal(self):
         self.assertFalse(self.event.last)
 
+    def test_event_pickles(self):
+        import pickle
+        for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+            event = pickle.loads(pickle.dumps(self.event, protocol))
+            self.assertEqual(event, self.event)
+            self.assertRaises(TypeError, setattr, event, 'tag', 0)
+
+    def test_event_has_no_dict(self):
+        self.assertFalse(hasattr(self.event, '__dict__'))
+
+    def test_event_equality(self):
+        self.assertEqual(self.event, Event(self.tag, self.value))
+        self.assertNotEqual(self.event, Event(self.tag, 0))
+        self.assertEqual(self.event, {'tag': self.tag, 'value': self.value, 'last': False})
+
+    def test_event_is_still_a_mapping(self):
+        self.assertTrue(isinstance(self.event, Mapping))
+        self.assertEqual(dict(self.event), {'tag': self.tag, 'value': self.value, 'last': False})
+
 
 class TestLastEvent(unittest.TestCase):
 
@@ -241,6 +400,50 @@ class TestLastEvent(unittest.TestCase):
             self.event.last = False
         self.assertRaises(TypeError, mutate)
 
+    def test_last_event_pickles(self):
+        import pickle
+        event = pickle.loads(pickle.dumps(self.event, pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(isinstance(event, LastEvent))
+        self.assertTrue(event.last)
+        self.assertEqual(event.tag, self.tag)
+
+
+class TestEventBlock(unittest.TestCase):
+
+    def setUp(self):
+        self.block = EventBlock(numpy.arange(5.0), numpy.arange(5.0) * 2, last=True)
+
+    def test_events(self):
+        events = list(self.block.events())
+        self.assertEqual(len(events), 6)
+        self.assertEqual(events[3], Event(3.0, 6.0))
+        self.assertTrue(events[-1].last)
+
+    def test_lengths_must_match(self):
+        self.assertRaises(ValueError, EventBlock, [0, 1], [0])
+
+    def test_slice(self):
+        part = self.block[1:3]
+        self.assertEqual(list(part.tag), [1.0, 2.0])
+        self.assertFalse(part.last)
+
+    def test_records(self):
+        records = self.block.to_records()
+        self.assertEqual(records['Value'][4], 8.0)
+        block = EventBlock.from_records(records)
+        self.assertEqual(list(block.value), list(self.block.value))
+
+    def test_from_events(self):
+        block = EventBlock.from_events([Event(0, 1), Event(1, 2)])
+        self.assertEqual(list(block.value), [1, 2])
+
+    def test_ensemble(self):
+        '''The events of a block of ensembles have array values'''
+        block = EventBlock([0, 1, 2], numpy.arange(6.0).reshape(3, 2))
+        self.assertEqual(list(block[1].value), [2.0, 3.0])
+        self.assertEqual([list(e.value) for e in block.events()], [[0, 1], [2, 3], [4, 5]])
+        self.assertEqual(EventBlock.from_events(list(block.events())).value.shape, (3, 2))
+
 
 if __name__ == "__main__":
     import doctest
@@ -0,0 +1,192 @@
+'''
+Fusion of chains of single input, single output actors.
+
+A chain of Siso actors - say the Delay and Proportional in the feedback
+path of an IIR filter - passes every event through a channel and, with the
+threaded engine, a thread switch between each pair of actors. Most Siso
+actors only implement siso_process (and perhaps siso_process_block), so a
+chain of them can equally be run as one actor that calls each of those in
+turn, with no channels in between.
+
+fuse_siso_chains finds the longest chains of such actors in a list of
+components and replaces each with a FusedSiso. Two actors are only joined
+when the channel between them is used by nothing else and is empty, so
+the fused model behaves exactly as the original.
+
+Example of usage::
+
+    components = fuse_siso_chains(model.components)
+
+or::
+
+    model.run(fuse=True)
+
+'''
+
+import logging
+
+from siso import Siso
+
+
+def fusable(actor):
+    '''True if the actor's behaviour is entirely in its siso_process
+    functions, so it can be part of a FusedSiso.'''
+    return (isinstance(actor, Siso) and actor.cooperative
+            and not actor.child_handles_output
+            and type(actor).process.im_func is Siso.process.im_func
+            and type(actor).run.im_func is Siso.run.im_func)
+
+
+class FusedSiso(Siso):
+    '''
+    A chain of Siso actors run as a single actor.
+    '''
+
+    def __init__(self, actors):
+        '''
+        @param actors: a list of fusable actors, each reading the output
+                       channel of the one before.
+        '''
+        super(FusedSiso, self).__init__(input_channel=actors[0].input_channel,
+                                        output_channel=actors[-1].output_channel)
+        self.actors = actors
+
+    def siso_process(self, event):
+        for actor in self.actors:
+            event = actor.siso_process(event)
+        return event
+
+    def siso_process_block(self, block):
+        for actor in self.actors:
+            block = actor.siso_process_block(block)
+        return block
+
+    def finish(self):
+        for actor in self.actors:
+            actor.finish()
+        self.stop = True
+
+    def __repr__(self):
+        return 'FusedSiso(%s)' % ', '.join(a.__class__.__name__ for a in self.actors)
+
+
+def fuse_siso_chains(components):
+    '''
+    Return a list of components with every chain of two or more fusable
+    actors replaced by a FusedSiso, in the place of the first actor of
+    the chain.
+    '''
+    readers, writers = {}, {}
+    for component in components:
+        for channel in component.get_input_channels():
+            readers.setdefault(channel, []).append(component)
+        for channel in component.get_output_channels():
+            writers.setdefault(channel, []).append(component)
+
+    following = {}
+    for actor in components:
+        if not fusable(actor):
+            continue
+        channel = actor.output_channel
+        if len(readers.get(channel, [])) != 1 or len(writers[channel]) != 1 or not channel.empty():
+            continue
+        reader = readers[channel][0]
+        if reader is not actor and fusable(reader):
+            following[actor] = reader
+
+    heads = [a for a in components if a in following and a not in following.values()]
+    chains = {}
+    for head in heads:
+        chain = [head]
+        while chain[-1] in following:
+            chain.append(following[chain[-1]])
+        chains[head] = chain
+    fused = set(a for chain in chains.values() for a in chain)
+
+    result = []
+    for component in components:
+        if component in chains:
+            logging.debug("Fusing %d actors" % len(chains[component]))
+            result.append(FusedSiso(chains[component]))
+        elif component not in fused:
+            result.append(component)
+    return result
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from channel import Channel, MakeChans
+from event import Event, LastEvent, EventBlock
+
+
+class TestFusion(unittest.TestCase):
+
+    def test_chain_is_fused(self):
+        from scipysim.actors.math import Proportional, Abs
+        from scipysim.actors.signal import Ramp, Sink
+        wires = MakeChans(4)
+        ramp, sink = Ramp(wires[0]), Sink(wires[3])
+        chain = [Proportional(wires[0], wires[1], gain=-1), Abs(wires[1], wires[2]),
+                 Proportional(wires[2], wires[3], gain=2)]
+        components = fuse_siso_chains([ramp] + chain + [sink])
+        self.assertEquals(len(components), 3)
+        self.assertEquals(components[1].actors, chain)
+        self.assertTrue(components[1].input_channel is wires[0])
+        self.assertTrue(components[1].output_channel is wires[3])
+
+    def test_unfusable_links(self):
+        '''Shared, non empty and child handled channels are left alone'''
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.signal import Split, Decimator
+        wires = MakeChans(7)
+        wires[5].put(Event(0, 0))
+        components = [Proportional(wires[0], wires[1]), Split(wires[1], [wires[2]]),
+                      Proportional(wires[2], wires[3]), Decimator(wires[3], wires[4]),
+                      Proportional(wires[4], wires[5]), Proportional(wires[5], wires[6])]
+        self.assertEquals(fuse_siso_chains(components), components)
+
+    def test_feedback_loop_of_sisos(self):
+        '''A loop made only of fusable actors has no head, so is not fused'''
+        from scipysim.actors.math import Proportional
+        a, b = MakeChans(2)
+        components = [Proportional(a, b), Proportional(b, a)]
+        self.assertEquals(fuse_siso_chains(components), components)
+
+    def test_same_output(self):
+        '''Events and blocks come out of a fused chain unchanged'''
+        from scipysim.actors.math import Proportional, Abs
+        from scipysim.actors.signal import Delay
+        from scheduler import Scheduler
+        outputs = []
+        for fuse in [False, True]:
+            wires = MakeChans(4)
+            [wires[0].put(Event(i, -i)) for i in xrange(5)]
+            wires[0].put(EventBlock(range(5, 10), range(-5, -10, -1), last=True))
+            components = [Delay(wires[0], wires[1], wait=1), Proportional(wires[1], wires[2], gain=3),
+                          Abs(wires[2], wires[3])]
+            if fuse:
+                components = fuse_siso_chains(components)
+            Scheduler(components).run()
+            outputs.append([wires[3].get(block=False) for _ in xrange(11)])
+        self.assertEquals(outputs[0], outputs[1])
+        self.assertEquals(outputs[1][-2], Event(10, 27))
+        self.assertTrue(outputs[1][-1].last)
+
+    def test_composite_actor_fuse(self):
+        '''CompositeActor.run can fuse chains, and every actor finishes'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.math import Proportional, Abs
+        from scipysim.actors.signal import Ramp, Sink
+        wires = MakeChans(3)
+        model = CompositeActor()
+        model.components = [Ramp(wires[0], resolution=5, simulation_time=2),
+                            Proportional(wires[0], wires[1]), Abs(wires[1], wires[2]), Sink(wires[2])]
+        model.run(fuse=True)
+        self.assertEquals(len(model.components), 4)
+        self.assertTrue(all(c.stop for c in model.components))
+
+
+if __name__ == "__main__":
+    unittest.main()
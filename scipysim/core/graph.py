@@ -12,7 +12,12 @@ output port is used for the channel and must match the domain of the input port.
 
 
 A complete graph will have all input connections correctly "wired up" - outputs
-that are not connected are ignored.
+that are not connected are collected as the results of a run.
+
+A graph is run in the current process: Graph.build creates an Actor from
+each node and a fresh Channel for each of the graph's channels, and
+Graph.run runs them with any of the CompositeActor engines. The graph can
+also be exported as a stand alone python program with Graph.write_to_py_file.
 
 Implementation detail - Nodes are CodeFile instances - wrappers around the actual Actor blocks.
 '''
@@ -22,8 +27,12 @@ from event import Event
 from siso import Siso
 from actor import Actor, Source
 from channel import Channel, MakeChans
+from composite_actor import CompositeActor
+from errors import InvalidSimulationInput
+from instrumentation import new_stats
 import sys
 import os
+from time import time
 from codefile import CodeFile
 import logging
 
@@ -97,39 +106,98 @@ class Node(object):
         specified = all(self.params[key] is not None for key in self.params)
         return connected and specified
         
-    def set_parameter(name, value):
+    def set_parameter(self, name, value):
         self.params[name] = value
-        
-    def write_to_py(self):
+
+    def channels(self):
+        '''Return every channel the node is connected to, including those
+        given as parameters.'''
+        return [channel for channel in self.input_channels + self.output_channels +
+                self.params.values() if isinstance(channel, Channel)]
+
+    def _arguments(self, convert):
+        '''Return the constructor's keyword arguments, with each channel
+        passed through convert.'''
+        arguments = {}
+        convert_channel = convert
+        convert = lambda channel: None if channel is None else convert_channel(channel)
+        for name, channels in [(getattr(self, 'input_channels_name', None), self.input_channels),
+                               (getattr(self, 'output_channels_name', None), self.output_channels)]:
+            if len(channels) > 1:
+                arguments[name] = [convert(channel) for channel in channels]
+            elif len(channels) == 1:
+                arguments[name] = convert(channels[0])
+        for name, value in self.params.items():
+            arguments[name] = convert(value) if isinstance(value, Channel) else value
+        return arguments
+
+    def build(self, channels):
+        '''
+        Create the Actor.
+
+        @param channels: a dict mapping each of the node's channels to the
+                         Channel the Actor should use in its place.
+        '''
+        return self.codefile.block_class(**self._arguments(channels.__getitem__))
+
+    def write_to_py(self, channel_names=None):
         '''
         Take the parameters and create a text representation that will be used
         in a "model".
         
         DTSinGenerator(wires[1], amplitude = 0.1, freq = 0.45, simulation_length=200)
+
+        @param channel_names: an optional dict mapping the node's channels
+                              to the variable names they have in the model.
         '''
         logging.debug('Connecting %s actor. Inputs: %s, Outputs: %s, Parameters: %s' % (self.name,
                                                                                         self.input_channels,
                                                                                         self.output_channels,
                                                                                         self.params))
-        if len(self.input_channels) > 1:
-            input_channels = '%s=%s, ' % (self.input_channels_name, self.input_channels)
-        elif len(self.input_channels) == 1:
-            input_channels = '%s=%s, ' % (self.input_channels_name, self.input_channels[0])
-        else:
-            input_channels = ''
-        
-        if len(self.output_channels) > 1:
-            output_channels = '%s=%s, ' % (self.output_channels_name, self.output_channels)
-        elif len(self.output_channels) == 1:
-            output_channels = '%s=%s, ' % (self.output_channels_name, self.output_channels[0])
+        class Name(str):
+            '''A string that is its own repr.'''
+            __repr__ = str.__str__
+
+        if channel_names is None:
+            convert = lambda channel: channel
         else:
-            output_channels = ''
-            
-        parameters = ''
-        for parameter_name in self.params:
-            parameters += parameter_name + '=' + repr(self.params[parameter_name]) + ', '
-        parameters = parameters.rstrip(', ')
-        return '%s(%s%s%s)' % (self.name, input_channels, output_channels, parameters)
+            convert = lambda channel: Name(channel_names[channel])
+
+        arguments = self._arguments(convert)
+        # Channels first, then the parameters
+        names = [name for name in [getattr(self, 'input_channels_name', None),
+                                   getattr(self, 'output_channels_name', None)]
+                 if name in arguments]
+        names += [name for name in self.params if name not in names]
+        return '%s(%s)' % (self.name, ', '.join('%s=%r' % (name, arguments[name]) for name in names))
+
+
+class GraphResult(object):
+    '''
+    The outcome of running a Graph.
+
+    Attributes:
+
+    outputs - a dict mapping each output channel of the graph that no node
+              reads to the list of events that were put on it, without the
+              final LastEvent.
+    stats - if the graph was run with profile=True, a dict mapping each
+            Node to a dict of statistics for its actor, such as 'firings',
+            the number of times its process function was called, and
+            'seconds', the wall clock time spent in it (see
+            scipysim.core.instrumentation for the rest). Otherwise empty.
+    elapsed - the wall clock time of the run in seconds.
+    '''
+
+    def __init__(self, outputs, stats, elapsed):
+        self.outputs = outputs
+        self.stats = stats
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<GraphResult: %d outputs, %d actors, %.3fs>' % (len(self.outputs), len(self.stats),
+                                                               self.elapsed)
+
 
 class Graph(object):
 
@@ -209,26 +277,89 @@ class Graph(object):
         '''
         return all(block.ready() for block in self.nodes)
 
-    def run(self):
+    def channels(self):
+        '''Return the graph's channels, in the order they are first used.'''
+        channels = []
+        for node in self.nodes:
+            for channel in node.channels():
+                if channel not in channels:
+                    channels.append(channel)
+        return channels
+
+    def build(self):
+        '''
+        Create an Actor for each node, connected by new channels.
+
+        Returns a CompositeActor whose components are the actors, with two
+        extra attributes: 'actors' maps each Node to its Actor and
+        'channels' maps each of the graph's channels to the Channel used in
+        its place. The graph itself is left unchanged, so it can be built
+        and run any number of times.
         '''
-        Create a program from the graph and run it.
+        if not self.ready():
+            raise InvalidSimulationInput("Graph '%s' has unconnected inputs or missing parameters"
+                                         % self.name)
+        channels = dict((channel, Channel(channel.domain, channel.name, channel.capacity, channel.backend))
+                        for channel in self.channels())
+        model = CompositeActor()
+        model.actors = dict((node, node.build(channels)) for node in self.nodes)
+        model.channels = channels
+        model.components = [model.actors[node] for node in self.nodes]
+        return model
+
+    def run(self, engine='threaded', fuse=False, profile=False):
         '''
-        # Create a python program in a temporary file
-        from tempfile import NamedTemporaryFile
-        tempfile = NamedTemporaryFile()
-        filename = tempfile.name
-        self.write_to_py_file(filename)
-
-        # preview the output:
-        h = '\n' + '#' * 80 + '\n\n'
-        print h + ''.join(line for line in tempfile) + h
-
-        # Execute the python program
-        from scipysim.core.util import run_python_file
-        
-        output = run_python_file( filename )
-        print output
-        return output
+        Build the graph's actors and run them in this process.
+
+        @param engine: the name of the execution engine, see CompositeActor.run.
+        @param fuse: whether to fuse chains of actors, see CompositeActor.run.
+                     Actors that are fused are shown in the stats as never
+                     firing.
+        @param profile: if True, gather the statistics of each actor, see
+                        CompositeActor.run.
+
+        @return: a GraphResult holding the events put on the unconnected
+                 outputs and, if profiled, the statistics of each actor.
+        '''
+        start = time()
+        outputs, stats = self._run_model(self.build(), engine, fuse, self.nodes, profile)
+        return GraphResult(outputs, stats, time() - start)
+
+    def _run_model(self, model, engine, fuse, nodes, profile=False):
+        '''
+        Run a model made by build, counting the firings of the actors of
+        the given nodes if profile is True. Returns the outputs and stats
+        of a GraphResult.
+        '''
+        stats = {}
+        if profile:
+            profile = model.run(engine=engine, fuse=fuse, profile=True)
+            stats = dict((node, profile.stats.get(model.actors[node], new_stats())) for node in nodes)
+        else:
+            model.run(engine=engine, fuse=fuse)
+
+        read = set(channel for node in self.nodes
+                   for channel in node.channels() if channel not in node.output_channels)
+        outputs = {}
+        for channel, built in model.channels.items():
+            if channel in read:
+                continue
+            events = outputs[channel] = []
+            while not built.empty():
+                event = built.get(block=False)
+                if not event.last:
+                    events.append(event)
+        return outputs, stats
+
+    def compile(self):
+        '''
+        Compile the parts of the graph made of simple actors into a single
+        NumPy function, see scipysim.core.compiler.
+
+        @return: a CompiledGraph, which can be run like the graph.
+        '''
+        from compiler import compile_graph
+        return compile_graph(self)
 
     def write_to_py_file(self, filename):
         '''
@@ -236,40 +367,21 @@ class Graph(object):
         
         Make instances of each Channel, and give them a name.
         '''
-        
-        # Replace <Channel Instance> with something like chan[0]
-        # for each node.
-        channel_set = set()
-        for node in self.nodes:
-            for channel in node.input_channels + node.output_channels:
-                if channel.domain is None: channel.domain = 'None'
-                channel_set.add(channel)
-                
-        
-        channel_names = dict([(channel, channel.name + '_' + channel.domain + '_' + str(i)) 
-                              for i, channel in enumerate(channel_set)])
-        
-        for node in self.nodes:
-            # replace the Node's channels with strings referring to them
-            actual_input_channels = node.input_channels[:]
-            for channel in actual_input_channels:
-                node.input_channels.remove(channel)
-                node.input_channels.insert(0, channel_names[channel])
-            
-            actual_output_channels = node.output_channels[:]
-            for channel in actual_output_channels:
-                node.output_channels.remove(channel)
-                node.output_channels.insert(0, channel_names[channel])
-        
-        # Get the domains of all those channels
-        domains = []
-        for channel in channel_names:   # Note same iteration method to create the names
-            domains.append(channel.domain)
-        
-        
+        f = open(filename, 'w')
+        f.write(self.to_python())
+        f.close()
+
+    def to_python(self):
+        '''
+        Return the source of a python program running this model.
+        '''
+        channels = self.channels()
+        channel_names = dict((channel, '%s_%s_%d' % (channel.name, channel.domain, i))
+                             for i, channel in enumerate(channels))
+
         code = """#!/bin/env python
 import scipysim
-from scipysim.actors import CompositeActor, MakeChans, Event
+from scipysim.actors import CompositeActor, Channel, Event
 %(imports)s
 
 print '%(header)s'
@@ -281,7 +393,7 @@ class %(class_name)s(CompositeActor):
 
     def __init__(self):
 
-        %(wire_names)s = MakeChans(%(number_chans)d, %(domains)s)
+        %(wires)s
 
         self.components = [
             #DTSinGenerator(wires[0], amplitude = 0.1, freq = 0.45, simulation_length=200),
@@ -296,18 +408,14 @@ if __name__ == '__main__':
             'imports': '\n'.join(codefile.get_import() for codefile in self.codefiles),
             'header': 'Scipysim Automatically Generated Program',
             'class_name': self.name.replace(' ', '_'),
-            'number_chans': len(channel_set),
-            'domains': str(domains),
-            'wire_names': ', '.join(channel_names.values()),
-            'components': ',\n            '.join(node.write_to_py() for node in self.nodes)
+            'wires': '\n        '.join('%s = Channel(%r)' % (channel_names[channel], channel.domain)
+                                       for channel in channels),
+            'components': ',\n            '.join(node.write_to_py(channel_names) for node in self.nodes)
         }
-
-        f = open(filename, 'w')
-        f.write(code)
-        
-        f.close()
+        return code
 
 import unittest
+from numpy import sin, pi
 get_source = lambda *args: os.path.abspath(os.path.join( os.path.dirname( __file__ ), os.path.pardir, os.path.pardir, *args ))
 
 class TestNode(unittest.TestCase):
@@ -402,21 +510,70 @@ class TestGraph(unittest.TestCase ):
 
         self.assertFalse(g.ready())        
 
-    def test_run(self):
-        '''Test execution'''
+    def make_sin_gain(self):
+        '''A graph of a sin generator followed by a gain'''
         g = Graph()
         source_node = Node(CodeFile( get_source( 'scipysim', 'actors', 'math', 'trig', 'DTSinGenerator.py' ), 'DTSinGenerator' ))
         gain = Node(CodeFile( get_source( 'scipysim', 'actors', 'math', 'proportional.py'), 'Proportional'))
         
         g.add(source_node)
         g.add(gain)
+        gain.set_parameter('gain', 3.0)
+        source_node.set_parameter('simulation_length', 20)
 
-        # could connect this up to a file writer to unittest the output (io.TextWriter)
-        
         g.connect(source_node.output_channels[0], gain)
+        return g, source_node, gain
+
+    def test_run(self):
+        '''Test execution'''
+        g, source_node, gain = self.make_sin_gain()
         self.assertTrue(g.ready())
-        g.run()
-        
+        result = g.run(profile=True)
+
+        output, = result.outputs.keys()
+        self.assertTrue(output is gain.output_channels[0])
+        events = result.outputs[output]
+        self.assertEquals(len(events), 20)
+        self.assertAlmostEqual(events[5].value, 3.0 * sin(2 * pi * 0.01 * 5))
+        # The source sends its signal as one block, then the end
+        self.assertEquals(result.stats[gain]['firings'], 2)
+
+    def test_run_again(self):
+        '''A graph can be run more than once, with any engine'''
+        g, source_node, gain = self.make_sin_gain()
+        first = g.run()
+        second = g.run(engine='cooperative', fuse=True)
+        self.assertEquals(first.outputs.values(), second.outputs.values())
+        self.assertTrue(gain.output_channels[0].empty())
+        self.assertEquals(second.stats, {})
+
+    def test_run_multiprocess(self):
+        '''The outputs of a graph come back from the worker processes, but it can't be profiled'''
+        g, source_node, gain = self.make_sin_gain()
+        expected = g.run(engine='cooperative')
+        result = g.run(engine='multiprocess')
+        self.assertEquals(result.outputs.values(), expected.outputs.values())
+        self.assertRaises(ValueError, g.run, engine='multiprocess', profile=True)
+
+    def test_build_requires_ready_graph(self):
+        g = Graph()
+        g.add(Node(CodeFile( get_source( 'scipysim', 'actors', 'math', 'proportional.py'), 'Proportional')))
+        self.assertRaises(InvalidSimulationInput, g.build)
+
+    def test_write_to_py(self):
+        '''The exported program runs the same model, and the graph is unchanged'''
+        g, source_node, gain = self.make_sin_gain()
+        channels = g.channels()
+        code = g.to_python()
+        self.assertEquals(g.channels(), channels)
+        self.assertTrue('gain=3.0' in code)
+
+        namespace = {}
+        exec compile(code, 'model.py', 'exec') in namespace
+        model = namespace['Generic_Model']()
+        model.run(engine='cooperative')
+        self.assertTrue(all(c.stop for c in model.components))
+
         
 if __name__ == "__main__":
     unittest.main()
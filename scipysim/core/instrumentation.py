@@ -0,0 +1,485 @@
+'''
+Profiling of the actors in a running model.
+
+A Profiler wraps the process function of each actor and the read and write
+functions of each channel, for one run, and records for every actor:
+    * firings - the number of calls of its process function
+    * events_in, events_out - the events it read and wrote (a block counts
+      as the number of events in it)
+    * seconds - the time spent in its process function, split into
+    * blocked - time spent in channel reads and writes, which includes
+      waiting for an event (or for space in a bounded channel), and
+    * busy - the rest, i.e. the actor's own computation
+    * high_water - for each input channel, the most events that were ever
+      waiting in it
+    * tracepoints - the number of hits of each enabled tracepoint (see
+      scipysim.core.tracepoint) during its firings
+
+Nothing is wrapped unless profiling is asked for, so a model that isn't
+profiled runs at full speed. Actors that run in their own thread or process
+with their own run function (such as the plotters) are not measured, and a
+model run by the multiprocess engine, whose actors fire in worker processes,
+can't be profiled or traced at all.
+
+Example of usage::
+
+    profile = model.run(profile=True)
+    print profile.summary()
+
+A Tracer instead records when each firing happened, for a timeline of the
+run (see Tracer)::
+
+    model.run(trace='trace.json')
+
+'''
+
+import threading
+import logging
+import json
+import itertools
+from collections import deque
+from time import time
+
+from event import EventBlock
+import tracepoint
+
+
+# The stats of the actor whose process function is running on each thread
+current = threading.local()
+
+
+def _count(item):
+    '''The number of events in something read from or written to a channel.'''
+    if isinstance(item, EventBlock):
+        return len(item)
+    return 0 if getattr(item, 'last', False) else 1
+
+
+def new_stats():
+    '''The statistics of an actor that hasn't fired.'''
+    return {'firings': 0, 'events_in': 0, 'events_out': 0,
+            'seconds': 0.0, 'busy': 0.0, 'blocked': 0.0, 'high_water': {}, 'tracepoints': {}}
+
+
+class Profile(object):
+    '''
+    The statistics of each actor in a profiled run.
+    '''
+
+    columns = ('firings', 'events_in', 'events_out', 'seconds', 'busy', 'blocked')
+
+    def __init__(self, actors, stats, elapsed):
+        '''
+        @param actors: the actors, in the order they were given.
+        @param stats: a dictionary of each actor to its statistics.
+        @param elapsed: the wall clock time of the run in seconds.
+        '''
+        self.actors = actors
+        self.stats = stats
+        self.elapsed = elapsed
+
+    def names(self):
+        '''A name for each actor: its class name, numbered if the model has
+        more than one actor of that class.'''
+        classes = [actor.__class__.__name__ for actor in self.actors]
+        seen = {}
+        names = []
+        for name in classes:
+            seen[name] = seen.get(name, 0) + 1
+            names.append(name if classes.count(name) == 1 else '%s[%d]' % (name, seen[name]))
+        return names
+
+    def __getitem__(self, actor):
+        return self.stats[actor]
+
+    def as_dict(self):
+        '''A dictionary of each actor's name to its statistics.'''
+        return dict((name, self.stats[actor]) for name, actor in zip(self.names(), self.actors))
+
+    def rows(self):
+        '''A list of rows, one per actor, of its name and statistics,
+        busiest first.'''
+        rows = [dict(self.stats[actor], actor=name) for name, actor in zip(self.names(), self.actors)]
+        return sorted(rows, key=lambda row: row['busy'], reverse=True)
+
+    def summary(self):
+        '''The statistics as a table of text, busiest actor first.'''
+        lines = ['%-24s %8s %10s %10s %9s %9s %9s  %s' %
+                 (('actor',) + self.columns + ('high water',))]
+        for row in self.rows():
+            high_water = ', '.join('%s: %d' % item for item in sorted(row['high_water'].items()))
+            lines.append('%-24s %8d %10d %10d %9.4f %9.4f %9.4f  %s' %
+                         ((row['actor'],) + tuple(row[c] for c in self.columns) + (high_water,)))
+        lines.append('Total run time %.4f seconds' % self.elapsed)
+        return '\n'.join(lines)
+
+
+class Instrument(object):
+    '''
+    Base class of the instruments, which replace functions of a model's
+    actors and channels with wrappers for the length of one run.
+    '''
+
+    def __init__(self, actors):
+        '''
+        @param actors: the actors to instrument.
+        '''
+        self.actors = list(actors)
+        self.channels = []
+        for actor in self.actors:
+            for channel in actor.get_input_channels() + actor.get_output_channels():
+                if channel not in self.channels:
+                    self.channels.append(channel)
+        self.patches = []
+        self.start = None
+
+    def patch(self, target, name, function):
+        '''Replace a function of one object, until unpatch is called.'''
+        self.patches.append((target, name, vars(target).get(name)))
+        setattr(target, name, function)
+
+    def unpatch(self):
+        '''Put back every function that was replaced, latest first, so that
+        instruments can be stacked.'''
+        for target, name, previous in reversed(self.patches):
+            if previous is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, previous)
+        self.patches = []
+
+    @staticmethod
+    def process_owner(actor):
+        '''The object whose run calls the actor's process function, which
+        for a wrapper such as the Summer is the wrapped actor.'''
+        process = actor.process
+        if hasattr(process, 'owner'):
+            # Already instrumented
+            return process.owner
+        return process.im_self
+
+
+class Profiler(Instrument):
+    '''
+    Records the statistics of a list of actors for one run.
+    '''
+
+    def attach(self):
+        '''Start recording. Must be called before the actors are started.'''
+        self.stats = {}
+        self.high_water = {}
+        for actor in self.actors:
+            self.stats[actor] = new_stats()
+            self._wrap_process(actor, self.stats[actor])
+        for channel in self.channels:
+            self.high_water[channel] = channel.qsize()
+            self._wrap_channel(channel)
+        tracepoint.add_sink(self._tracepoint_hit)
+        self.start = time()
+
+    def detach(self):
+        '''Stop recording, and return the Profile of the run.'''
+        elapsed = time() - self.start
+        self.unpatch()
+        tracepoint.remove_sink(self._tracepoint_hit)
+
+        for actor, stats in self.stats.items():
+            stats['busy'] = stats['seconds'] - stats['blocked']
+            for i, channel in enumerate(actor.get_input_channels()):
+                stats['high_water'][channel.name or 'input %d' % i] = self.high_water[channel]
+        return Profile(self.actors, self.stats, elapsed)
+
+    def _wrap_process(self, actor, stats):
+        owner = self.process_owner(actor)
+        process = owner.process
+
+        def profiled():
+            outer = getattr(current, 'stats', None)
+            current.stats = stats
+            start = time()
+            try:
+                process()
+            finally:
+                stats['seconds'] += time() - start
+                stats['firings'] += 1
+                current.stats = outer
+        profiled.owner = owner
+        self.patch(owner, 'process', profiled)
+
+    def _tracepoint_hit(self, point, message, args):
+        stats = getattr(current, 'stats', None)
+        if stats is not None:
+            stats['tracepoints'][point.name] = stats['tracepoints'].get(point.name, 0) + 1
+
+    def _wrap_channel(self, channel):
+        high_water = self.high_water
+
+        def wrap(function, counter):
+            def profiled(*args, **kwargs):
+                stats = getattr(current, 'stats', None)
+                start = time()
+                try:
+                    item = function(*args, **kwargs)
+                finally:
+                    if stats is not None:
+                        stats['blocked'] += time() - start
+                if counter is not None and stats is not None:
+                    stats[counter] += _count(item)
+                return item
+            return profiled
+
+        drop, put = channel.drop, channel.put
+        self.patch(channel, 'get', wrap(channel.get, 'events_in'))
+        self.patch(channel, 'get_block', wrap(channel.get_block, 'events_in'))
+        self.patch(channel, 'head', wrap(channel.head, None))
+
+        def dropped():
+            stats = getattr(current, 'stats', None)
+            if stats is not None:
+                stats['events_in'] += 1
+            drop()
+        self.patch(channel, 'drop', dropped)
+
+        def counted_put(item, *args, **kwargs):
+            stats = getattr(current, 'stats', None)
+            start = time()
+            try:
+                put(item, *args, **kwargs)
+            finally:
+                if stats is not None:
+                    stats['blocked'] += time() - start
+            if stats is not None:
+                stats['events_out'] += _count(item)
+            size = channel.qsize()
+            if size > high_water[channel]:
+                high_water[channel] = size
+        self.patch(channel, 'put', counted_put)
+
+
+def _first_tag(item):
+    '''The tag of an event, or of the first event of a block.'''
+    if isinstance(item, EventBlock):
+        return item.tag[0].item() if len(item) else None
+    return item.tag
+
+
+class Tracer(Instrument):
+    '''
+    Records a timeline of a run in the Chrome trace event format, which
+    can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+    Each actor is a track. Every firing of its process function is a
+    slice, annotated with the tag of the first event it read or wrote. A
+    read or write that has to wait for a channel is a nested slice, and
+    every event or block passed along a channel is a flow arrow from the
+    firing that put it to the one that took it. The hits of the enabled
+    tracepoints are instant events, with their message.
+    '''
+
+    # Reads and writes quicker than this (in seconds) aren't shown as
+    # waiting
+    min_wait = 1e-4
+
+    def attach(self):
+        '''Start recording. Must be called before the actors are started.'''
+        self.events = []
+        self.flows = itertools.count(1)
+        for tid, actor in enumerate(self.actors):
+            self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid,
+                                'args': {'name': '%s %d' % (actor.__class__.__name__, tid)}})
+            self._wrap_process(actor, tid)
+        for i, channel in enumerate(self.channels):
+            self._wrap_channel(channel, channel.name or 'channel %d' % i)
+        tracepoint.add_sink(self._tracepoint_hit)
+        self.start = time()
+
+    def detach(self, path):
+        '''Stop recording and write the trace to a file.
+
+        @param path: the name of the JSON file to write.
+        '''
+        self.unpatch()
+        tracepoint.remove_sink(self._tracepoint_hit)
+        with open(path, 'w') as trace:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, trace)
+        logging.info("Wrote trace of %d events to %s" % (len(self.events), path))
+
+    def _now(self):
+        '''Microseconds since the start of the run.'''
+        return (time() - self.start) * 1e6
+
+    def _wrap_process(self, actor, tid):
+        owner = self.process_owner(actor)
+        process = owner.process
+        name = actor.__class__.__name__
+        events = self.events
+
+        def traced():
+            outer = getattr(current, 'firing', None)
+            firing = current.firing = {'tid': tid, 'tag': None}
+            start = self._now()
+            try:
+                process()
+            finally:
+                current.firing = outer
+                args = {} if firing['tag'] is None else {'tag': firing['tag']}
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': tid, 'ts': start,
+                               'dur': self._now() - start, 'args': args})
+        traced.owner = owner
+        self.patch(owner, 'process', traced)
+
+    def _tracepoint_hit(self, point, message, args):
+        firing = getattr(current, 'firing', None)
+        self.events.append({'name': point.name, 'cat': 'tracepoint', 'ph': 'i', 's': 't', 'pid': 0,
+                            'tid': 0 if firing is None else firing['tid'], 'ts': self._now(),
+                            'args': {'message': message % args}})
+
+    def _wrap_channel(self, channel, name):
+        events = self.events
+        # Flow ids of the items in the channel, oldest first
+        queued = deque([None] * channel.queue.qsize())
+        wait, put = channel._wait, channel.put
+
+        def waited(name, start, firing):
+            if time() - start > self.min_wait:
+                ts = (start - self.start) * 1e6
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': firing['tid'],
+                               'ts': ts, 'dur': self._now() - ts})
+
+        def traced_wait(*args, **kwargs):
+            firing = getattr(current, 'firing', None)
+            start = time()
+            item = wait(*args, **kwargs)
+            flow = queued.popleft() if queued else None
+            if firing is not None:
+                waited('get ' + name, start, firing)
+                if firing['tag'] is None and hasattr(item, 'tag'):
+                    firing['tag'] = _first_tag(item)
+                if flow is not None:
+                    events.append({'name': name, 'cat': 'channel', 'ph': 'f', 'bp': 'e', 'id': flow,
+                                   'pid': 0, 'tid': firing['tid'], 'ts': self._now()})
+            return item
+
+        def traced_put(item, *args, **kwargs):
+            firing = getattr(current, 'firing', None)
+            if isinstance(item, EventBlock) and not len(item) and not item.last:
+                # Not queued at all
+                return put(item, *args, **kwargs)
+            start = time()
+            flow = None
+            if firing is not None:
+                flow = next(self.flows)
+                if firing['tag'] is None:
+                    firing['tag'] = _first_tag(item)
+                events.append({'name': name, 'cat': 'channel', 'ph': 's', 'id': flow,
+                               'pid': 0, 'tid': firing['tid'], 'ts': self._now()})
+            # The reader may take the item as soon as it is put
+            queued.append(flow)
+            try:
+                put(item, *args, **kwargs)
+            except:
+                queued.pop()
+                raise
+            if firing is not None:
+                waited('put ' + name, start, firing)
+
+        self.patch(channel, '_wait', traced_wait)
+        self.patch(channel, 'put', traced_put)
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from channel import Channel, MakeChans
+
+
+class TestProfiler(unittest.TestCase):
+
+    def model(self):
+        from composite_actor import CompositeActor
+        from scipysim.actors.math import Proportional, Summer, Constant
+        from scipysim.actors.signal import Ramp, Split, Sink
+        wires = [Channel('CT', name=str(i)) for i in xrange(6)]
+        model = CompositeActor()
+        model.components = [Ramp(wires[0], resolution=10, simulation_time=10),
+                            Proportional(wires[0], wires[1]),
+                            Constant(wires[2], value=1.0, resolution=10, simulation_time=10),
+                            Summer([wires[1], wires[2]], wires[3]),
+                            Proportional(wires[3], wires[4]), Sink(wires[4])]
+        return model
+
+    def test_counts(self):
+        for engine in ['threaded', 'cooperative']:
+            model = self.model()
+            profile = model.run(engine=engine, profile=True)
+            stats = profile.as_dict()
+            self.assertEquals(stats['Proportional[1]']['events_in'], 100)
+            self.assertEquals(stats['Proportional[1]']['events_out'], 100)
+            self.assertEquals(stats['Summer']['events_in'], 200)
+            self.assertEquals(stats['Ramp']['events_out'], 100)
+            self.assertEquals(stats['Sink']['events_in'], 100)
+            self.assertEquals(stats['Sink']['firings'], 101)
+            for row in profile.rows():
+                self.assertTrue(row['seconds'] >= row['blocked'] >= 0)
+            self.assertTrue(0 < stats['Proportional[2]']['high_water']['3'] <= 101)
+            self.assertTrue('Proportional[2]' in profile.summary())
+
+    def test_trace(self):
+        '''Firings are slices and events passed between them are flows'''
+        import os, tempfile
+        path = tempfile.mktemp('.json')
+        model = self.model()
+        try:
+            model.run(engine='cooperative', trace=path, profile=True)
+            with open(path) as trace:
+                events = json.load(trace)['traceEvents']
+        finally:
+            os.remove(path)
+        tracks = dict((e['args']['name'], e['tid']) for e in events if e['ph'] == 'M')
+        self.assertEquals(len(tracks), 6)
+        slices = [e for e in events if e['ph'] == 'X' and e['tid'] == tracks['Sink 5']]
+        self.assertEquals(len(slices), 101)
+        self.assertEquals(slices[10]['args']['tag'], 1.0)
+        starts = dict((e['id'], e) for e in events if e['ph'] == 's')
+        finishes = [e for e in events if e['ph'] == 'f']
+        # A block and the end of the signal from each source and the
+        # Proportional after it, then 101 events from the Summer onwards
+        self.assertEquals(len(starts), 208)
+        self.assertEquals(len(finishes), 208)
+        for finish in finishes:
+            self.assertTrue(starts[finish['id']]['ts'] <= finish['ts'])
+        self.assertFalse('process' in vars(model.components[0]))
+        self.assertFalse('_wait' in vars(model.components[0].output_channel))
+
+    def test_tracepoints(self):
+        '''The hits of enabled tracepoints are counted and traced'''
+        import os, tempfile
+        path = tempfile.mktemp('.json')
+        tracepoint.enable('scipysim.actors.math.summer')
+        try:
+            profile = self.model().run(engine='cooperative', trace=path, profile=True)
+            with open(path) as trace:
+                events = json.load(trace)['traceEvents']
+        finally:
+            tracepoint.disable()
+            os.remove(path)
+        stats = profile.as_dict()
+        self.assertEquals(stats['Summer']['tracepoints'], {'scipysim.actors.math.summer': 101})
+        self.assertEquals(stats['Sink']['tracepoints'], {})
+        hits = [e for e in events if e['ph'] == 'i']
+        self.assertEquals(len(hits), 101)
+        self.assertEquals(hits[0]['args']['message'], 'Summer: running')
+
+    def test_instrumentation_is_removed(self):
+        model = self.model()
+        model.run(profile=True)
+        for component in model.components:
+            self.assertFalse('process' in vars(component.process.im_self))
+            for channel in component.get_input_channels():
+                self.assertFalse('get' in vars(channel) or 'put' in vars(channel))
+        self.assertEquals(model.run(), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,595 @@
+'''
+Multi-process execution of a model.
+
+Every other engine runs all of a model's actors inside one interpreter, so
+a CPU bound model only ever uses one core. The MultiprocessScheduler splits
+the components into partitions and runs each partition in its own worker
+process, with every actor of a partition in its own thread as in the
+threaded engine.
+
+Channels between two actors in the same partition are left as they are.
+A channel that crosses from one partition to another (or to the process
+that called run, when its reader or writer is not one of the components)
+has its queue replaced by a SharedRing: a fixed size ring buffer of
+(tag, value) records of type SharedRing.record in shared memory. Such a
+channel can therefore only carry numeric values, and events come out as
+float tags and values. Runs of events are read back as EventBlocks, so the
+cost of crossing a process boundary is paid once per batch rather than
+once per event.
+
+A channel that is read outside the model, such as an output read once the
+run is over, is emptied by the calling process while the workers run, so
+its writer is never held back by the ring. Once the run is over every
+shared channel is given back a queue of its own backend, holding the events
+left in it, and the attributes of each actor (other than its channels) are
+copied back from its worker, so e.g. the signal kept by a Recorder can be
+read as after any other run.
+
+The workers are started with fork, so the model is not pickled; this engine
+is not available on platforms without fork. A ring of an unbounded channel
+between two workers holds SharedRing.default_size records, so a model may
+deadlock where the other engines would not. A SimulationDeadlock is raised
+once every worker has had all its actors blocked on channels for
+MultiprocessScheduler.deadlock_poll seconds.
+
+Example of usage::
+
+    MultiprocessScheduler(model.components, workers=4).run()
+
+or, with one worker per core::
+
+    model.run(engine='multiprocess')
+
+'''
+
+import os
+import cPickle as pickle
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from Queue import Empty as QEmpty
+from Queue import Full as QFull
+from time import sleep, time
+import logging
+
+from numpy import dtype, float64, uint8, frombuffer, empty, isinf, isnan, nan, flatnonzero
+
+from actor import CompletionLatch
+from channel import Channel, _ABORT, find_deadlock
+from event import Event, LastEvent, EventBlock
+from errors import WorkerFailed, SimulationDeadlock
+
+# Kinds of record held in a SharedRing
+EVENT, LAST = 0, 1
+
+# Indices of the SharedRing counters
+WRITTEN, READ, GETTER_WAITING, PUTTER_WAITING, RELEASED = range(5)
+
+
+class SharedRing(object):
+    '''
+    A channel queue in shared memory, for one writer and one reader that
+    may be in different processes.
+
+    Events are stored as records, and the reader is given every event
+    available at once as an EventBlock. Implements the parts of the
+    Queue.Queue interface used by Channel.
+    '''
+
+    record = dtype([('tag', float64), ('value', float64), ('kind', uint8)])
+
+    # Number of records in a ring for an unbounded channel
+    default_size = 1 << 14
+
+    def __init__(self, maxsize=0):
+        '''
+        @param maxsize: The number of records the ring holds, or 0 for
+                        SharedRing.default_size.
+        '''
+        self.size = maxsize or self.default_size
+        self.records = frombuffer(RawArray('c', self.size * self.record.itemsize), self.record)
+        self.counters = RawArray('l', 5)
+        self.condition = multiprocessing.Condition()
+
+    def _encode(self, item):
+        '''Return the records for an Event or EventBlock, a single
+        record as a tuple.'''
+        try:
+            if not isinstance(item, EventBlock):
+                value = nan if item.value is None else float(item.value)
+                return [(float(item.tag), value, LAST if item.last else EVENT)]
+            records = empty(len(item) + item.last, self.record)
+            records['tag'][:len(item)] = item.tag
+            records['value'][:len(item)] = item.value
+            records['kind'] = EVENT
+            if item.last:
+                records[-1] = (float('inf'), nan, LAST)
+            return records
+        except (AttributeError, TypeError, ValueError):
+            raise TypeError("Only numeric events can be sent between processes, not %r" % (item,))
+
+    def _decode(self, count):
+        '''Remove and return the next item from the ring, of the count
+        records available.'''
+        start = self.counters[READ] % self.size
+        tag, value, kind = self.records[start].item()
+        if kind == LAST:
+            self.counters[READ] += 1
+            if isinf(tag):
+                return LastEvent()
+            return Event(tag, None if isnan(value) else value, True)
+        if count == 1:
+            self.counters[READ] += 1
+            return Event(tag, value)
+
+        # Don't read past the end of the buffer, the rest comes next time
+        records = self.records[start:start + count]
+        ends = flatnonzero(records['kind'] != EVENT)
+        length = ends[0] if len(ends) else len(records)
+        last = length < len(records) and isinf(records['tag'][length])
+        self.counters[READ] += int(length + last)
+        if length == 1 and not last:
+            return Event(tag, value)
+        return EventBlock(records['tag'][:length].copy(), records['value'][:length].copy(), last)
+
+    def _write(self, records):
+        '''Append records that are known to fit.'''
+        start = self.counters[WRITTEN] % self.size
+        if len(records) == 1:
+            self.records[start] = records[0]
+        else:
+            split = min(len(records), self.size - start)
+            self.records[start:start + split] = records[:split]
+            self.records[:len(records) - split] = records[split:]
+        self.counters[WRITTEN] += len(records)
+
+    def _wake(self, flag):
+        '''Signal the other side if it is waiting. Called with the lock held.'''
+        if self.counters[flag]:
+            self.counters[flag] = 0
+            self.condition.notify()
+
+    def put(self, item, block=True, timeout=None):
+        records = self._encode(item)
+        with self.condition:
+            if not block and self.size - self.qsize() < len(records):
+                raise QFull
+            offset = 0
+            while offset < len(records):
+                while self.qsize() == self.size and not self.counters[RELEASED]:
+                    self.counters[PUTTER_WAITING] = 1
+                    self.condition.wait(timeout)
+                    if timeout is not None and self.qsize() == self.size:
+                        raise QFull
+                if self.counters[RELEASED]:
+                    # Nobody will read the rest
+                    return
+                count = min(self.size - self.qsize(), len(records) - offset)
+                self._write(records[offset:offset + count])
+                offset += count
+                self._wake(GETTER_WAITING)
+
+    def get(self, block=True, timeout=None):
+        with self.condition:
+            while not self.qsize():
+                if not block:
+                    raise QEmpty
+                if self.counters[RELEASED]:
+                    return _ABORT
+                self.counters[GETTER_WAITING] = 1
+                self.condition.wait(timeout)
+                if timeout is not None and not self.qsize():
+                    raise QEmpty
+            item = self._decode(self.qsize())
+            self._wake(PUTTER_WAITING)
+        return item
+
+    def qsize(self):
+        '''The number of records in the ring.'''
+        return self.counters[WRITTEN] - self.counters[READ]
+
+    def empty(self):
+        return not self.qsize()
+
+    def full(self):
+        return self.qsize() >= self.size
+
+    def snapshot(self):
+        '''The queued records are not items, and are all counted by qsize.'''
+        return []
+
+    def release(self):
+        '''Wake both sides for good, further puts are discarded.'''
+        with self.condition:
+            self.counters[RELEASED] = 1
+            self.condition.notify_all()
+
+
+def partition(components, workers):
+    '''
+    Split the components into at most 'workers' lists.
+
+    Sources are dealt out in turn, then every other actor joins the
+    partition of the writer of its first input, so that chains of actors
+    stay in one process.
+    '''
+    writers = {}
+    for component in components:
+        for channel in component.get_output_channels():
+            writers[channel] = component
+
+    placed = {}
+    sizes = [0] * workers
+    sources = [c for c in components if not c.get_input_channels()]
+    for index, source in enumerate(sources):
+        placed[source] = index % workers
+        sizes[index % workers] += 1
+
+    remaining = [c for c in components if c not in placed]
+    while remaining:
+        progress = False
+        for component in list(remaining):
+            inputs = [writers[c] for c in component.get_input_channels()
+                      if writers.get(c) in placed]
+            if inputs:
+                placed[component] = placed[inputs[0]]
+            elif all(c not in writers for c in component.get_input_channels()):
+                # Fed from outside the model
+                placed[component] = sizes.index(min(sizes))
+            else:
+                continue
+            sizes[placed[component]] += 1
+            remaining.remove(component)
+            progress = True
+        if not progress:
+            # A feedback loop with nothing placed yet
+            component = remaining.pop(0)
+            placed[component] = sizes.index(min(sizes))
+            sizes[placed[component]] += 1
+
+    partitions = [[] for _ in xrange(workers)]
+    for component in components:
+        partitions[placed[component]].append(component)
+    return [p for p in partitions if p]
+
+
+def _refers_to_channel(value):
+    '''True if a value is a Channel, or a list, tuple or dictionary
+    holding one (e.g. the inputs of a Summer).'''
+    if isinstance(value, Channel):
+        return True
+    if isinstance(value, dict):
+        value = value.values()
+    if isinstance(value, (list, tuple)):
+        return any(_refers_to_channel(item) for item in value)
+    return False
+
+
+def final_state(component):
+    '''
+    The attributes of an actor at the end of a run in a worker, each
+    pickled on its own, except for those referring to channels (which
+    stay as they are in the calling process) and those that can't be
+    pickled (e.g. its thread).
+    '''
+    state = {}
+    for name, value in vars(component).items():
+        if _refers_to_channel(value):
+            continue
+        try:
+            state[name] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logging.debug("Not returning %s.%s from a worker" % (component.__class__.__name__, name))
+    return state
+
+
+def _run_partition(components, poll, connection):
+    '''
+    The body of a worker process: run the actors in threads, sending
+    ('blocked', report) whenever whether they are all blocked on channels
+    changes (see find_deadlock), and ('done', states) at the end with the
+    final_state of each actor.
+    '''
+    latch = CompletionLatch(len(components))
+    [component.start(latch) for component in components]
+    report = None
+    while not latch.wait(poll):
+        blocked = find_deadlock([c.thread for c in components if c.is_alive()])
+        if blocked != report:
+            connection.send(('blocked', blocked))
+            report = blocked
+    [component.join() for component in components]
+    # The default Actor.run only returns once the actor has stopped
+    failed = [c.__class__.__name__ for c in components if c.cooperative and not c.stop]
+    if failed:
+        logging.error("Actors failed in worker process %d: %s" % (os.getpid(), ', '.join(failed)))
+        os._exit(1)
+    connection.send(('done', [final_state(c) for c in components]))
+    connection.close()
+
+
+class MultiprocessScheduler(object):
+    '''
+    Run the partitions of a model in a pool of worker processes.
+    '''
+
+    # Seconds between checks on the workers
+    poll = 0.01
+
+    # Seconds every worker must stay blocked before a deadlock is reported
+    deadlock_poll = 1.0
+
+    def __init__(self, components, workers=None, partitions=None):
+        '''
+        @param components: a list of actors, or a CompositeActor.
+        @param workers: the number of worker processes, defaults to the
+                        number of cores.
+        @param partitions: optionally a list of lists of the components
+                           saying which actors share a process, instead
+                           of the split made by partition().
+        '''
+        if hasattr(components, 'components'):
+            components = components.components
+        self.components = list(components)
+        if partitions is None:
+            partitions = partition(self.components, workers or multiprocessing.cpu_count())
+        self.partitions = [list(p) for p in partitions]
+
+        owner = {}
+        for index, part in enumerate(self.partitions):
+            for component in part:
+                owner[component] = index
+        if len(owner) != len(self.components) or set(owner) != set(self.components):
+            raise ValueError("Every component must be in exactly one partition")
+
+        # Channels read or written outside the model belong to this process
+        ends = {}
+        for component in self.components:
+            for channel in component.get_output_channels():
+                ends.setdefault(channel, [None, None])[0] = owner[component]
+            for channel in component.get_input_channels():
+                ends.setdefault(channel, [None, None])[1] = owner[component]
+        self.shared = [channel for channel, (writer, reader) in ends.items() if writer != reader]
+        # The shared channels emptied by this process as it goes
+        self.outputs = [channel for channel in self.shared if ends[channel][1] is None]
+        self.received = {}
+        self.backends = {}
+
+    def share(self, channel):
+        '''Move a channel's queue, and the events already in it, to shared memory.'''
+        items = []
+        while not channel.queue.empty():
+            items.append(channel.queue.get(block=False))
+        # The ring must hold every event put before the run
+        records = sum(len(item) + item.last if isinstance(item, EventBlock) else 1 for item in items)
+        ring = SharedRing(max(channel.capacity or SharedRing.default_size, records))
+        for item in items:
+            ring.put(item, block=False)
+        self.backends[channel] = channel.backend
+        self.received[channel] = []
+        channel.queue = ring
+        channel.backend = 'shared'
+
+    def receive(self, channel):
+        '''Take whatever has been written to a shared channel so far.'''
+        while True:
+            try:
+                item = channel.queue.get(block=False)
+            except QEmpty:
+                return
+            if item is not _ABORT:
+                self.received[channel].append(item)
+
+    def unshare(self, channel):
+        '''Give a shared channel back a queue of its own backend, holding
+        the events received from it and those left in its ring.'''
+        self.receive(channel)
+        channel.backend = self.backends.pop(channel)
+        channel.queue = Channel.backends[channel.backend](channel.capacity)
+        # Bypass the capacity, as when unpickling a channel
+        channel.queue.maxsize = 0
+        [channel.queue.put(item, block=False) for item in self.received.pop(channel)]
+        channel.queue.maxsize = channel.capacity
+
+    def run(self):
+        '''
+        Run every partition until all its actors have stopped, then copy
+        the final state of the actors back from the workers.
+
+        Raises WorkerFailed if an actor in one of the workers raised an
+        exception, and SimulationDeadlock if every worker is blocked on
+        channels, after stopping the other workers.
+        '''
+        logging.info("Starting simulation of %d actors in %d processes (%d shared channels)"
+                     % (len(self.components), len(self.partitions), len(self.shared)))
+        [self.share(channel) for channel in self.shared]
+        connections, workers = [], []
+        for part in self.partitions:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            workers.append(multiprocessing.Process(target=_run_partition, args=(part, self.poll, sender)))
+            connections.append(receiver)
+        [worker.start() for worker in workers]
+        # The last message from each worker
+        messages = [('blocked', None)] * len(workers)
+        try:
+            suspect, since = None, None
+            while any(worker.is_alive() for worker in workers):
+                [self.receive(channel) for channel in self.outputs]
+                messages = map(self._read, connections, messages)
+                failed = [w for w in workers if w.exitcode]
+                if failed:
+                    self.abort(workers)
+                    raise WorkerFailed("Worker process %d exited with code %d"
+                                       % (failed[0].pid, failed[0].exitcode))
+
+                # Only believe a deadlock if nothing moves for a whole poll
+                reports = [report for kind, report in messages if kind == 'blocked']
+                if reports and all(reports):
+                    progress = [(c.queue.counters[WRITTEN], c.queue.counters[READ]) for c in self.shared]
+                    if (reports, progress) != suspect:
+                        suspect, since = (reports, progress), time()
+                    elif time() - since >= self.deadlock_poll:
+                        self.abort(workers)
+                        raise SimulationDeadlock("All actors are blocked on channels:\n" + '\n'.join(reports))
+                else:
+                    suspect = None
+                sleep(self.poll)
+            messages = map(self._read, connections, messages)
+        except KeyboardInterrupt:
+            self.abort(workers)
+            raise
+        finally:
+            [self.unshare(channel) for channel in self.shared]
+        failed = [w for w in workers if w.exitcode]
+        if failed:
+            raise WorkerFailed("Worker process %d exited with code %d"
+                               % (failed[0].pid, failed[0].exitcode))
+
+        # The actors ran to completion in the workers
+        for part, (kind, states) in zip(self.partitions, messages):
+            for component, state in zip(part, states):
+                component.__dict__.update((name, pickle.loads(value)) for name, value in state.items())
+                component.stop = True
+        logging.debug("Finished multi-process simulation")
+
+    def _read(self, connection, message):
+        '''The last of the messages sent by a worker so far, or the one
+        before if there are none.'''
+        while not connection.closed and connection.poll():
+            try:
+                message = connection.recv()
+            except EOFError:
+                connection.close()
+        return message
+
+    def abort(self, workers):
+        '''Wake any worker blocked on a shared channel and stop them all.'''
+        [channel.queue.release() for channel in self.shared]
+        for worker in workers:
+            worker.join(1.0)
+            if worker.is_alive():
+                worker.terminate()
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from channel import Channel, MakeChans
+
+
+class TestMultiprocess(unittest.TestCase):
+
+    def test_shared_ring_between_processes(self):
+        '''Events, blocks and the end of a signal cross a process boundary'''
+        channel = Channel(capacity=8)
+        MultiprocessScheduler([], workers=1).share(channel)
+
+        def write():
+            channel.put(Event(0.5, 1))
+            channel.put(EventBlock(range(1, 20), range(19)))
+            channel.put(Event(20, 7, last=True))
+        writer = multiprocessing.Process(target=write)
+        writer.start()
+        events = []
+        while True:
+            event = channel.get()
+            events.append(event)
+            if event.last:
+                break
+        writer.join()
+        self.assertEquals(events[0], Event(0.5, 1.0))
+        self.assertEquals([e.tag for e in events[1:-1]], range(1, 20))
+        self.assertEquals(events[-1], Event(20.0, 7.0, True))
+        self.assertEquals(writer.exitcode, 0)
+
+    def test_last_event_ends_block(self):
+        ring = SharedRing()
+        ring.put(EventBlock([1, 2], [3, 4], last=True))
+        block = ring.get()
+        self.assertTrue(isinstance(block, EventBlock) and block.last)
+        self.assertEquals(list(block.events())[-1], LastEvent())
+        self.assertRaises(QEmpty, ring.get, False)
+
+    def test_partition(self):
+        '''Sources are spread out and chains follow their writer'''
+        from scipysim.actors.math import Proportional, Summer
+        from scipysim.actors.signal import Ramp
+        wires = MakeChans(7)
+        sources = [Ramp(wires[i]) for i in xrange(4)]
+        gains = [Proportional(wires[i], wires[i + 4]) for i in xrange(2)]
+        summer = Summer([wires[4], wires[5], wires[2], wires[3]], wires[6])
+        parts = partition(sources + gains + [summer], 2)
+        self.assertEquals(parts, [[sources[0], sources[2], gains[0], summer],
+                                  [sources[1], sources[3], gains[1]]])
+        scheduler = MultiprocessScheduler(sources + gains + [summer], partitions=parts)
+        self.assertEquals(set(scheduler.shared), set([wires[3], wires[5], wires[6]]))
+
+    def test_sum_of_sources(self):
+        '''A model spread over several processes gives the same result'''
+        from scipysim.actors.math import Summer, Constant
+        wires = MakeChans(5)
+        components = [Constant(wires[i], value=i, resolution=10, simulation_time=50)
+                      for i in xrange(4)]
+        components.append(Summer(wires[:4], wires[4]))
+        MultiprocessScheduler(components, workers=3).run()
+        self.assertTrue(all(c.stop for c in components))
+        events = []
+        while True:
+            event = wires[4].get()
+            if event.last:
+                break
+            events.append(event)
+        self.assertEquals(len(events), 500)
+        self.assertTrue(all(e.value == 6 for e in events))
+
+    def test_results_come_back(self):
+        '''Outputs longer than a ring, and the state of the actors, can be read after the run'''
+        from scipysim.actors.signal import Ramp, Split
+        from sweep import Recorder
+        wires = MakeChans(3)
+        recorder = Recorder(wires[1])
+        components = [Ramp(wires[0], resolution=1000, simulation_time=20), recorder,
+                      Split(wires[0], [wires[1], wires[2]])]
+        MultiprocessScheduler(components, partitions=[components[:1], components[1:]]).run()
+        self.assertEquals(len(recorder.signal()), 20000)
+        self.assertEquals(wires[2].backend, 'queue')
+        tags = []
+        while not wires[2].head(block=False).last:
+            tags.append(wires[2].get(block=False).tag)
+        self.assertEquals(list(tags), list(recorder.signal().tag))
+
+    def test_deadlock(self):
+        '''Workers blocked on channels that nobody writes are stopped'''
+        from scipysim.actors.signal import Ramp, Merge
+        wires = MakeChans(3)
+        components = [Ramp(wires[0], resolution=10, simulation_time=1), Merge(wires[:2], wires[2])]
+        scheduler = MultiprocessScheduler(components, workers=2)
+        scheduler.deadlock_poll = 0.1
+        self.assertRaises(SimulationDeadlock, scheduler.run)
+
+    def test_failed_worker(self):
+        '''An event that can't be shared stops the run'''
+        from scipysim.actors.signal import Ramp
+        from scipysim.actors.io import Bundle
+        wires = MakeChans(2)
+        components = [Ramp(wires[0], resolution=2, simulation_time=1), Bundle(wires[0], wires[1])]
+        logging.disable(logging.CRITICAL)
+        try:
+            self.assertRaises(WorkerFailed, MultiprocessScheduler(components, workers=2).run)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_composite_actor_engine(self):
+        '''CompositeActor.run can select the multi-process engine'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.signal import Ramp, Delay, Sink
+        wires = MakeChans(2)
+        model = CompositeActor()
+        model.components = [Ramp(wires[0], resolution=5, simulation_time=2),
+                            Delay(wires[0], wires[1], wait=0), Sink(wires[1])]
+        model.run(engine='multiprocess')
+        self.assertTrue(all(c.stop for c in model.components))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,15 @@
 import os
 import logging
-import re
 
-from codefile import CodeFile
+from catalog import Catalog, SOURCE_FILE
 
-def fill_tree( tree, directory ):
+def fill_tree( tree, directory, catalog=None ):
     '''Parse a directory and add to an existing tree.
-    Return a dictionary of the tree id: CodeFile'''
+    Return a dictionary of the tree id: CodeFile (a CatalogEntry, so the
+    actor modules are only imported when used).
+    The actors are looked up in the default Catalog if none is given.'''
+    if catalog is None:
+        catalog = Catalog()
     codefiles = {}
     for file_tuple in os.walk( directory ):
         '''The tuples contains:
@@ -21,15 +24,14 @@ def fill_tree( tree, directory ):
         logging.debug( "Current node is: <%s>, Parent node is: <%s>" % ( current_node, parent_node ) )
 
         # Search for interesting files
-        python_file_regex = re.compile( "^(?!tests?).*[^_]\.py$", re.IGNORECASE )
-        files = filter( python_file_regex.search, file_tuple[2] )
+        files = filter( SOURCE_FILE.search, file_tuple[2] )
         logging.info( "Under the %s directory are %d files: \n%s" % ( os.path.basename( file_tuple[0] ), len( files ), files ) )
 
         logging.debug( "Add the files in directory to the current node" )
         for file in files:
             logging.debug( "Inserting %s underneath an existing node" % file )
             node = os.path.relpath( os.path.join( file_tuple[0], file ), directory )
-            codefiles[node] = CodeFile( os.path.join( file_tuple[0], file ) )
+            codefiles[node] = catalog.entry( os.path.join( file_tuple[0], file ) )
             tree.insert( current_node, 'end', node, text=file, tags=( 'node' ) )
 
             logging.debug( "Inserted '%s' node under '%s' with ID: '%s'" % ( file, current_node, node ) )
@@ -46,4 +48,5 @@ def fill_tree( tree, directory ):
             node = os.path.relpath( os.path.join( file_tuple[0], subdir ), directory )
             logging.debug( "Child node is: <%s>" % node )
             tree.insert( current_node, 'end', node, text=subdir.title(), tags=( 'dir' ) )
+    catalog.save()
     return codefiles
\ No newline at end of file
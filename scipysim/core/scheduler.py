@@ -0,0 +1,234 @@
+'''
+Single-threaded cooperative execution of a set of actors.
+
+The default way of running a model is to give every actor its own thread
+(see Actor.start). That is simple, but for models built from many small
+actors most of the run time is spent handing the GIL between threads and
+locking channel queues. The Scheduler in this module instead fires the
+process function of each actor in turn from a single thread, choosing only
+actors that have an event waiting on every input (see Actor.ready_to_fire),
+so a firing never blocks.
+
+Bounded channels (see Channel) are respected: an actor with a full output
+channel is not ready to fire. Note that a source generating its whole signal
+in one firing can not be run this way with a bounded output channel.
+
+Actors that cannot be fired this way (those with cooperative = False, such
+as the plotters which run in their own process) are still started in their
+own thread and run alongside the scheduler.
+
+Example of usage::
+
+    Scheduler([src, gain, dst]).run()
+
+or, for a CompositeActor::
+
+    model.run(engine='cooperative')
+
+Between two firings no actor is part way through processing an event, so a
+Scheduler can save a checkpoint of the whole model there, or be paused and
+resumed later (see scipysim.core.checkpoint).
+
+'''
+
+from time import sleep, time
+import logging
+
+from channel import context
+from errors import SimulationDeadlock
+
+
+def describe_blocked(actor):
+    '''Describe why an actor is not ready to fire, for deadlock reports.'''
+    reasons = ["empty input '%s'" % c.name for c in actor.get_input_channels() if c.empty()]
+    reasons += ["full output '%s' (%d events)" % (c.name, c.capacity)
+                for c in actor.get_output_channels() if c.full()]
+    return '%s (%s)' % (actor.__class__.__name__, ', '.join(reasons))
+
+
+class Scheduler(object):
+    '''
+    Fire a set of actors cooperatively on the calling thread.
+    '''
+
+    # Seconds to wait for threaded actors when nothing is ready to fire
+    idle_wait = 0.001
+
+    def __init__(self, components, checkpoint=None, checkpoint_interval=60.0):
+        '''
+        @param components: a list of actors to run.
+        @param checkpoint: the name of a file to save a checkpoint of the
+                           actors and channels to while running, which
+                           can be resumed from with checkpoint.restore.
+        @param checkpoint_interval: the seconds between checkpoints.
+        '''
+        self.components = list(components)
+        self.firings = 0
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.paused = False
+        if checkpoint is not None:
+            from checkpoint import check_checkpointable
+            check_checkpointable(self.components)
+
+    def pause(self):
+        '''
+        Stop running after the current firing, leaving every actor and
+        channel as it is, e.g. to save a checkpoint. May be called from
+        another thread or a signal handler; run returns once paused and
+        can be called again to carry on.
+        '''
+        self.paused = True
+
+    def run(self):
+        '''
+        Run every actor until all have stopped.
+
+        Raises a SimulationDeadlock if no actor can make progress and
+        no threaded actor is left that could produce more events.
+        '''
+        threaded = [c for c in self.components if not c.cooperative]
+        active = [c for c in self.components if c.cooperative and not c.stop]
+
+        logging.info("Starting cooperative simulation of %d actors (%d threaded)" % (len(active), len(threaded)))
+        # Those still running from before a pause carry on
+        [component.start() for component in threaded if not component.is_alive()]
+
+        self.paused = False
+        self.saved = time()
+        context.cooperative = True
+        try:
+            while active and not self.paused:
+                if self.step(active):
+                    active = [c for c in active if not c.stop]
+                elif any(c.is_alive() for c in threaded):
+                    # Only the threaded actors can make progress
+                    sleep(self.idle_wait)
+                else:
+                    raise SimulationDeadlock("No actor can fire: %s" %
+                                             ', '.join(describe_blocked(c) for c in active))
+        except KeyboardInterrupt:
+            [component.terminate() for component in threaded]
+            raise
+        except:
+            # Wake up the threaded actors blocked on a channel, so that
+            # they stop instead of waiting forever
+            for component in threaded:
+                for channel in component.get_input_channels() + component.get_output_channels():
+                    channel.abort()
+            [component.join() for component in threaded]
+            raise
+        finally:
+            context.cooperative = False
+
+        if self.paused:
+            logging.info("Paused cooperative simulation after %d firings" % self.firings)
+            return
+        [component.join() for component in threaded]
+        logging.debug("Finished cooperative simulation after %d firings" % self.firings)
+
+    def step(self, actors):
+        '''
+        Make one pass over the actors, firing each one for as long as it
+        is ready. Returns True if any actor fired.
+        '''
+        fired = False
+        for actor in actors:
+            while not actor.stop and actor.ready_to_fire():
+                actor.process()
+                self.firings += 1
+                fired = True
+                if self.checkpoint is not None and time() - self.saved >= self.checkpoint_interval:
+                    self.save_checkpoint()
+                if self.paused:
+                    return fired
+        return fired
+
+    def save_checkpoint(self, path=None):
+        '''Save a checkpoint of the actors, by default to the scheduler's
+        checkpoint file. Only valid between firings.'''
+        from checkpoint import save_checkpoint
+        save_checkpoint(self.components, path or self.checkpoint, firings=self.firings)
+        self.saved = time()
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from channel import Channel
+from event import Event, LastEvent, EventBlock
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_siso_chain(self):
+        '''Run a chain of siso actors on one thread'''
+        from scipysim.actors.math import Proportional, Abs
+        q_in, q_mid, q_out = Channel(), Channel(), Channel()
+        [q_in.put(Event(i, -i)) for i in xrange(100)]
+        q_in.put(LastEvent())
+
+        Scheduler([Proportional(q_in, q_mid, gain=3), Abs(q_mid, q_out)]).run()
+
+        for i in xrange(100):
+            event = q_out.get(block=False)
+            self.assertEquals(event.tag, i)
+            self.assertEquals(event.value, 3 * i)
+        self.assertTrue(q_out.get(block=False).last)
+
+    def test_block_chain(self):
+        '''Blocks pass through a chain and are split for a summer'''
+        from scipysim.actors.math import Proportional, Abs, Summer
+        from scipysim.actors.signal import Split
+        wires = [Channel('DT') for _ in xrange(6)]
+        wires[0].put(EventBlock(range(10), [-1.0] * 10, last=True))
+        [wires[5].put(Event(i, 1.0)) for i in xrange(10)]
+        wires[5].put(LastEvent())
+        Scheduler([Proportional(wires[0], wires[1], gain=2), Abs(wires[1], wires[2]),
+                   Split(wires[2], [wires[3]]), Summer([wires[3], wires[5]], wires[4])]).run()
+
+        for i in xrange(10):
+            self.assertEquals(wires[4].get(block=False), Event(i, 3.0))
+        self.assertTrue(wires[4].get(block=False).last)
+
+    def test_source_and_summer(self):
+        '''A source and a multi input actor are fired from channel readiness'''
+        from scipysim.actors.math import Constant, Summer
+        a, b, out = Channel(), Channel(), Channel()
+        components = [Summer([a, (b, '-')], out),
+                      Constant(a, value=3.0, resolution=1, simulation_time=10),
+                      Constant(b, value=1.0, resolution=1, simulation_time=10)]
+        Scheduler(components).run()
+        self.assertTrue(all(c.stop for c in components))
+        for i in xrange(10):
+            self.assertEquals(out.get(block=False).value, 2.0)
+        self.assertTrue(out.get(block=False).last)
+
+    def test_deadlock_is_reported(self):
+        '''An actor waiting on an input that will never arrive is a deadlock'''
+        from scipysim.actors.math import Proportional
+        self.assertRaises(SimulationDeadlock, Scheduler([Proportional(Channel(), Channel())]).run)
+
+    def test_channel_read_raises_instead_of_blocking(self):
+        '''A blocking read inside the scheduler thread must not hang'''
+        context.cooperative = True
+        try:
+            self.assertRaises(SimulationDeadlock, Channel().get)
+        finally:
+            context.cooperative = False
+
+    def test_composite_actor_engine(self):
+        '''CompositeActor.run can select the cooperative engine'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.signal import Ramp, Sink
+        wire = Channel()
+        model = CompositeActor()
+        model.components = [Ramp(wire, resolution=5, simulation_time=2), Sink(wire)]
+        model.run(engine='cooperative')
+        self.assertTrue(all(c.stop for c in model.components))
+        self.assertTrue(wire.empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,438 @@
+'''
+Static synchronous dataflow (SDF) scheduling of discrete-time models.
+
+Many discrete-time actors consume and produce a fixed number of events
+every time they fire: a Split reads one event and writes one to each of
+its outputs, a Decimator with a reduction factor of N reads N events and
+writes one. Actors declare these token rates with Actor.get_rates. For a
+graph made of such actors the order in which they fire can be worked out
+once, before the simulation starts, instead of being discovered at run time
+by blocking threads or polling channels.
+
+The SDFScheduler in this module:
+
+    * computes the repetition vector - how many times each actor fires in
+      one period so that every channel ends the period holding as many
+      events as it started with,
+    * raises InconsistentRates if no such vector exists,
+    * simulates one period symbolically to find a firing order, raising a
+      SimulationDeadlock if the graph cannot complete a period (e.g. a
+      feedback loop without an initial event),
+    * records the largest number of events each channel holds during a
+      period (the buffer size needed),
+    * runs the schedule from a single thread with no blocking channel
+      operations.
+
+The end of a signal need not fall on the end of a period; once no further
+period can run the remaining events are processed by firing each actor
+whenever it is ready, as the cooperative Scheduler does.
+
+Sources are fired whenever their output channels have room, between
+periods, and their output channels are treated as inputs to the static
+graph. Actors without fixed rates (e.g. the plotters) may only
+consume the output of the static part of the model; they are run in their
+own threads alongside the schedule.
+
+Example of usage::
+
+    scheduler = SDFScheduler(model.components)
+    print scheduler.repetitions, scheduler.buffer_sizes
+    scheduler.run()
+
+or::
+
+    model.run(engine='sdf')
+
+'''
+
+from fractions import Fraction, gcd
+import logging
+from time import sleep
+
+from actor import Source
+from channel import context
+from scheduler import Scheduler, describe_blocked
+from errors import InconsistentRates, InvalidSimulationInput, SimulationDeadlock
+
+
+def _lcm(a, b):
+    return a * b // gcd(a, b)
+
+
+def _has_room(channel, count):
+    '''True if a channel can take 'count' more items without blocking.'''
+    return not channel.capacity or channel.queue.qsize() + count <= channel.capacity
+
+
+class SDFScheduler(object):
+    '''
+    Compile a list of actors into a static schedule and run it.
+    '''
+
+    def __init__(self, components):
+        '''
+        @param components: a list of actors, or a CompositeActor.
+
+        Raises InconsistentRates if the token rates can not be balanced,
+        SimulationDeadlock if a period of the schedule can not complete and
+        InvalidSimulationInput if an actor with fixed rates reads from one
+        without. A SimulationDeadlock is also raised if a bounded channel is
+        too small for the schedule.
+        '''
+        if hasattr(components, 'components'):
+            components = components.components
+        self.components = list(components)
+
+        self.sources = [c for c in self.components if isinstance(c, Source)]
+        self.actors = [c for c in self.components
+                       if c not in self.sources and c.get_rates() is not None]
+        self.external = [c for c in self.components
+                         if c not in self.sources and c not in self.actors]
+
+        self._connect()
+        self.repetitions = self._repetition_vector()
+        self.schedule, self.buffer_sizes = self._build_schedule()
+        self.firings = 0
+
+        # A static actor puts at most one item per event it produces (a block
+        # of events is one item), so the events a channel holds during a
+        # period bound the items it must have room for.
+        for channel, size in self.buffer_sizes.items():
+            if channel.capacity and size > channel.capacity:
+                raise SimulationDeadlock("Channel '%s' holds %d events during a period "
+                                         "but its capacity is %d" % (channel.name, size, channel.capacity))
+
+    def _connect(self):
+        '''Work out the rates of every channel between the static actors.'''
+        self.consumption = {}
+        self.production = {}
+        self.consumer = {}
+        self.producer = {}
+
+        for actor in self.actors:
+            consumed, produced = actor.get_rates()
+            for channel, rate in zip(actor.get_input_channels(), consumed):
+                self.consumption[channel] = rate
+                self.consumer[channel] = actor
+            for channel, rate in zip(actor.get_output_channels(), produced):
+                self.production[channel] = rate
+                self.producer[channel] = actor
+
+        # Static actors can't wait on an actor without fixed rates
+        for actor in self.external:
+            for channel in actor.get_output_channels():
+                if channel in self.consumer:
+                    raise InvalidSimulationInput("%s reads from %s which has no fixed token rates"
+                                                 % (self.consumer[channel].__class__.__name__,
+                                                    actor.__class__.__name__))
+
+        # The edges of the static graph, (producer, consumer, channel)
+        self.edges = [(self.producer[c], self.consumer[c], c)
+                      for c in self.consumer if c in self.producer]
+
+    def _repetition_vector(self):
+        '''
+        Solve the balance equations q[producer] * produced = q[consumer] * consumed
+        for the smallest positive integers, one connected part of the graph at a time.
+        '''
+        neighbours = dict((actor, []) for actor in self.actors)
+        for producer, consumer, channel in self.edges:
+            ratio = Fraction(self.production[channel], self.consumption[channel])
+            neighbours[producer].append((consumer, ratio))
+            neighbours[consumer].append((producer, 1 / ratio))
+
+        rates = {}
+        repetitions = {}
+        for start in self.actors:
+            if start in rates:
+                continue
+            rates[start] = Fraction(1)
+            part = [start]
+            pending = [start]
+            while pending:
+                actor = pending.pop()
+                for other, ratio in neighbours[actor]:
+                    rate = rates[actor] * ratio
+                    if other not in rates:
+                        rates[other] = rate
+                        part.append(other)
+                        pending.append(other)
+                    elif rates[other] != rate:
+                        raise InconsistentRates("Token rates into %s can not be balanced"
+                                                % other.__class__.__name__)
+
+            scale = reduce(_lcm, [rates[a].denominator for a in part], 1)
+            counts = [int(rates[a] * scale) for a in part]
+            divisor = reduce(gcd, counts)
+            for actor, count in zip(part, counts):
+                repetitions[actor] = count // divisor
+        return repetitions
+
+    def _build_schedule(self):
+        '''
+        Fire the actors symbolically for one period, counting events on each
+        channel. Returns the firing order as a list of (actor, count) pairs
+        and the largest number of events held by each channel.
+        '''
+        tokens = {}
+        for producer, consumer, channel in self.edges:
+            tokens[channel] = channel.qsize()
+        buffer_sizes = dict(tokens)
+
+        remaining = dict(self.repetitions)
+        schedule = []
+        while any(remaining.values()):
+            progress = False
+            for actor in self.actors:
+                consumed, produced = actor.get_rates()
+                count = 0
+                while remaining[actor] and all(tokens.get(c, rate) >= rate for c, rate in
+                                               zip(actor.get_input_channels(), consumed)):
+                    for c, rate in zip(actor.get_input_channels(), consumed):
+                        if c in tokens:
+                            tokens[c] -= rate
+                    for c, rate in zip(actor.get_output_channels(), produced):
+                        if c in tokens:
+                            tokens[c] += rate
+                            buffer_sizes[c] = max(buffer_sizes[c], tokens[c])
+                    remaining[actor] -= 1
+                    count += 1
+                if count:
+                    schedule.append((actor, count))
+                    progress = True
+            if not progress:
+                starved = [a.__class__.__name__ for a in self.actors if remaining[a]]
+                raise SimulationDeadlock("Static schedule can not complete a period, "
+                                         "waiting on: %s" % ', '.join(starved))
+        return schedule, buffer_sizes
+
+    def run(self):
+        '''
+        Fire the sources while their outputs have room, and the static
+        schedule, until no actor can fire. Actors without fixed rates are
+        run in their own threads.
+        '''
+        logging.info("Starting SDF simulation of %d actors, %d firings per period"
+                     % (len(self.actors), sum(self.repetitions.values())))
+        [component.start() for component in self.external]
+
+        dynamic = self.sources + self.actors
+        tail = Scheduler(dynamic)
+        # The threaded actors only read from the static part of the model
+        drained = set(c for actor in self.external for c in actor.get_input_channels())
+        context.cooperative = True
+        try:
+            while True:
+                if self.fire_sources() | self.period():
+                    continue
+                # The end of a signal rarely falls on the end of a period, so
+                # the remaining events are handled by firing actors dynamically.
+                if all(s.stop for s in self.sources) and tail.step([a for a in dynamic if not a.stop]):
+                    continue
+                if all(a.stop for a in dynamic):
+                    break
+                if any(not c.empty() for c in drained) and any(c.is_alive() for c in self.external):
+                    # Only the threaded actors can make room in a full channel
+                    sleep(tail.idle_wait)
+                    continue
+                raise SimulationDeadlock("Inputs ran out before these actors finished: %s" %
+                                         ', '.join(describe_blocked(a) for a in dynamic if not a.stop))
+        except KeyboardInterrupt:
+            [component.terminate() for component in self.external]
+            raise
+        except:
+            # Wake up the threaded actors blocked on a channel, so that
+            # they stop instead of waiting forever
+            for component in self.external:
+                for channel in component.get_input_channels() + component.get_output_channels():
+                    channel.abort()
+            [component.join() for component in self.external]
+            raise
+        finally:
+            context.cooperative = False
+
+        [component.join() for component in self.external]
+        logging.debug("Finished SDF simulation after %d firings" % self.firings)
+
+    def fire_sources(self):
+        '''
+        Fire each source until it stops or one of its outputs is full.
+        Returns True if any source fired.
+        '''
+        fired = False
+        for source in self.sources:
+            while source.ready_to_fire() and not source.stop:
+                source.fire()
+                self.firings += 1
+                fired = True
+        return fired
+
+    def period(self):
+        '''
+        Run one period of the schedule. An actor is only fired if its
+        inputs hold enough events and its outputs have room for what it
+        produces, so at the end of a signal, or while an actor in its own
+        thread catches up, a period may be cut short. Returns True if any
+        actor fired.
+        '''
+        fired = False
+        for actor, count in self.schedule:
+            consumed, produced = actor.get_rates()
+            inputs = zip(actor.get_input_channels(), consumed)
+            outputs = zip(actor.get_output_channels(), produced)
+            for _ in xrange(count):
+                if actor.stop or any(channel.qsize() < rate for channel, rate in inputs) or \
+                        any(not _has_room(channel, rate) for channel, rate in outputs):
+                    break
+                actor.fire()
+                self.firings += 1
+                fired = True
+        return fired
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+from channel import Channel, MakeChans
+from event import Event, LastEvent
+
+
+class TestSDF(unittest.TestCase):
+
+    def test_chain_repetitions(self):
+        '''A decimator fires once for every N firings upstream'''
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.signal import Decimator, Sink
+        wires = MakeChans(3, 'DT')
+        gain, decimate, sink = (Proportional(wires[0], wires[1]),
+                                Decimator(wires[1], wires[2], reduction_factor=4),
+                                Sink(wires[2]))
+        scheduler = SDFScheduler([gain, decimate, sink])
+        self.assertEquals(scheduler.repetitions, {gain: 4, decimate: 1, sink: 1})
+        self.assertEquals(scheduler.schedule, [(gain, 4), (decimate, 1), (sink, 1)])
+        self.assertEquals(scheduler.buffer_sizes[wires[1]], 4)
+
+    def test_buffer_too_small(self):
+        '''A bounded channel smaller than the schedule needs is rejected'''
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.signal import Decimator
+        wires = [Channel('DT'), Channel('DT', capacity=2), Channel('DT')]
+        self.assertRaises(SimulationDeadlock, SDFScheduler,
+                          [Proportional(wires[0], wires[1]),
+                           Decimator(wires[1], wires[2], reduction_factor=4)])
+
+    def test_bounded_channels(self):
+        '''Sources are held back by full channels, also those read by threads'''
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.signal import Ramp, Decimator
+        from sweep import Recorder
+        wires = [Channel('DT', capacity=8) for _ in xrange(3)]
+        recorder = Recorder(wires[2])
+        SDFScheduler([Ramp(wires[0], resolution=10, simulation_time=100, block_size=1),
+                      Proportional(wires[0], wires[1]), Decimator(wires[1], wires[2], reduction_factor=4),
+                      recorder]).run()
+        self.assertEquals(len(recorder.signal()), 250)
+
+    def test_deadlock_stops_threads(self):
+        '''The threaded actors are stopped when the schedule deadlocks'''
+        from scipysim.actors.signal import Ramp, Decimator
+        from sweep import Recorder
+        wires = [Channel('DT', capacity=2), Channel('DT')]
+        recorder = Recorder(wires[1])
+        scheduler = SDFScheduler([Ramp(wires[0], resolution=10, simulation_time=10, block_size=1),
+                                  Decimator(wires[0], wires[1], reduction_factor=4), recorder])
+        self.assertRaises(SimulationDeadlock, scheduler.run)
+        self.assertFalse(recorder.is_alive())
+
+    def test_run_decimator(self):
+        '''Running a static schedule gives the same output as the threads'''
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.signal import Decimator
+        wires = MakeChans(3, 'DT')
+        [wires[0].put(Event(i, 1)) for i in xrange(10)]
+        wires[0].put(LastEvent())
+        SDFScheduler([Proportional(wires[0], wires[1], gain=3),
+                      Decimator(wires[1], wires[2], reduction_factor=4)]).run()
+        for tag in [0, 4, 8]:
+            event = wires[2].get(block=False)
+            self.assertEquals((event.tag, event.value), (tag, 3))
+        self.assertTrue(wires[2].get(block=False).last)
+
+    def test_inconsistent_rates(self):
+        '''Joining a stream with a decimated copy of itself can not be balanced'''
+        from scipysim.actors.signal import Decimator, Split
+        from scipysim.actors.math import Summer
+        wires = MakeChans(5, 'DT')
+        components = [Split(wires[0], [wires[1], wires[2]]),
+                      Decimator(wires[1], wires[3], reduction_factor=2),
+                      Summer([wires[2], wires[3]], wires[4])]
+        self.assertRaises(InconsistentRates, SDFScheduler, components)
+
+    def test_feedback_without_initial_event(self):
+        '''A loop with no initial event deadlocks at compile time'''
+        from scipysim.actors.signal import Split
+        from scipysim.actors.math import Summer
+        wires = MakeChans(4, 'DT')
+        components = [Summer([wires[0], wires[3]], wires[1]),
+                      Split(wires[1], [wires[2], wires[3]])]
+        self.assertRaises(SimulationDeadlock, SDFScheduler, components)
+        wires[3].put(Event(0, 0))
+        SDFScheduler(components)
+
+    def test_iir_filter(self):
+        '''The IIR filter model gives the same output as the cooperative engine'''
+        from scipysim.actors.signal import Split, Delay, Sink
+        from scipysim.actors.math.trig import DTSinGenerator
+        from scipysim.actors.math import Summer, Proportional
+
+        def run(engine):
+            wires = MakeChans(12, 'DT')
+            wires[9].put(Event(0, 0))
+            components = [
+                DTSinGenerator(wires[2], simulation_length=50),
+                Split(wires[2], [wires[3], wires[4]]),
+                Sink(wires[3]),
+                Summer([wires[4], wires[10]], wires[5]),
+                Split(wires[5], [wires[6], wires[7]]),
+                Delay(wires[6], wires[8], wait=1),
+                Proportional(wires[8], wires[9], gain=0.7),
+                Split(wires[9], [wires[10], wires[11]]),
+                Summer([wires[7], wires[11]], wires[0]),
+            ]
+            engine(components).run()
+            self.assertTrue(all(c.stop for c in components))
+            events = []
+            while not wires[0].empty():
+                events.append(wires[0].get(block=False))
+            self.assertTrue(events.pop().last)
+            return [(e.tag, e.value) for e in events]
+
+        expected = run(Scheduler)
+        self.assertTrue(len(expected) > 0)
+        self.assertEquals(run(SDFScheduler), expected)
+
+    def test_decimator_end_of_signal(self):
+        '''A signal that ends part way through a period still finishes'''
+        from scipysim.actors.signal import Decimator, Sink
+        wires = MakeChans(2, 'DT')
+        [wires[0].put(Event(i, i)) for i in xrange(7)]
+        wires[0].put(LastEvent())
+        components = [Decimator(wires[0], wires[1], reduction_factor=3), Sink(wires[1])]
+        SDFScheduler(components).run()
+        self.assertTrue(all(c.stop for c in components))
+
+    def test_composite_actor_engine(self):
+        '''CompositeActor.run can select the SDF engine'''
+        from composite_actor import CompositeActor
+        from scipysim.actors.signal import Ramp, Split, Sink
+        wires = MakeChans(3, 'DT')
+        model = CompositeActor()
+        model.components = [Ramp(wires[0], resolution=5, simulation_time=2),
+                            Split(wires[0], wires[1:]), Sink(wires[1]), Sink(wires[2])]
+        model.run(engine='sdf')
+        self.assertTrue(all(c.stop for c in model.components))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import logging
 from actor import Actor
-from event import LastEvent
+from event import LastEvent, EventBlock
+from tracepoint import tracepoint
+
+trace = tracepoint(__name__)
 
 def SisoTestHelper(test_case, block, inputs, expected_outputs):
     '''Helper function for testing SISO actors.
@@ -59,6 +62,31 @@ class Siso(Actor):
         '''
         raise NotImplementedError("No siso process function found.")
 
+    def siso_process_block(self, block):
+        '''Process a block of events at once.
+
+        The default calls siso_process for each event in turn. Child
+        classes can override this with array operations on block.tag and
+        block.value to avoid the per event overhead.
+
+        @param block: an EventBlock (its last flag is handled by process).
+
+        @return: an EventBlock of output events, or None if the child class
+                 handles its own output.
+        '''
+        # (a slice of the block is never last, so no LastEvent is generated)
+        outputs = [self.siso_process(event) for event in block[:].events()]
+        if self.child_handles_output:
+            return None
+        return EventBlock.from_events(outputs)
+
+    def get_rates(self):
+        '''Every event in gives exactly one event out, unless the child
+        class handles its own output.'''
+        if self.child_handles_output:
+            return None
+        return ((1,), (1,))
+
     def finish(self):
         '''Perform any final operations needed at the end of a signal.'''
         self.stop = True
@@ -71,9 +99,13 @@ class Siso(Actor):
         the data as a parameter, and the result is put on the output 
         channel.
         """
-        logging.debug("Running generic SISO process")
+        if trace.enabled:
+            trace("Running generic SISO process")
 
-        obj = self.input_channel.get(True)     # this is blocking
+        obj = self.input_channel.get_block(True)     # this is blocking
+        if isinstance(obj, EventBlock):
+            self.process_block(obj)
+            return
         if obj.last:
             logging.info('Siso process is finished with the data')
             self.finish()
@@ -82,3 +114,15 @@ class Siso(Actor):
         data = self.siso_process(obj)
         if not self.child_handles_output:
             self.output_channel.put(data)
+
+    def process_block(self, block):
+        '''Pass a block of events through siso_process_block, ending the
+        signal if the block is the last.'''
+        data = self.siso_process_block(block)
+        if not self.child_handles_output:
+            self.output_channel.put(EventBlock(data.tag, data.value, block.last))
+        elif block.last:
+            self.output_channel.put(LastEvent())
+        if block.last:
+            logging.info('Siso process is finished with the data')
+            self.finish()
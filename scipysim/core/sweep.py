@@ -0,0 +1,366 @@
+'''
+Parameter sweeps over a model.
+
+Exploring a design usually means running the same model many times with
+different parameters - the number of noise sources summed in the central
+limit theorem model, say. Each run is independent, so sweep runs them in
+parallel, every point of the parameter grid in its own worker process.
+
+The runs are headless: every display actor in the model is replaced by a
+Recorder (see DisplayActor.headless), so nothing is drawn and the signals
+that would have been plotted are sent back to the calling process. A point
+that raises an exception, kills its worker or takes longer than the timeout
+is reported in its row of the result and doesn't affect the others.
+
+Example of usage::
+
+    result = sweep(MultiSumPlot, {'N': [1, 2, 3, 6, 12, 20]}, workers=4)
+    print result.table()
+
+or from the command line::
+
+    run_scipysim --sweep N=1,2,3,6,12,20 central_limit_theorem
+
+'''
+
+import multiprocessing
+import itertools
+import traceback
+import inspect
+import logging
+from ast import literal_eval
+from time import time, sleep
+
+import numpy
+
+from actor import Actor, DisplayActor
+from composite_actor import CompositeActor
+from event import EventBlock
+
+
+class Recorder(Actor):
+    '''
+    A sink that keeps the signal it is sent, used in place of a display
+    actor in a headless run.
+    '''
+    num_inputs = 1
+    num_outputs = 0
+
+    def __init__(self, input_channel, title=None):
+        '''
+        @param input_channel: the channel to record.
+        @param title: the title of the display that was replaced.
+        '''
+        super(Recorder, self).__init__(input_channel=input_channel)
+        self.title = title
+        self.tags, self.values = [], []
+
+    def process(self):
+        item = self.input_channel.get(True)
+        if isinstance(item, numpy.ndarray):
+            # A bundle of events, for the static plotters
+            self.tags.extend(item['Tag'])
+            self.values.extend(item['Value'])
+            return
+        if isinstance(item, EventBlock):
+            self.tags.extend(item.tag)
+            self.values.extend(item.value)
+        elif not item.last:
+            self.tags.append(item.tag)
+            self.values.append(item.value)
+        if item.last:
+            self.stop = True
+
+    def signal(self):
+        '''The recorded signal as an EventBlock.'''
+        return EventBlock(self.tags, self.values)
+
+
+def recorded_signals(components):
+    '''
+    Map the title of each Recorder in the components to its signal.
+    Recorders without a title, or with the same title as an earlier one,
+    are named by their position.
+    '''
+    signals = {}
+    recorders = [c for c in components if isinstance(c, Recorder)]
+    for i, recorder in enumerate(recorders):
+        name = recorder.title
+        if name is None or name in signals:
+            name = 'output %d' % i
+        signals[name] = recorder.signal()
+    return signals
+
+
+class SweepRun(object):
+    '''
+    The outcome of running the model at one point of a sweep.
+
+    status is 'ok', 'failed' or 'timeout'. outputs maps the title of each
+    display of the model to the signal it would have shown. error holds
+    the traceback of a failed run.
+    '''
+
+    def __init__(self, params, status, outputs=None, error=None, elapsed=None):
+        self.params = params
+        self.status = status
+        self.outputs = outputs or {}
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    def __repr__(self):
+        return 'SweepRun(%r, %r)' % (self.params, self.status)
+
+
+class SweepResult(object):
+    '''
+    The runs of a sweep, one per point, in the order of the points.
+    '''
+
+    def __init__(self, names, runs):
+        '''
+        @param names: the names of the parameters that were swept.
+        @param runs: a list of SweepRun.
+        '''
+        self.names = names
+        self.runs = runs
+
+    def __iter__(self):
+        return iter(self.runs)
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __getitem__(self, index):
+        return self.runs[index]
+
+    def failed(self):
+        '''The runs that failed or timed out.'''
+        return [run for run in self.runs if not run.ok]
+
+    def table(self):
+        '''The result as text, one line per point, summarising every output
+        signal by its number of events and mean value.'''
+        lines = []
+        for run in self.runs:
+            cells = ['%s=%r' % (name, run.params.get(name)) for name in self.names]
+            cells.append(run.status)
+            if run.elapsed is not None:
+                cells.append('%.2fs' % run.elapsed)
+            for name in sorted(run.outputs):
+                values = run.outputs[name].value
+                mean = values.mean() if len(values) else float('nan')
+                cells.append('%s: %d events, mean %g' % (name, len(values), mean))
+            if run.error:
+                cells.append(run.error.strip().splitlines()[-1])
+            lines.append('  '.join(cells))
+        return '\n'.join(lines)
+
+
+def grid_points(param_grid):
+    '''
+    The points of a parameter grid: every combination of the values in a
+    dictionary of parameter names to lists of values, ordered by name.
+    A list of dictionaries is taken as the points themselves.
+    '''
+    if isinstance(param_grid, dict):
+        names = sorted(param_grid)
+        return [dict(zip(names, values))
+                for values in itertools.product(*[param_grid[name] for name in names])]
+    return [dict(point) for point in param_grid]
+
+
+def _run_point(model_class, params, engine, connection):
+    '''Run the model at one point, in a worker process, and send back
+    (status, outputs, error).'''
+    DisplayActor.headless = Recorder
+    try:
+        model = model_class(**params)
+        model.run(engine=engine)
+        connection.send(('ok', recorded_signals(model.components), None))
+    except Exception:
+        connection.send(('failed', None, traceback.format_exc()))
+    connection.close()
+
+
+def sweep(model_class, param_grid, workers=None, timeout=None, engine='threaded'):
+    '''
+    Run a model once for every point of a parameter grid, in parallel.
+
+    @param model_class: a CompositeActor subclass, constructed with each
+                        point as keyword arguments.
+    @param param_grid: a dictionary of parameter names to lists of values,
+                       or a list of dictionaries, see grid_points.
+    @param workers: the most runs at a time, by default one per core.
+    @param timeout: seconds after which a run is stopped and reported as
+                    timed out, or None to wait for ever.
+    @param engine: the engine each model is run with, see CompositeActor.run.
+
+    Returns a SweepResult.
+    '''
+    points = grid_points(param_grid)
+    names = sorted(set(name for point in points for name in point))
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    runs = [None] * len(points)
+    waiting = range(len(points))
+    running = {}
+
+    logging.info("Sweeping %d points with %d workers" % (len(points), workers))
+    while waiting or running:
+        while waiting and len(running) < workers:
+            index = waiting.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_point,
+                                              args=(model_class, points[index], engine, sender))
+            process.daemon = True
+            process.start()
+            sender.close()
+            running[index] = (process, receiver, time())
+
+        for index, (process, receiver, started) in running.items():
+            elapsed = time() - started
+            if timeout is not None and elapsed > timeout:
+                process.terminate()
+                process.join()
+                runs[index] = SweepRun(points[index], 'timeout', elapsed=elapsed,
+                                       error="Stopped after %g seconds" % timeout)
+            elif receiver.poll():
+                try:
+                    status, outputs, error = receiver.recv()
+                    runs[index] = SweepRun(points[index], status, outputs, error, elapsed)
+                except EOFError:
+                    # The worker died without sending its result
+                    process.join()
+                    runs[index] = SweepRun(points[index], 'failed', elapsed=elapsed,
+                                           error="Worker exited with code %s" % process.exitcode)
+                process.join()
+            elif not process.is_alive():
+                runs[index] = SweepRun(points[index], 'failed', elapsed=elapsed,
+                                       error="Worker exited with code %s" % process.exitcode)
+            else:
+                continue
+            receiver.close()
+            del running[index]
+            logging.debug("Point %r: %s" % (points[index], runs[index].status))
+        sleep(0.01)
+
+    return SweepResult(names, runs)
+
+
+def parse_grid(specs):
+    '''
+    Make a parameter grid from command line arguments of the form
+    'name=value,value,...'. Values are read as Python literals where
+    possible, otherwise kept as strings.
+    '''
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not name or not values:
+            raise ValueError("Expected name=value,... but got '%s'" % spec)
+        grid[name.strip()] = [_literal(value.strip()) for value in values.split(',')]
+    return grid
+
+
+def _literal(text):
+    try:
+        return literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def find_model(module):
+    '''
+    The model defined in a module: the one CompositeActor subclass whose
+    class is defined there.
+    '''
+    models = [value for value in vars(module).values()
+              if inspect.isclass(value) and issubclass(value, CompositeActor)
+              and value.__module__ == module.__name__]
+    if len(models) != 1:
+        raise ValueError("Expected one model in %s, found %d" % (module.__name__, len(models)))
+    return models[0]
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import os
+from channel import MakeChans
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_grid_points(self):
+        points = grid_points({'b': [1, 2], 'a': ['x']})
+        self.assertEquals(points, [{'a': 'x', 'b': 1}, {'a': 'x', 'b': 2}])
+        self.assertEquals(grid_points([{'a': 1}]), [{'a': 1}])
+        self.assertEquals(parse_grid(['N=1,2', 'name=sum']), {'N': [1, 2], 'name': ['sum']})
+
+    def test_headless_display(self):
+        '''Display actors are replaced by a Recorder when headless'''
+        from scipysim.actors.display import Plotter, BundleHistPlotter
+        wire, = MakeChans(1)
+        DisplayActor.headless = Recorder
+        try:
+            plot = Plotter(wire, title='Ramp')
+            hist = BundleHistPlotter(input_channel=wire)
+        finally:
+            DisplayActor.headless = None
+        self.assertTrue(isinstance(plot, Recorder) and isinstance(hist, Recorder))
+        self.assertEquals(plot.title, 'Ramp')
+        self.assertTrue(plot.input_channel is wire and hist.input_channel is wire)
+
+    def test_sweep(self):
+        '''Every point is run and the displayed signals come back'''
+        result = sweep(GainModel, {'gain': [1, 2, 3]}, workers=2)
+        self.assertEquals([run.status for run in result], ['ok'] * 3)
+        for gain, run in zip([1, 2, 3], result):
+            self.assertEquals(run.params, {'gain': gain})
+            signal = run.outputs['Gain']
+            self.assertEquals(list(signal.tag), range(10))
+            self.assertTrue(numpy.allclose(signal.value, gain * signal.tag))
+        self.assertTrue('gain=3  ok' in result.table())
+
+    def test_failures_are_isolated(self):
+        result = sweep(GainModel, [{'gain': 1}, {'gain': 'fail'}, {'gain': 'hang'},
+                                   {'gain': 'crash'}, {'gain': 2}], workers=4, timeout=1)
+        self.assertEquals([run.status for run in result], ['ok', 'failed', 'timeout', 'failed', 'ok'])
+        self.assertTrue('ValueError' in result[1].error)
+        self.assertEquals(result[3].error, "Worker exited with code 3")
+        self.assertEquals(result.failed(), result.runs[1:4])
+        self.assertAlmostEquals(result[4].outputs['Gain'].value[-1], 18)
+
+
+class GainModel(CompositeActor):
+    '''A ramp through a gain to a plotter, for the sweep tests.'''
+
+    def __init__(self, gain):
+        super(GainModel, self).__init__()
+        from scipysim.actors.signal import Ramp
+        from scipysim.actors.math import Proportional
+        from scipysim.actors.display import Plotter
+        if gain == 'fail':
+            raise ValueError("Can't build this model")
+        if gain == 'crash':
+            os._exit(3)
+        self.hang = gain == 'hang'
+        wires = MakeChans(2)
+        self.components = [Ramp(wires[0], amplitude=10, freq=0.1, resolution=1, simulation_time=10),
+                           Proportional(wires[0], wires[1], gain=0 if self.hang else gain),
+                           Plotter(wires[1], title='Gain')]
+
+    def run(self, engine='threaded'):
+        if self.hang:
+            sleep(60)
+        super(GainModel, self).run(engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,24 @@
 import unittest
-from actor import Actor
+from time import time
+from actor import Actor, CompletionLatch
 from errors import NoProcessFunctionDefined
 
 from event import TestEvent, TestLastEvent
 from graph import TestNode, TestGraph
+from channel import TestChannel
+from scheduler import TestScheduler
+from sdf import TestSDF
+from de import TestDE
+from multiprocess import TestMultiprocess
+from fusion import TestFusion
+from compiler import TestCompiler
+from sweep import TestSweep
+from instrumentation import TestProfiler
+from checkpoint import TestCheckpoint
+from cache import TestResultCache
+from catalog import TestCatalog
+from tracepoint import TestTracepoint
+from util.lazy import TestLazyPackage
 
 class TestActor(unittest.TestCase):
 
@@ -23,5 +38,102 @@ class TestActor(unittest.TestCase):
         self.assertEqual(my_actor.num_inputs, None)
         self.assertEqual(my_actor.num_outputs, None)
 
+    def test_source_blocks(self):
+        '''A source sent in blocks has the tags of the whole linspace'''
+        import numpy
+        from scipysim.actors import Channel
+        from scipysim.actors.signal import Ramp
+        wire = Channel()
+        ramp = Ramp(wire, amplitude=1.0, freq=0.5, resolution=10, simulation_time=7.3, endpoint=True,
+                    block_size=8)
+        ramp.run()
+        blocks = [wire.get_block()]
+        while not blocks[-1].last:
+            blocks.append(wire.get_block())
+        self.assertEquals([len(block) for block in blocks[:-1]], [8] * 9 + [1])
+        tags = numpy.concatenate([block.tag for block in blocks[:-1]])
+        values = numpy.concatenate([block.value for block in blocks[:-1]])
+        self.assertTrue(numpy.array_equal(tags, numpy.linspace(0, 7.3, 73, endpoint=True)))
+        self.assertTrue((values >= 0).all() and (values < 1.0).all())
+        self.assertAlmostEqual(values[25], tags[25] * 0.5 - 1.0)
+
+
+class TestCompositeActor(unittest.TestCase):
+
+    def test_completion_latch(self):
+        latch = CompletionLatch(2)
+        latch.count_down()
+        self.assertFalse(latch.wait(0.01))
+        latch.count_down()
+        self.assertTrue(latch.wait())
+
+    def test_run_returns_when_actors_finish(self):
+        '''A short simulation doesn't wait for a poll interval'''
+        from composite_actor import CompositeActor
+        from scipysim.actors import MakeChans
+        from scipysim.actors.signal import Ramp, Sink
+        wire, = MakeChans(1)
+        model = CompositeActor()
+        model.components = [Ramp(wire, resolution=5, simulation_time=2), Sink(wire)]
+        start = time()
+        model.run()
+        self.assertTrue(time() - start < 0.5)
+        self.assertTrue(all(c.stop and not c.is_alive() for c in model.components))
+
+    def test_nested_model(self):
+        '''A CompositeActor runs in a thread of its own inside another'''
+        from composite_actor import CompositeActor
+        from sweep import Recorder
+        from scipysim.actors import MakeChans
+        from scipysim.actors.signal import Ramp
+        wire, = MakeChans(1)
+        inner, outer = CompositeActor(), CompositeActor()
+        inner.components = [Ramp(wire, resolution=10, simulation_time=2), Recorder(wire)]
+        outer.components = [inner]
+        outer.run()
+        self.assertEquals(len(inner.components[1].signal()), 20)
+
+    def test_extend(self):
+        '''An extended simulation ends the same as one run to the later time'''
+        from composite_actor import CompositeActor
+        from sweep import Recorder
+        from scipysim.actors import MakeChans
+        from scipysim.actors.signal import Ramp, RandomSource, PoissonSource
+        from scipysim.actors.math import Summer, CTIntegratorForwardEuler
+
+        def build(simulation_time):
+            wires = MakeChans(6)
+            model = CompositeActor()
+            model.components = [Ramp(wires[0], resolution=10, simulation_time=simulation_time),
+                                RandomSource(wires[1], simulation_time=simulation_time, seed=1, block_size=7),
+                                Summer([wires[0], wires[1]], wires[2]),
+                                CTIntegratorForwardEuler(wires[2], wires[3]), Recorder(wires[3]),
+                                PoissonSource(wires[4], rate=20.0, simulation_time=simulation_time, seed=2, block_size=50),
+                                Recorder(wires[4])]
+            return model
+
+        for engine in ['threaded', 'cooperative']:
+            expected, model = build(20), build(10)
+            expected.run(engine=engine)
+            model.run(engine=engine)
+            self.assertEquals(len(model.components[4].signal()), 100)
+            model.extend_and_run(20, engine=engine)
+            for i in [4, 6]:
+                signal, extended = expected.components[i].signal(), model.components[i].signal()
+                self.assertTrue(len(signal) > 100)
+                self.assertEquals(list(extended.tag), list(signal.tag))
+                self.assertEquals(list(extended.value), list(signal.value))
+        self.assertRaises(ValueError, model.extend, 15)
+
+        # A nested model is only reset by extend, and run along with its peers
+        outer, inner = CompositeActor(), build(10)
+        outer.components = [inner]
+        inner.run()
+        outer.extend(20)
+        self.assertEquals(len(inner.components[4].signal()), 100)
+        self.assertFalse(any(c.stop for c in inner.components))
+        outer.run()
+        self.assertEquals(list(inner.components[4].signal().value), list(expected.components[4].signal().value))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,154 @@
+'''
+Tracepoints: messages about every firing or event, for debugging.
+
+Logging a message for every event costs the formatting of the message and
+a call into the logging module even when debug messages aren't shown, so
+the actors' per-event messages are tracepoints instead. A module makes its
+tracepoint once, named like a logger::
+
+    trace = tracepoint(__name__)
+
+and guards each message with a check of one attribute, so that a disabled
+tracepoint costs nothing more::
+
+    if trace.enabled:
+        trace("Summer received (tag: %2.e, value: %2.e)", tag, value)
+
+The message is only formatted by the sinks the hits are sent to: the
+logging module (as debug messages of the logger of the tracepoint's name),
+and during a profiled or traced run the Profiler (a count of hits of each
+tracepoint by each actor) and the Tracer (an instant event on the firing's
+track). Tracepoints are enabled by name, with shell style wildcards::
+
+    enable('scipysim.actors.math.*')
+
+or from the command line::
+
+    run_scipysim --tracepoints 'scipysim.actors.*' my_model
+
+'''
+
+import logging
+from fnmatch import fnmatchcase
+
+# Every tracepoint made, by name
+_tracepoints = {}
+
+# The patterns of the names of the enabled tracepoints
+_patterns = set()
+
+
+def log_sink(tracepoint, message, args):
+    '''Send a hit to the logging module, as a debug message.'''
+    logging.getLogger(tracepoint.name).debug(message, *args)
+
+# The functions each hit of an enabled tracepoint is sent to, as
+# sink(tracepoint, message, args)
+_sinks = [log_sink]
+
+
+class Tracepoint(object):
+    '''
+    A named source of debugging messages, see tracepoint. Call it with a
+    message and its arguments, as for logging.debug, after checking that
+    it is enabled.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.enabled = any(fnmatchcase(name, pattern) for pattern in _patterns)
+
+    def __call__(self, message, *args):
+        for sink in _sinks:
+            sink(self, message, args)
+
+    def __repr__(self):
+        return '<Tracepoint %s (%s)>' % (self.name, 'enabled' if self.enabled else 'disabled')
+
+
+def tracepoint(name):
+    '''
+    The tracepoint of a name, made the first time it is asked for.
+
+    @param name: the name of the tracepoint, by convention the name of
+                 the module using it.
+    '''
+    if name not in _tracepoints:
+        _tracepoints[name] = Tracepoint(name)
+    return _tracepoints[name]
+
+
+def _update():
+    for name, point in _tracepoints.items():
+        point.enabled = any(fnmatchcase(name, pattern) for pattern in _patterns)
+
+
+def enable(pattern='*'):
+    '''
+    Enable the tracepoints whose names match a pattern, including those
+    made later.
+
+    @param pattern: a name, which may contain shell style wildcards.
+    '''
+    _patterns.add(pattern)
+    _update()
+
+
+def disable(pattern=None):
+    '''Undo an enable of a pattern, or by default of every pattern.'''
+    if pattern is None:
+        _patterns.clear()
+    else:
+        _patterns.discard(pattern)
+    _update()
+
+
+def add_sink(sink):
+    '''Send the hits of the enabled tracepoints to another function,
+    called as sink(tracepoint, message, args).'''
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+
+
+class TestTracepoint(unittest.TestCase):
+
+    def setUp(self):
+        self.hits = []
+        add_sink(self.sink)
+
+    def tearDown(self):
+        remove_sink(self.sink)
+        disable()
+
+    def sink(self, point, message, args):
+        self.hits.append((point.name, message % args))
+
+    def test_enabled_by_pattern(self):
+        first = tracepoint('test.tracepoint.first')
+        self.assertFalse(first.enabled)
+        enable('test.tracepoint.*')
+        second = tracepoint('test.tracepoint.second')
+        self.assertTrue(first.enabled and second.enabled)
+        self.assertFalse(tracepoint('test.other').enabled)
+        self.assertTrue(tracepoint('test.tracepoint.first') is first)
+        disable()
+        self.assertFalse(first.enabled or second.enabled)
+
+    def test_hits_sent_to_sinks(self):
+        enable('test.tracepoint.hit')
+        point = tracepoint('test.tracepoint.hit')
+        point("Received (tag: %2.e)", 0.5)
+        self.assertEquals(self.hits, [('test.tracepoint.hit', 'Received (tag: 5e-01)')])
+
+
+if __name__ == "__main__":
+    unittest.main()
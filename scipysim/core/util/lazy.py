@@ -0,0 +1,125 @@
+'''
+Lazy loading of the names a package exports from its modules.
+
+A package's __init__ normally imports every one of its modules so that
+their classes can be imported from the package. Importing one actor then
+costs the import of all the others and of everything they import. Instead
+a package can list the module each name comes from::
+
+    lazy_package(__name__, {
+        'Ramp': 'ramp',
+        'trig': 'trig',
+        'Channel': 'scipysim.core',
+    })
+
+and a module is only imported the first time one of its names is used,
+e.g. by "from scipysim.actors.signal import Ramp". A name the module
+doesn't define is the module itself (as for 'trig' above). Module names
+containing a dot are absolute, the others are modules of the package.
+'''
+
+import sys
+from types import ModuleType
+
+
+class LazyPackage(ModuleType):
+    '''
+    A package module that imports the module a name comes from on the
+    first access to the name, see lazy_package.
+    '''
+
+    def __init__(self, module, names):
+        super(LazyPackage, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # The original module, whose globals the package's code still uses
+        self.__dict__['_module'] = module
+        self.__dict__['_lazy_names'] = names
+        self.__dict__['__all__'] = sorted(names)
+
+    def __getattr__(self, name):
+        names = self.__dict__['_lazy_names']
+        if name not in names:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        source = names[name]
+        if '.' not in source:
+            source = self.__name__ + '.' + source
+        __import__(source)
+        module = sys.modules[source]
+        value = getattr(module, name, module)
+        setattr(self, name, value)
+        return value
+
+    def __getattribute__(self, name):
+        value = ModuleType.__getattribute__(self, name)
+        # Importing a module puts it in its package's dictionary, which
+        # mustn't hide a name of the same name exported from it (e.g. the
+        # sweep function of scipysim.core.sweep)
+        if type(value) is ModuleType and hasattr(value, name):
+            names = ModuleType.__getattribute__(self, '_lazy_names')
+            if name in names:
+                value = getattr(value, name)
+                ModuleType.__setattr__(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__dict__['_lazy_names']))
+
+
+def lazy_package(name, names):
+    '''
+    Make the package being imported as 'name' (pass __name__) import its
+    names lazily.
+
+    @param name: the name of the package.
+    @param names: a dictionary of each name the package exports to the
+                  module it comes from.
+    '''
+    sys.modules[name] = LazyPackage(sys.modules[name], names)
+
+
+# --------------------------------------------------------------------
+# Testing
+# --------------------------------------------------------------------
+import unittest
+import os
+import shutil
+import tempfile
+
+
+class TestLazyPackage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        package = os.path.join(self.directory, 'lazytest')
+        os.mkdir(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as init:
+            init.write("from scipysim.core.util.lazy import lazy_package\n"
+                       "lazy_package(__name__, {'Thing': 'Thing', 'other': 'other'})\n")
+        with open(os.path.join(package, 'Thing.py'), 'w') as module:
+            module.write("class Thing(object): pass\n")
+        with open(os.path.join(package, 'other.py'), 'w') as module:
+            module.write("value = 1\n")
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in [name for name in sys.modules if name.startswith('lazytest')]:
+            del sys.modules[name]
+        shutil.rmtree(self.directory)
+
+    def test_names_imported_on_first_use(self):
+        import lazytest
+        self.assertFalse('lazytest.other' in sys.modules)
+        self.assertEquals(lazytest.other.value, 1)
+        self.assertTrue('lazytest.other' in sys.modules)
+        self.assertEquals(lazytest.__all__, ['Thing', 'other'])
+
+    def test_module_doesnt_hide_its_class(self):
+        '''Importing a module directly doesn't replace the class of the same name'''
+        import lazytest.Thing
+        from lazytest import Thing
+        self.assertTrue(isinstance(Thing, type))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,14 +6,14 @@ from Tkinter import Label, Scrollbar
 from Tkconstants import VERTICAL
 from ttk import Treeview
  
-from scipysim.core import CodeFile, fill_tree
+from scipysim.core import fill_tree
 
 PATH_TO_SCRIPT = os.path.dirname( os.path.realpath( __file__ ) )
 EXAMPLES_DIRECTORY = os.path.split( PATH_TO_SCRIPT )[0]
 
 class ExamplesGroup:
     """A group of actors to be displayed in a single block."""
-    def __init__( self, name, frame, directory, set_callbacks ):
+    def __init__( self, name, frame, directory, set_callbacks, catalog=None ):
         """Create a group of examples for display and selection.
         
         Params:
@@ -24,10 +24,13 @@ class ExamplesGroup:
                         both get called when an example is clicked on.
                 * The first is passed the text for the example.
                 * The second is passed the Codefile object.
+        catalog - the Catalog the actors are looked up in, by default
+                  the one in the user's home directory.
         """
         self.name = name
         self.frame = frame
         self.directory = directory
+        self.catalog = catalog
 
         self.set_text, self.set_active_block = set_callbacks
 
@@ -72,7 +75,7 @@ class ExamplesGroup:
         label = Label( self.frame, text=self.name )
         label.pack()
 
-        self.tree, self.codefiles = make_tree( self.frame, self.directory )
+        self.tree, self.codefiles = make_tree( self.frame, self.directory, self.catalog )
         logging.debug( "Finished drawing tree. Binding events now." )
         self.tree.pack()
 
@@ -89,7 +92,7 @@ class ExamplesGroup:
 
 
 # TODO: Remove the TK from this
-def make_tree( mainframe, directory ):
+def make_tree( mainframe, directory, catalog=None ):
     logging.debug( "Creating a new tree" )
     tree = Treeview( mainframe, columns=( 'ins', 'outs' ) )
 
@@ -105,7 +108,7 @@ def make_tree( mainframe, directory ):
     tree.column( 'outs', width=60, anchor='center' )
 
     logging.debug( "Filling the tree with directory: %s" % directory )
-    codefiles = fill_tree( tree, directory )
+    codefiles = fill_tree( tree, directory, catalog )
     logging.debug( "Done filling tree" )
 
     return tree, codefiles
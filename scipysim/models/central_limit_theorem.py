@@ -4,10 +4,7 @@ from scipysim.actors import CompositeActor
 from scipysim.actors.display import BundleHistPlotter
 from scipysim.actors.io import Bundle
 from scipysim.actors.math import Summer
-from scipysim.actors.signal import RandomSource
-
-logging.basicConfig(level=logging.INFO)
-logging.info("Starting dual ramp + noise sum.")
+from scipysim.actors.signal import RandomSource, spawn_seeds
 
 class MultiSumPlot(CompositeActor):
     '''
@@ -16,15 +13,20 @@ class MultiSumPlot(CompositeActor):
     
     The components are all generating the same sequence of tags, so are always
     synchronised.
+
+    With an ensemble size, every source generates that many independent
+    signals at once, so the histogram is of that many sums at each tag.
+    Given a seed, the run can be repeated exactly.
     '''
 
-    def __init__(self, N=5):
+    def __init__(self, N=5, ensemble=None, seed=None):
         '''Set up the simulation'''
         super(MultiSumPlot, self).__init__()
         wires = MakeChans(N + 2)
 
         # Create N random source blocks
-        rndSources = [RandomSource(wires[i], resolution=15) for i in xrange(N)]
+        seeds = spawn_seeds(seed, N)
+        rndSources = [RandomSource(wires[i], resolution=15, ensemble=ensemble, seed=seeds[i]) for i in xrange(N)]
 
         # Create Summer Block
         summer = Summer(wires[:N], wires[N])
@@ -36,5 +38,7 @@ class MultiSumPlot(CompositeActor):
         self.components = rndSources + [ summer, dst, bundler]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logging.info("Starting dual ramp + noise sum.")
     for i in [1, 2, 3, 6, 12, 20]:
         MultiSumPlot(N=i).run()
@@ -4,8 +4,6 @@ from scipysim.actors.math import Summer
 from scipysim.actors.display import Plotter
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class Double_Ramp_Plot( CompositeActor ):
     '''
@@ -29,4 +27,5 @@ class Double_Ramp_Plot( CompositeActor ):
         self.components = [src1, src2, summer, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     Double_Ramp_Plot().run()
@@ -9,8 +9,6 @@ from scipysim.actors.math import Summer
 from scipysim.actors.display import Plotter
 
 import logging
-logging.basicConfig(level=logging.DEBUG)
-logging.info("Logger enabled")
 
 class DelayedRampSum(CompositeActor):
     '''Delaying an input (by an integer timestep ) to the multi input summer.'''
@@ -37,4 +35,5 @@ class DelayedRampSum(CompositeActor):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
     DelayedRampSum().run()
@@ -11,8 +11,6 @@ from scipysim.actors.signal import Ramp, RandomSource
 from scipysim.actors.math import Summer
 
 import logging
-logging.basicConfig(level=logging.INFO)
-logging.info("Logger enabled")
 
 class NoiseyRamp(CompositeActor):
     """
@@ -39,5 +37,6 @@ class NoiseyRamp(CompositeActor):
         self.components = [src1, src2, summer, bundler, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     NoiseyRamp().run()
 
@@ -12,8 +12,6 @@ from scipysim.actors.math import Summer, Constant
 
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class Pulse_Width_Modulator( CompositeActor ):
     """A PWM generation simulation.
@@ -86,5 +84,6 @@ class Pulse_Width_Modulator( CompositeActor ):
                       ]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     sim = Pulse_Width_Modulator()
     sim.run()
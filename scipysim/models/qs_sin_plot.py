@@ -11,8 +11,6 @@ from scipysim.actors.signal import EventFilter
 import numpy
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class QSSinPlot( CompositeActor ):
     """
@@ -33,4 +31,5 @@ class QSSinPlot( CompositeActor ):
         self.components = [src, de, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     QSSinPlot().run()
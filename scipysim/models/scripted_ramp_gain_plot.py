@@ -9,8 +9,6 @@ from scipysim.actors.math import Proportional
 from scipysim.actors.signal import Ramp
 
 import logging
-logging.basicConfig( level=logging.DEBUG )
-logging.info( "Logger enabled" )
 
 class RampGainPlot( CompositeActor ):
     '''
@@ -31,5 +29,6 @@ class RampGainPlot( CompositeActor ):
         self.components = [src, filt, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
     SIM = RampGainPlot()
     SIM.run()
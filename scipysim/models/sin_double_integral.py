@@ -21,8 +21,6 @@ from scipysim.actors.math.trig import CTSinGenerator
 import numpy
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class SinDoubleIntegral( CompositeActor ):
     """
@@ -47,4 +45,5 @@ class SinDoubleIntegral( CompositeActor ):
         ]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     SinDoubleIntegral().run()
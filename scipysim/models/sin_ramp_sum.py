@@ -5,8 +5,6 @@ from scipysim.actors.math import Summer
 from scipysim.actors.display import Plotter
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class SinRampSum( CompositeActor ):
     '''
@@ -25,4 +23,5 @@ class SinRampSum( CompositeActor ):
         self.components = [src1, src2, summer, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     SinRampSum().run()
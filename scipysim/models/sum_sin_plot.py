@@ -11,8 +11,6 @@ from scipysim.actors.math.trig import CTSinGenerator
 import numpy
 
 import logging
-logging.basicConfig( level=logging.INFO )
-logging.info( "Logger enabled" )
 
 class SumSinPlot( CompositeActor ):
     """
@@ -37,4 +35,5 @@ class SumSinPlot( CompositeActor ):
         self.components = [src1, src2, summer, dst]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     SumSinPlot().run()
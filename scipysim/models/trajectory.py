@@ -8,8 +8,6 @@ from scipysim.actors.math import CTIntegratorForwardEuler as Integrator
 from scipysim.actors.display import Plotter
 
 import logging
-logging.basicConfig(level=logging.INFO)
-logging.info("Logger enabled")
 
 class ThrownBall(CompositeActor):
     '''
@@ -38,4 +36,5 @@ class ThrownBall(CompositeActor):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     ThrownBall().run()
@@ -10,8 +10,6 @@ from scipysim.actors.math import CTIntegratorQS1 as QSIntegrator
 from scipysim.actors.display import StemPlotter
 
 import logging
-logging.basicConfig(level=logging.INFO)
-logging.info("Logger enabled")
 
 class ThrownBall(CompositeActor):
     '''
@@ -45,4 +43,5 @@ class ThrownBall(CompositeActor):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     ThrownBall().run()